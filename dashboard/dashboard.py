@@ -8,7 +8,7 @@
 from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from src.database import get_engine, read_sql_query
+from src.database import current_fuel_table, get_engine, iter_sql_chunks, read_sql_query
 
 load_dotenv()
 
@@ -47,9 +47,20 @@
 def _table_exists(engine, name):
     try:
         from sqlalchemy import inspect
-        return name in inspect(engine).get_table_names()
+        insp = inspect(engine)
+        return name in insp.get_table_names() + insp.get_view_names()
     except: return False
 
+FUEL_COLUMNS = ["state", "regular", "diesel", "scraped_at"]
+
+def _latest_fuel(engine):
+    """Latest fuel row per state from the newest history partition, folded chunk by chunk."""
+    latest = pd.DataFrame(columns=FUEL_COLUMNS)
+    for chunk in iter_sql_chunks(current_fuel_table(engine), engine, columns=FUEL_COLUMNS):
+        latest = chunk if latest.empty else pd.concat([latest, chunk])
+        latest = latest.sort_values("scraped_at").groupby("state").tail(1)
+    return latest
+
 @st.cache_data(ttl=300)
 def load():
     engine = get_engine()
@@ -58,9 +69,15 @@ def load():
                "freight_yearly","freight_trade_balance","truck_rates",
                "fuel_prices","shipping_stats","eia_fuel_prices",
                "freight_lanes_truck","freight_lanes_rail",
-                "route_costs","route_congestion","lane_efficiency",
-                "ml_metrics","ml_predictions"]
+                "route_costs","route_congestion","lane_efficiency","backhaul_matches",
+                "ml_metrics","ml_predictions","ml_model_selection"]
     for t in targets:
+        if t == "fuel_prices" and _table_exists(engine, t):
+            try:
+                tables[t] = _latest_fuel(engine)
+            except Exception:
+                tables[t] = pd.DataFrame()
+            continue
         try: tables[t] = read_sql_query(f"SELECT * FROM {t}", engine) if _table_exists(engine, t) else pd.DataFrame()
         except: tables[t] = pd.DataFrame()
     return tables
@@ -87,8 +104,10 @@ def load():
 df_costs = t["route_costs"]
 df_cong = t["route_congestion"]
 df_lane_eff = t["lane_efficiency"]
+df_backhaul = t["backhaul_matches"]
 df_ml_metrics = t["ml_metrics"]
 df_ml_pred = t["ml_predictions"]
+df_ml_cv = t["ml_model_selection"]
 
 if df_state.empty and df_ship.empty:
     st.error("Run `python main.py` first"); st.stop()
@@ -322,6 +341,14 @@ def fmt(v, d=0):
             eff_s.index = range(1,len(eff_s)+1)
             st.dataframe(eff_s, width='stretch', hide_index=False)
 
+    if not df_backhaul.empty:
+        st.markdown("### Backhaul Opportunities (empty-mile savings)")
+        bh = df_backhaul[df_backhaul["rank"]==1].sort_values("annual_savings", ascending=False).head(10)
+        bh_s = bh[["outbound_origin","outbound_destination","return_origin","return_destination",
+                   "matched_tons_m","deadhead_mi","savings_per_load"]].copy()
+        bh_s.index = range(1,len(bh_s)+1)
+        st.dataframe(bh_s, width='stretch', hide_index=False)
+
     if not df_ml_metrics.empty:
         st.markdown("### ML Cost Prediction Model")
         m = df_ml_metrics.iloc[0]
@@ -331,6 +358,12 @@ def fmt(v, d=0):
         ck_ml[2].metric("RMSE", f"${m['rmse']:.0f}")
         ck_ml[3].metric("Test Routes", str(m["n_test"]))
         st.caption("Linear regression: predicts route total cost from driving distance and time. Trained on 625 real OSRM routes.")
+        if not df_ml_cv.empty:
+            b = df_ml_cv.iloc[0]
+            st.caption(f"Model selection: best of {len(df_ml_cv)} configurations by {b['folds']}-fold CV "
+                       f"is {b['model']} on {b['features']} features.")
+            st.dataframe(df_ml_cv[["model","features","r2","r2_std","mae","rmse","n_test"]],
+                         width='stretch', hide_index=True)
 
         if not df_ml_pred.empty:
             fig_ml = px.scatter(df_ml_pred, x="actual_cost", y="predicted_cost",
@@ -37,8 +37,12 @@ def filter(self, record):
 from src.etl.enrichment.faf_loader import store_freight_data
 from src.etl.enrichment.usda_rates import store_usda_rates
 from src.analysis.cost_estimator import build_cost_features
+from src.analysis.lane_optimizer import store_lane_assignment
+from src.analysis.backhaul import store_backhaul_matches
 from src.analysis.cost_predictor import train_cost_predictor
-from src.database import get_engine, read_sql_query
+from src.analysis.model_selection import run_model_selection
+from src.database import fuel_prices_as_of, get_engine, read_sql_query, table_versions
+from src.utils.outputs import write_output
 from src.analysis.kpis import KPIAnalysis
 from src.analysis.features import FeatureEngineering
 
@@ -61,34 +65,54 @@ def filter(self, record):
 logger = logging.getLogger(__name__)
 
 
-def create_enriched_dataset():
+ENRICHED_PATH = Path("data/final/enriched_data.csv")
+# Tablas que, además de shipping_stats, alimentan el dataset enriquecido
+ENRICHMENT_INPUTS = ["fuel_prices", "weather_data"]
+
+
+def enrichment_is_current(changes, versions_before, engine, output_path=ENRICHED_PATH):
+    """True si el dataset enriquecido ya existe y nada de lo que lo alimenta ha cambiado:
+    el ETL incremental (`changes`) no tocó ningún estado y fuel/clima siguen en la versión
+    registrada en `versions_before`. Sin `changes` (carga completa o streaming) siempre es False."""
+    if changes is None or changes["full_load"]:
+        return False
+    if changes["inserted"] or changes["updated"] or changes["deleted"]:
+        return False
+    if table_versions(engine, ENRICHMENT_INPUTS) != versions_before:
+        return False
+    output_path = Path(output_path)
+    return any(output_path.with_suffix(s).exists() for s in (".csv", ".parquet"))
+
+
+def create_enriched_dataset(fuel_as_of=None):
     """
     Crea el dataset final enriquecido combinando:
     - Datos de envíos (shipping_stats)
-    - Precios de combustible (fuel_prices)
+    - Precios de combustible (fuel_prices): snapshot vigente por estado en `fuel_as_of`
+      (el último si es None), así el tamaño no crece con el histórico
     - Datos climáticos (weather_data) - opcional
     
-    Guarda en: data/final/enriched_data.csv
+    Guarda en: data/final/enriched_data.csv (o .parquet según OUTPUT_FORMAT)
     """
     try:
         engine = get_engine()
         
         # Leer datos de todas las fuentes
         df_shipping = read_sql_query("SELECT * FROM shipping_stats", engine)
-        df_fuel = read_sql_query("SELECT * FROM fuel_prices", engine)
         
         if df_shipping.empty:
             logger.warning("shipping_stats vacío")
             return None
         
-        logger.info(f"Merging datasets: {df_shipping.shape[0]} shipping × {df_fuel.shape[0]} fuel")
-        
-        # Merge 1: Shipping + Fuel
-        df = df_shipping.merge(
-            df_fuel[['state', 'regular', 'mid_grade', 'premium', 'diesel']],
-            on='state',
-            how='left'
-        )
+        # Merge 1: Shipping + Fuel (as-of join, una fila de precios por estado)
+        fuel_cols = ['regular', 'mid_grade', 'premium', 'diesel']
+        try:
+            df_fuel = fuel_prices_as_of(engine, fuel_as_of, fuel_cols)
+            df = df_shipping.merge(df_fuel[['state', *fuel_cols]], on='state', how='left')
+        except Exception as e:
+            logger.warning(f"Fuel prices unavailable: {e}")
+            df_fuel, df = None, df_shipping
+        logger.info(f"Fuel as-of {fuel_as_of or 'latest'} merged: {df.shape[0]} rows")
         
         # Merge 2: + Weather (opcional, si existe tabla)
         try:
@@ -115,12 +139,12 @@ def create_enriched_dataset():
         existing_cols = [c for c in final_cols if c in df.columns]
         df_final = df[existing_cols]
         
-        # Guardar CSV
-        output_dir = Path("data/final")
+        # Guardar dataset (CSV y/o Parquet según OUTPUT_FORMAT)
+        output_dir = ENRICHED_PATH.parent
         output_dir.mkdir(parents=True, exist_ok=True)
-        output_path = output_dir / "enriched_data.csv"
+        output_path = ENRICHED_PATH
         
-        df_final.to_csv(output_path, index=False)
+        output_path = ", ".join(map(str, write_output(df_final, output_path)))
         logger.info(f"✅ Enriched dataset saved: {output_path} ({df_final.shape[0]} rows, {df_final.shape[1]} cols)")
         
         # === CALCULATE KPIs AND FEATURES ===
@@ -128,7 +152,7 @@ def create_enriched_dataset():
             logger.info("▶ Calculating KPIs and Feature layers...")
             
             # Initialize KPI analyzer
-            kpi_analyzer = KPIAnalysis(df_final, df_fuel if 'df_fuel' in locals() else None)
+            kpi_analyzer = KPIAnalysis(df_final, df_fuel)
             
             # Calculate basic KPIs
             basic_kpis = kpi_analyzer.basic_kpis()
@@ -145,7 +169,7 @@ def create_enriched_dataset():
             })
             
             kpi_path = output_dir / "kpi_summary.csv"
-            kpi_summary.to_csv(kpi_path, index=False)
+            kpi_path = ", ".join(map(str, write_output(kpi_summary, kpi_path)))
             logger.info(f"✅ KPI summary saved: {kpi_path}")
             
             # === FEATURE ENGINEERING ===
@@ -161,7 +185,7 @@ def create_enriched_dataset():
             
             # Save enhanced dataset with all features
             features_path = output_dir / "enriched_data_with_features.csv"
-            df_with_features.to_csv(features_path, index=False)
+            features_path = ", ".join(map(str, write_output(df_with_features, features_path)))
             logger.info(f"✅ Enhanced dataset with features saved: {features_path} ({df_with_features.shape[0]} rows, {df_with_features.shape[1]} cols)")
             
         except Exception as e:
@@ -188,7 +212,13 @@ def run_pipeline():
         
         # 2. ETL Principal
         logger.info("▶ Step 2: Running ETL (clean & validate)...")
-        run_etl()
+        etl_changes = run_etl()
+        if etl_changes is not None:
+            changed = etl_changes["inserted"] + etl_changes["updated"] + etl_changes["deleted"]
+            logger.info(f"✅ ETL incremental: {len(changed)} states changed "
+                        f"({len(etl_changes['inserted'])} new, {len(etl_changes['updated'])} updated, "
+                        f"{len(etl_changes['deleted'])} deleted)")
+        enrichment_versions = table_versions(get_engine(), ENRICHMENT_INPUTS)
         
         # 3. Scraping de combustible (no crítico)
         logger.info("▶ Step 3: Scraping fuel prices...")
@@ -213,7 +243,10 @@ def run_pipeline():
         
         # 5. Crear dataset final
         logger.info("▶ Step 5: Creating final enriched dataset...")
-        create_enriched_dataset()
+        if enrichment_is_current(etl_changes, enrichment_versions, get_engine()):
+            logger.info("⏭ No changes in shipping_stats, fuel or weather: keeping the previous enriched dataset and KPIs")
+        else:
+            create_enriched_dataset()
         
         # 6. FAF Freight Data
         logger.info("▶ Step 6: Loading FAF freight flows...")
@@ -244,17 +277,55 @@ def run_pipeline():
                         f"avg ${cost_results['avg_cost_per_mi']:.2f}/mi")
         except Exception as e:
             logger.warning(f"Cost estimation failed (non-critical): {e}")
+
+        # 8b. Lane assignment under hub capacity (min-cost flow)
+        logger.info("▶ Step 8b: Optimizing lane assignment...")
+        try:
+            engine = get_engine()
+            opt_results = store_lane_assignment(engine)
+            if opt_results:
+                logger.info(f"✅ Lanes: {opt_results['assignments']} assignments, "
+                            f"{opt_results['binding_hubs']} binding hubs, "
+                            f"{opt_results['unserved_tons_m']:.2f}M tons unserved")
+        except Exception as e:
+            logger.warning(f"Lane optimization failed (non-critical): {e}")
+
+        # 8c. Backhaul pairings to cut empty miles
+        logger.info("▶ Step 8c: Matching backhaul lanes...")
+        try:
+            engine = get_engine()
+            bh_results = store_backhaul_matches(engine)
+            if bh_results.get("matches"):
+                logger.info(f"✅ Backhaul: {bh_results['lanes_matched']} lanes matched, "
+                            f"${bh_results['annual_savings']:,.0f} est. annual savings")
+        except Exception as e:
+            logger.warning(f"Backhaul matching failed (non-critical): {e}")
         
         # 9. ML: cost prediction model
         logger.info("▶ Step 9: Training cost prediction model...")
         try:
             engine = get_engine()
+            # ML_INCREMENTAL=1: actualización SGD en lugar del ajuste completo
             ml_results = train_cost_predictor(engine)
-            if ml_results:
+            if ml_results and "mode" in ml_results:
+                logger.info(f"✅ ML incremental: {ml_results['mode']} update, "
+                            f"{ml_results['n_new']} new routes, MAE=${ml_results['mae']}")
+            elif ml_results:
                 logger.info(f"✅ ML: R²={ml_results['r2']}, MAE=${ml_results['mae']}, RMSE=${ml_results['rmse']}")
         except Exception as e:
             logger.warning(f"ML model failed (non-critical): {e}")
 
+        # 9b. ML: cross-validated model selection (leaderboard -> ml_model_selection)
+        logger.info("▶ Step 9b: Cross-validated model selection...")
+        try:
+            board = run_model_selection(get_engine())
+            if board is not None:
+                best = board.iloc[0]
+                logger.info(f"✅ Model selection: best {best['model']}/{best['features']} "
+                            f"R²={best['r2']}, RMSE=${best['rmse']}")
+        except Exception as e:
+            logger.warning(f"Model selection failed (non-critical): {e}")
+
         logger.info("=" * 60)
         logger.info("✅ PIPELINE COMPLETED SUCCESSFULLY")
         logger.info("=" * 60)
@@ -0,0 +1,82 @@
+"""Benchmark the pandas and DuckDB backends for the FAF aggregate tables.
+
+Usage:
+    python scripts/benchmark_analytics.py              # real FAF zip in data/raw
+    python scripts/benchmark_analytics.py --rows 2000000  # synthetic FAF-shaped data
+"""
+import argparse
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from src.etl.enrichment import faf_duckdb, faf_loader
+from src.etl.enrichment.faf_loader import TONS_COLUMNS, VALUE_COLUMNS, freight_tables, load_faf
+
+
+def synthetic_faf(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    fips = list(faf_loader.STATE_FIPS)
+    df = pd.DataFrame({
+        "dms_origst": rng.choice(fips, rows), "dms_destst": rng.choice(fips, rows),
+        "dms_mode": rng.integers(1, 9, rows), "sctg2": rng.integers(1, 43, rows),
+        "trade_type": rng.choice([1, 1, 2, 3], rows),
+    })
+    for col in TONS_COLUMNS + VALUE_COLUMNS:
+        df[col] = rng.gamma(2.0, 50.0, rows).astype("float32")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("faf_synthetic.csv", df.to_csv(index=False))
+
+
+def max_abs_diff(a, b):
+    diff = 0.0
+    for name, table in a.items():
+        num = table.select_dtypes("number").columns
+        if len(num):
+            left = b[name][num].reset_index(drop=True).to_numpy(float)
+            diff = max(diff, float(np.abs(left - table[num].reset_index(drop=True).to_numpy(float)).max()))
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, help="Generate a synthetic FAF zip with this many rows")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="faf_bench_"))
+    if args.rows:
+        faf_loader.RAW_DIR = tmp
+        zip_path = tmp / "faf_synthetic.zip"
+        synthetic_faf(zip_path, args.rows)
+        filename = zip_path.name
+    else:
+        filename = faf_loader.FAF_FILENAME
+        zip_path = faf_loader.download_faf(filename)
+
+    t0 = time.perf_counter()
+    expected = freight_tables(load_faf(filename))
+    t_pandas = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    parquet = faf_duckdb.faf_parquet(zip_path, tmp / "faf.parquet")
+    t_convert = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = faf_duckdb.freight_tables_duckdb(parquet)
+    t_duckdb = time.perf_counter() - t0
+
+    print(f"{'backend':<28}{'seconds':>10}")
+    print(f"{'pandas (load + aggregate)':<28}{t_pandas:>10.2f}")
+    print(f"{'duckdb (csv -> parquet)':<28}{t_convert:>10.2f}")
+    print(f"{'duckdb (aggregate)':<28}{t_duckdb:>10.2f}")
+    print(f"threads={faf_duckdb.DUCKDB_THREADS} memory_limit={faf_duckdb.DUCKDB_MEMORY_LIMIT}")
+    print(f"max |pandas - duckdb| over numeric columns: {max_abs_diff(expected, got):.6g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Backhaul matching: pair outbound lanes with return lanes to cut empty miles.
+
+A truck running lane o_i -> d_i normally returns empty (cost C[d_i, o_i]), and so
+does a truck on lane o_j -> d_j. Pairing them into one tour
+o_i -> d_i -> (empty) o_j -> d_j -> (empty) o_i saves
+    C[d_i, o_i] + C[d_j, o_j] - C[d_i, o_j] - C[d_j, o_i]
+per truckload. Return lanes are indexed by pickup state, so each destination only
+scores return lanes picking up within `max_deadhead_mi`, as one vectorized block.
+"""
+import logging
+import numpy as np
+import pandas as pd
+
+from src.analysis.cost_estimator import TRUCK_PAYLOAD_TONS, route_cost_matrix
+
+logger = logging.getLogger(__name__)
+
+
+class ReturnLaneIndex:
+    """Lanes grouped by origin state (CSR layout) for pickup-state lookups."""
+
+    def __init__(self, origin_idx, n_states):
+        self.order = np.argsort(origin_idx, kind="stable")
+        self.starts = np.searchsorted(origin_idx[self.order], np.arange(n_states + 1))
+
+    def lanes_from(self, pickup_states):
+        """Indices of every lane whose origin is one of `pickup_states`."""
+        if len(pickup_states) == 0:
+            return np.empty(0, dtype=int)
+        return np.concatenate([self.order[self.starts[p]:self.starts[p + 1]] for p in pickup_states])
+
+
+def match_backhauls(df_lanes, df_costs, df_balance=None, top_k=3, max_deadhead_mi=250.0):
+    """Rank the best return lanes for every outbound lane.
+
+    Args:
+        df_lanes: lanes with origin, destination, tons_m (e.g. freight_lanes_truck)
+        df_costs: route costs with origin, destination, driving_mi, total_cost
+        df_balance: optional trade balance (state, net_tons_m) from faf_loader.trade_balance
+        top_k: return lanes kept per outbound lane
+        max_deadhead_mi: maximum empty miles on each repositioning leg
+    Returns:
+        DataFrame of ranked pairings, best first within each outbound lane.
+    """
+    lanes = df_lanes.groupby(["origin", "destination"], as_index=False)["tons_m"].sum()
+    lanes = lanes[(lanes["origin"] != lanes["destination"]) & (lanes["tons_m"] > 0)]
+    states, cost = route_cost_matrix(df_costs)
+    _, miles = route_cost_matrix(df_costs, "driving_mi", states=states)
+    state_index = pd.Index(states)
+    oi = state_index.get_indexer(lanes["origin"])
+    di = state_index.get_indexer(lanes["destination"])
+    known = (oi >= 0) & (di >= 0)
+    lanes, oi, di = lanes[known].reset_index(drop=True), oi[known], di[known]
+    vol = lanes["tons_m"].to_numpy(dtype=float)
+
+    index = ReturnLaneIndex(oi, len(states))
+    near = np.nan_to_num(miles, nan=np.inf) <= max_deadhead_mi
+
+    blocks = []
+    for d in np.unique(di):
+        out = np.flatnonzero(di == d)
+        cand = index.lanes_from(np.flatnonzero(near[d]))
+        if cand.size == 0:
+            continue
+        o_out = oi[out][:, None]
+        o_ret, d_ret = oi[cand][None, :], di[cand][None, :]
+
+        empty_out = cost[d, oi[out]][:, None]
+        empty_ret = cost[d_ret, o_ret]
+        detour = cost[d, o_ret] + cost[d_ret, o_out]
+        savings = empty_out + empty_ret - detour
+        deadhead = miles[d, o_ret] + miles[d_ret, o_out]
+        matched = np.minimum(vol[out][:, None], vol[cand][None, :])
+        score = savings * matched * 1e6 / TRUCK_PAYLOAD_TONS
+
+        valid = ((savings > 0) & (cand[None, :] != out[:, None])
+                 & (miles[d_ret, o_out] <= max_deadhead_mi) & np.isfinite(score))
+        score = np.where(valid, score, -np.inf)
+
+        k = min(top_k, cand.size)
+        top = np.argsort(-score, axis=1)[:, :k]
+        rows = np.repeat(np.arange(len(out)), k)
+        cols = top.ravel()
+        keep = np.isfinite(score[rows, cols])
+        rows, cols = rows[keep], cols[keep]
+        blocks.append(pd.DataFrame({
+            "outbound_origin": lanes["origin"].to_numpy()[out[rows]],
+            "outbound_destination": lanes["destination"].to_numpy()[out[rows]],
+            "return_origin": lanes["origin"].to_numpy()[cand[cols]],
+            "return_destination": lanes["destination"].to_numpy()[cand[cols]],
+            "outbound_tons_m": vol[out[rows]],
+            "return_tons_m": vol[cand[cols]],
+            "matched_tons_m": matched[rows, cols],
+            "deadhead_mi": deadhead[rows, cols].round(1),
+            "detour_cost": detour[rows, cols].round(2),
+            "savings_per_load": savings[rows, cols].round(2),
+            "annual_savings": score[rows, cols].round(0),
+        }))
+
+    if not blocks:
+        return pd.DataFrame()
+    matches = pd.concat(blocks, ignore_index=True)
+    matches = matches.sort_values(["outbound_origin", "outbound_destination", "annual_savings"],
+                                  ascending=[True, True, False])
+    matches["rank"] = matches.groupby(["outbound_origin", "outbound_destination"]).cumcount() + 1
+
+    if df_balance is not None and not df_balance.empty:
+        # Net importers collect inbound trucks: backhaul is most valuable there
+        net = df_balance.set_index("state")["net_tons_m"]
+        matches["dest_net_tons_m"] = matches["outbound_destination"].map(net)
+        matches["pickup_net_tons_m"] = matches["return_origin"].map(net)
+
+    return matches.sort_values(["rank", "annual_savings"], ascending=[True, False]).reset_index(drop=True)
+
+
+def store_backhaul_matches(engine, source_table="freight_lanes_truck", top_k=3, max_deadhead_mi=250.0):
+    """Compute backhaul pairings from DB tables and store them in `backhaul_matches`."""
+    from src.database import read_sql_query, write_df_to_sql
+
+    df_lanes = read_sql_query(f"SELECT origin, destination, tons_m FROM {source_table}", engine)
+    df_costs = read_sql_query(
+        "SELECT origin, destination, driving_mi, total_cost FROM route_costs", engine)
+    if df_lanes.empty or df_costs.empty:
+        logger.warning("No lane volumes or route costs. Run FAF loading and cost estimation first.")
+        return {}
+    try:
+        df_balance = read_sql_query("SELECT state, net_tons_m FROM freight_trade_balance", engine)
+    except Exception as e:
+        logger.warning(f"Trade balance unavailable: {e}")
+        df_balance = None
+
+    matches = match_backhauls(df_lanes, df_costs, df_balance, top_k=top_k,
+                              max_deadhead_mi=max_deadhead_mi)
+    if matches.empty:
+        logger.warning("No backhaul pairings found")
+        return {"matches": 0}
+    write_df_to_sql(matches, "backhaul_matches", engine, if_exists="replace")
+    logger.info(f"Stored {len(matches)} backhaul pairings")
+
+    best = matches[matches["rank"] == 1]
+    return {
+        "matches": len(matches),
+        "lanes_matched": len(best),
+        "annual_savings": best["annual_savings"].sum(),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from pathlib import Path
+    import sys
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from src.database import get_engine
+    r = store_backhaul_matches(get_engine())
+    print(f"Results: {r}")
@@ -11,6 +11,11 @@
 DRIVER_RATE = 35.0
 MAINTENANCE_PER_MI = 0.15
 SPEED_BASELINE = 55.0
+TRUCK_PAYLOAD_TONS = 20.0
+
+# Columns the cost stage actually reads; everything else stays in the database
+ROUTE_COLUMNS = ["origin", "destination", "driving_mi", "driving_hr"]
+LANE_COLUMNS = ["origin", "destination", "commodity", "mode", "tons_2024", "tons_m"]
 
 
 def estimate_route_costs(df_routes, fuel_prices=None):
@@ -62,6 +67,31 @@ def estimate_route_costs(df_routes, fuel_prices=None):
     return pd.DataFrame(rows)
 
 
+def route_cost_matrix(df_costs, value_col="total_cost", states=None):
+    """Pivot a long origin/destination table into a dense square matrix.
+
+    Args:
+        df_costs: DataFrame with origin, destination and `value_col`
+        value_col: column to place in the matrix
+        states: optional state ordering (defaults to sorted union of origins/destinations)
+    Returns:
+        (states, matrix) where matrix[i, j] is the value for states[i] -> states[j].
+        Missing pairs are NaN; the diagonal defaults to 0 when absent.
+    """
+    if states is None:
+        states = sorted(set(df_costs["origin"]) | set(df_costs["destination"]))
+    states = np.asarray(states, dtype=object)
+    n = len(states)
+    matrix = np.full((n, n), np.nan)
+    oi = pd.Index(states).get_indexer(df_costs["origin"])
+    di = pd.Index(states).get_indexer(df_costs["destination"])
+    ok = (oi >= 0) & (di >= 0)
+    matrix[oi[ok], di[ok]] = df_costs[value_col].to_numpy(dtype=float)[ok]
+    diag = np.diag_indices(n)
+    matrix[diag] = np.where(np.isnan(matrix[diag]), 0.0, matrix[diag])
+    return states, matrix
+
+
 def congestion_proxy(df_routes):
     """Compute congestion proxy: ratio of actual time to free-flow time.
     A ratio > 1.3 suggests notable congestion.
@@ -102,44 +132,85 @@ def combined_lane_analysis(df_lanes, df_congested):
     return merged
 
 
+def latest_diesel_prices(engine):
+    """Diesel price per state from the most recent fuel snapshot, as {state: price}."""
+    from src.database import LATEST_FUEL_VIEW, ensure_latest_fuel_view, read_sql_query
+
+    if not ensure_latest_fuel_view(engine):
+        return {}
+    df_fuel = read_sql_query(f"SELECT state, diesel FROM {LATEST_FUEL_VIEW}", engine)
+    if df_fuel.empty:
+        return {}
+    return dict(zip(df_fuel["state"], df_fuel["diesel"], strict=True))
+
+
+def stamp_priced_at(costs, previous=None, now=None):
+    """Add the `priced_at` training watermark to freshly estimated route costs.
+
+    Routes whose cost columns match the stored `previous` route_costs keep their
+    stamp, so an unchanged rebuild adds no new rows for incremental training;
+    new or re-priced routes are stamped with `now`.
+    """
+    now = pd.Timestamp.now() if now is None else now
+    keys = ["origin", "destination"]
+    if previous is None or previous.empty or "priced_at" not in previous.columns:
+        return costs.assign(priced_at=now)
+
+    values = [c for c in costs.columns if c in previous.columns and c not in keys]
+    prev = previous[keys + values + ["priced_at"]].drop_duplicates(keys)
+    merged = costs[keys + values].merge(prev, on=keys, how="left", suffixes=("", "_prev"))
+    same = merged["priced_at"].notna().to_numpy()
+    for c in values:
+        new, old = merged[c], merged[f"{c}_prev"]
+        if pd.api.types.is_numeric_dtype(new) and pd.api.types.is_numeric_dtype(old):
+            same = same & np.isclose(new.to_numpy(float), old.to_numpy(float), equal_nan=True)
+        else:
+            same = same & ((new == old) | (new.isna() & old.isna())).to_numpy()
+    stamps = pd.to_datetime(merged["priced_at"]).where(same, now)
+    return costs.assign(priced_at=stamps.to_numpy())
+
+
 def build_cost_features(engine):
     """Full pipeline: load routes, estimate costs, merge with lanes, store results."""
-    from src.database import read_sql_query, write_df_to_sql
-
-    # Load data
-    df_routes = read_sql_query("SELECT * FROM state_routes", engine)
-    df_lanes = read_sql_query("SELECT * FROM freight_lanes", engine)
-    df_fuel = read_sql_query(
-        "SELECT state, diesel FROM fuel_prices "
-        "WHERE scraped_at = (SELECT MAX(scraped_at) FROM fuel_prices)", engine
-    )
+    from sqlalchemy import inspect
+
+    from src.database import publish_snapshot, read_sql_query, write_df_to_sql
+
+    # Load only the columns used; intra-state (zero-mile) routes are kept so
+    # combined_lane_analysis still matches intrastate FAF lanes
+    df_routes = read_sql_query(f"SELECT {', '.join(ROUTE_COLUMNS)} FROM state_routes", engine)
+    df_lanes = read_sql_query(f"SELECT {', '.join(LANE_COLUMNS)} FROM freight_lanes", engine)
 
     if df_routes.empty:
         logger.warning("No routes data. Run OSRM routing first.")
         return {}
 
     # Fuel price lookup
-    fuel_prices = {}
-    if not df_fuel.empty:
-        for _, r in df_fuel.iterrows():
-            fuel_prices[r["state"]] = {"diesel": r["diesel"]}
-
-    # Cost estimates
-    costs = estimate_route_costs(df_routes, fuel_prices)
-    write_df_to_sql(costs, "route_costs", engine, if_exists="replace")
-    logger.info(f"Stored {len(costs)} route cost estimates")
-
-    # Congestion proxy
-    congested = congestion_proxy(costs)
-    write_df_to_sql(congested, "route_congestion", engine, if_exists="replace")
-    logger.info(f"Stored {len(congested)} congestion proxies")
-
-    # Combined analysis
-    if not df_lanes.empty:
-        combined = combined_lane_analysis(df_lanes, congested)
-        write_df_to_sql(combined, "lane_efficiency", engine, if_exists="replace")
-        logger.info(f"Stored {len(combined)} lane efficiency rankings")
-
+    fuel_prices = {state: {"diesel": price} for state, price in latest_diesel_prices(engine).items()}
+    # Current route_costs, so unchanged routes keep their training watermark
+    previous = (read_sql_query("SELECT * FROM route_costs", engine)
+                if inspect(engine).has_table("route_costs") else None)
+
+    # Publish the cost tables together so readers never mix two runs
+    combined = None
+    with publish_snapshot(engine):
+        # Cost estimates
+        costs = stamp_priced_at(estimate_route_costs(df_routes, fuel_prices), previous)
+        write_df_to_sql(costs, "route_costs", engine, if_exists="replace")
+        logger.info(f"Stored {len(costs)} route cost estimates")
+
+        # Congestion proxy
+        congested = congestion_proxy(costs)
+        write_df_to_sql(congested, "route_congestion", engine, if_exists="replace")
+        logger.info(f"Stored {len(congested)} congestion proxies")
+
+        # Combined analysis
+        if not df_lanes.empty:
+            combined = combined_lane_analysis(df_lanes, congested)
+            write_df_to_sql(combined, "lane_efficiency", engine, if_exists="replace")
+            logger.info(f"Stored {len(combined)} lane efficiency rankings")
+
+    if combined is not None:
         return {
             "routes": len(costs),
             "high_congestion": len(congested[congested["congestion_tier"] == "High"]),
@@ -1,21 +1,140 @@
+import os
+
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from src.analysis.model_registry import find_model, load_latest_model, save_model, training_fingerprint
 from src.database import read_sql_query, write_df_to_sql
 
+MODEL_NAME = "route_cost_linear"
+INCREMENTAL_MODEL_NAME = "route_cost_sgd"
+FEATURES = ["driving_mi", "driving_hr"]
+TARGET = "total_cost"
+PREDICT_CHUNKSIZE = 1_000_000
+FULL_REFIT_EPOCHS = 50
+UPDATE_EPOCHS = 10
+# Update the SGD model in place of the full refit once it exists
+INCREMENTAL = os.getenv("ML_INCREMENTAL") == "1"
+# route_costs column stamping when each row was priced (training watermark)
+WATERMARK = "priced_at"
+
+_loaded_models = {}
+
+
+class IncrementalCostModel:
+    """SGD linear model over standardized features, updatable with partial_fit.
+
+    The scaler is fitted once on the full refit and then frozen, so incremental
+    updates keep the learned weights on a stable scale.
+    """
+
+    def __init__(self, features, random_state=42):
+        self.features = list(features)
+        self.scaler = StandardScaler()
+        self.model = SGDRegressor(learning_rate="invscaling", eta0=0.01, random_state=random_state)
+        self.target_scale = 1.0
+
+    def fit(self, X, y, epochs=FULL_REFIT_EPOCHS):
+        self.scaler.fit(X[self.features])
+        self.target_scale = float(np.abs(y).mean()) or 1.0
+        return self.partial_fit(X, y, epochs)
+
+    def partial_fit(self, X, y, epochs=UPDATE_EPOCHS):
+        Xs = self.scaler.transform(X[self.features])
+        ys = np.asarray(y, dtype=float) / self.target_scale
+        rng = np.random.default_rng(len(ys))
+        for _ in range(epochs):
+            order = rng.permutation(len(ys))
+            self.model.partial_fit(Xs[order], ys[order])
+        return self
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(X[self.features])) * self.target_scale
+
+
+def train_incremental(engine, full_refit=False):
+    """Update the SGD cost model with the route_costs rows priced after its watermark.
+
+    build_cost_features stamps `priced_at` only on routes that are new or whose cost
+    changed; the model stores the newest `priced_at` it has learned, so a run only
+    trains on rows re-priced since then (none when the rebuild changed nothing). A full refit
+    happens when the feature list changed, when no incremental model exists, or on demand.
+    """
+    df = read_sql_query(f"SELECT {', '.join([*FEATURES, TARGET, WATERMARK])} FROM route_costs", engine)
+    if df.empty:
+        print("[ML] No route data, skipping incremental training")
+        return
+
+    try:
+        artifact = None if full_refit else load_latest_model(INCREMENTAL_MODEL_NAME, engine)
+    except LookupError:
+        artifact = None
+    if artifact is not None and artifact["features"] != FEATURES:
+        print("[ML] Feature schema changed, full refit")
+        artifact = None
+
+    priced_at = pd.to_datetime(df[WATERMARK])
+    if artifact is None:
+        new = pd.Series(True, index=df.index)
+        model = IncrementalCostModel(FEATURES).fit(df, df[TARGET])
+        n_trained = 0
+        mode = "full"
+    else:
+        new = priced_at > artifact["watermark"]
+        n_trained = artifact["metrics"]["n_trained"]
+        if not new.any():
+            _loaded_models[INCREMENTAL_MODEL_NAME] = artifact
+            print("[ML] No routes priced since last training watermark")
+            return {**artifact["metrics"], "mode": "unchanged", "n_new": 0}
+        model = artifact["model"]
+        model.partial_fit(df[new], df.loc[new, TARGET])
+        mode = "incremental"
 
-def train_cost_predictor(engine):
-    """Train a linear regression model to predict total_cost from route features."""
-    
-    df = read_sql_query("SELECT * FROM route_costs", engine)
+    batch = df[new]
+    metrics = {
+        "mode": mode,
+        "n_new": int(new.sum()),
+        "n_trained": n_trained + int(new.sum()),
+        "mae": round(mean_absolute_error(batch[TARGET], model.predict(batch)), 2),
+    }
+    print(f"[ML] {mode} update on {metrics['n_new']} routes  |  MAE = ${metrics['mae']}")
+
+    data_hash = training_fingerprint(df, FEATURES, TARGET)
+    save_model(INCREMENTAL_MODEL_NAME, model, FEATURES, data_hash, metrics, engine,
+               extra={"watermark": priced_at.max()})
+    _loaded_models[INCREMENTAL_MODEL_NAME] = load_latest_model(INCREMENTAL_MODEL_NAME, engine)
+    return metrics
+
+
+def train_cost_predictor(engine, force=False, incremental=None):
+    """Train a linear regression model to predict total_cost from route features.
+
+    The fitted model is saved to the model registry. If a model was already trained
+    on identical data and features, it is reused instead of refitting (unless force=True).
+    With incremental=True (default ML_INCREMENTAL=1) the SGD model is updated from
+    newly priced rows instead of refitting (see train_incremental).
+    """
+    if INCREMENTAL if incremental is None else incremental:
+        return train_incremental(engine, full_refit=force)
+
+    df = read_sql_query(f"SELECT {', '.join([*FEATURES, TARGET])} FROM route_costs", engine)
     if df.empty or len(df) < 50:
         print("[ML] Insufficient route data, skipping")
         return
 
-    features = ["driving_mi", "driving_hr"]
-    target = "total_cost"
+    features = FEATURES
+    target = TARGET
+    data_hash = training_fingerprint(df, features, target)
+
+    if not force:
+        cached = find_model(MODEL_NAME, data_hash, features, engine)
+        if cached is not None:
+            _loaded_models[MODEL_NAME] = cached
+            print(f"[ML] Training data unchanged ({data_hash}), reusing registered model")
+            return cached["metrics"]
 
     X = df[features].copy()
     y = df[target].copy()
@@ -57,10 +176,37 @@ def train_cost_predictor(engine):
 
     print(f"[ML] Predictions saved: {len(test_df)} test routes")
 
+    path = save_model(MODEL_NAME, model, features, data_hash, metrics, engine)
+    _loaded_models[MODEL_NAME] = load_latest_model(MODEL_NAME, engine)
+    print(f"[ML] Model registered: {path.name}")
+
     return metrics
 
 
+def predict_costs(df, engine=None, name=MODEL_NAME, chunksize=PREDICT_CHUNKSIZE):
+    """Predict total_cost for a batch of routes or quotes with the registered model.
+
+    The model is loaded from the registry once per process and applied in
+    vectorized chunks of `chunksize` rows.
+    Args:
+        df: DataFrame with the model's feature columns (driving_mi, driving_hr)
+    Returns:
+        Series of predicted costs aligned with df.index.
+    """
+    if name not in _loaded_models:
+        _loaded_models[name] = load_latest_model(name, engine)
+    artifact = _loaded_models[name]
+    model, features = artifact["model"], artifact["features"]
+
+    X = df[features]
+    out = np.empty(len(X))
+    for start in range(0, len(X), chunksize):
+        out[start:start + chunksize] = model.predict(X.iloc[start:start + chunksize])
+    return pd.Series(out, index=df.index, name="predicted_cost")
+
+
 if __name__ == "__main__":
+    import sys
     from src.database import get_engine
     eng = get_engine()
-    train_cost_predictor(eng)
+    train_cost_predictor(eng, force="--full" in sys.argv, incremental="--incremental" in sys.argv or None)
@@ -0,0 +1,180 @@
+"""
+Batch freight quoting over the route cost matrix.
+
+Shipments are (origin, destination, weight, mode) records. Origins and destinations
+are turned into integer indices once, and every per-lane value is gathered from
+dense origin x destination arrays, so pricing is a handful of vectorized numpy ops
+regardless of batch size.
+"""
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.cost_estimator import TRUCK_PAYLOAD_TONS, route_cost_matrix
+from src.etl.enrichment.usda_rates import rate_per_mile_by_state
+
+logger = logging.getLogger(__name__)
+
+# Rough cost of each FAF mode relative to a full truckload on the same lane
+MODE_COST_FACTORS = {
+    "Truck": 1.0, "Rail": 0.45, "Water": 0.3, "Air": 6.0,
+    "Pipeline": 0.2, "Multiple": 0.8, "Parcel": 2.5, "Other": 1.0,
+}
+USDA_BLEND = 0.5          # weight of USDA observed $/mi vs. modelled $/mi
+MIN_LOAD_FRACTION = 0.1   # minimum charge, as a fraction of a truckload
+DEFAULT_CHUNKSIZE = 500_000
+
+
+class RouteCostMatrix:
+    """Dense origin x destination arrays of route distance, time and truckload cost."""
+
+    def __init__(self, df_costs: pd.DataFrame, df_rates: pd.DataFrame = None,
+                 usda_blend: float = USDA_BLEND):
+        self.states, self.miles = route_cost_matrix(df_costs, "driving_mi")
+        _, self.hours = route_cost_matrix(df_costs, "driving_hr", states=self.states)
+        _, self.model_cost = route_cost_matrix(df_costs, "total_cost", states=self.states)
+        usda = rate_per_mile_by_state(df_rates).reindex(self.states)
+        self.usda_rate = usda.to_numpy(dtype=float)
+        self.usda_blend = usda_blend
+        self.truckload_cost = self._blend(self.model_cost)
+        self._state_index = pd.Index(self.states)
+        self._mode_index = pd.Index(list(MODE_COST_FACTORS))
+        self._mode_factor = np.array(list(MODE_COST_FACTORS.values()))
+
+    @classmethod
+    def from_engine(cls, engine, usda_blend: float = USDA_BLEND):
+        """Load `route_costs` and (if present) `truck_rates` from the database."""
+        from src.database import read_sql_query
+
+        df_costs = read_sql_query(
+            "SELECT origin, destination, driving_mi, driving_hr, total_cost FROM route_costs", engine)
+        try:
+            df_rates = read_sql_query(
+                "SELECT year, quarter, origin_state, rate_per_mile FROM truck_rates", engine)
+        except Exception as e:
+            logger.warning(f"truck_rates unavailable, using modelled costs only: {e}")
+            df_rates = None
+        return cls(df_costs, df_rates, usda_blend)
+
+    def _blend(self, model_cost):
+        """Blend modelled $/mi with the USDA origin-state $/mi where one exists.
+
+        Zero-mile (intrastate) lanes have no $/mi to blend and keep the modelled cost.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            model_rate = np.where(self.miles > 0, model_cost / self.miles, 0.0)
+        usda = self.usda_rate[:, None]
+        rate = np.where(np.isfinite(usda),
+                        (1 - self.usda_blend) * model_rate + self.usda_blend * usda,
+                        model_rate)
+        return np.where(self.miles > 0, rate * self.miles, model_cost)
+
+    def index(self, codes) -> np.ndarray:
+        """Integer state indices for an array of codes (-1 where unknown)."""
+        return self._state_index.get_indexer(codes)
+
+    def mode_factor(self, modes) -> np.ndarray:
+        """Relative cost factor per shipment (NaN for unknown modes)."""
+        codes = self._mode_index.get_indexer(modes)
+        return np.where(codes >= 0, self._mode_factor[codes], np.nan)
+
+
+def price_indices(matrix: RouteCostMatrix, oi, di, weight, factor):
+    """Price shipments already resolved to state indices.
+
+    Returns:
+        (driving_mi, truckloads, quote) arrays; unknown lanes are NaN.
+    """
+    valid = (oi >= 0) & (di >= 0)
+    o, d = np.where(valid, oi, 0), np.where(valid, di, 0)
+    miles = np.where(valid, matrix.miles[o, d], np.nan)
+    truckload = np.where(valid, matrix.truckload_cost[o, d], np.nan)
+    loads = np.maximum(np.asarray(weight, dtype=float) / TRUCK_PAYLOAD_TONS, MIN_LOAD_FRACTION)
+    return miles, loads, truckload * loads * factor
+
+
+def quote_shipments(shipments, matrix: RouteCostMatrix) -> pd.DataFrame:
+    """Price a batch of shipments.
+
+    Args:
+        shipments: DataFrame (or dict of arrays) with origin, destination,
+            weight (short tons) and optionally mode (defaults to Truck)
+        matrix: RouteCostMatrix to price against
+    Returns:
+        The input columns plus driving_mi, truckloads and quote ($). Lanes or modes
+        that cannot be priced get a NaN quote.
+    """
+    df = pd.DataFrame(shipments)
+    modes = df["mode"] if "mode" in df.columns else np.full(len(df), "Truck")
+    miles, loads, quote = price_indices(
+        matrix, matrix.index(df["origin"]), matrix.index(df["destination"]),
+        df["weight"].to_numpy(dtype=float), matrix.mode_factor(modes))
+    out = df.copy()
+    out["driving_mi"] = miles
+    out["truckloads"] = loads.round(3)
+    out["quote"] = quote.round(2)
+    return out
+
+
+def iter_shipments(path, chunksize: int = DEFAULT_CHUNKSIZE):
+    """Stream shipments from a CSV or Parquet file in chunks of `chunksize` rows."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def quote_file(input_path, output_path, matrix: RouteCostMatrix = None,
+               chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Quote every shipment in `input_path` and write results to `output_path`.
+
+    Input and output may each be CSV or Parquet; both are processed chunk by chunk.
+    Returns:
+        Number of shipments quoted.
+    """
+    if matrix is None:
+        from src.database import get_engine
+        matrix = RouteCostMatrix.from_engine(get_engine())
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    writer, total = None, 0
+    try:
+        for chunk in iter_shipments(input_path, chunksize):
+            quoted = quote_shipments(chunk, matrix)
+            if output_path.suffix == ".parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(quoted, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                quoted.to_csv(output_path, mode="a" if total else "w", header=not total, index=False)
+            total += len(quoted)
+            logger.info(f"Quoted {total:,} shipments")
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quote shipments from a CSV or Parquet file.")
+    parser.add_argument("input", help="shipments file with origin, destination, weight[, mode]")
+    parser.add_argument("-o", "--output", default="data/final/quotes.csv", help="output CSV or Parquet")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+    n = quote_file(args.input, args.output, chunksize=args.chunksize)
+    print(f"[OK] {n:,} shipments quoted -> {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,313 @@
+"""
+Min-cost flow lane assignment: route FAF truck volumes through capacity-limited hubs.
+
+Every lane (origin -> destination) must be handled by one or more hubs. Handling a
+ton of lane o->d at hub h costs (C[o, h] + C[h, d]) / TRUCK_PAYLOAD_TONS, where C is
+the route cost matrix (per truckload). Since C[h, h] = 0, routing through the origin
+or destination hub is the direct lane cost. Each hub has a throughput capacity; volume
+that cannot be placed is reported as UNSERVED at a penalty cost.
+"""
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+
+from src.analysis.cost_estimator import TRUCK_PAYLOAD_TONS, route_cost_matrix
+
+logger = logging.getLogger(__name__)
+
+INF = float("inf")
+EPS = 1e-9
+COST_TOL = 1e-6
+UNSERVED = "UNSERVED"
+
+
+class MinCostFlow:
+    """Sparse min-cost flow solver (successive shortest paths with node potentials).
+
+    Arcs live in flat lists; arc e and e ^ 1 are a forward/residual pair. Each round
+    runs Dijkstra on reduced costs and then pushes a blocking flow along all
+    zero-reduced-cost arcs, so lanes that do not compete for capacity are routed in
+    a single round instead of one augmentation each.
+    """
+
+    def __init__(self, n_nodes):
+        self.n = n_nodes
+        self.head = []
+        self.cap = []
+        self.cost = []
+        self.adj = [[] for _ in range(n_nodes)]
+        self.potential = [0.0] * n_nodes
+
+    def add_arc(self, u, v, cap, cost):
+        """Add arc u -> v and return its index (costs must be non-negative)."""
+        e = len(self.head)
+        self.head += [v, u]
+        self.cap += [float(cap), 0.0]
+        self.cost += [float(cost), -float(cost)]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def flow(self, e):
+        """Flow currently carried by forward arc e."""
+        return self.cap[e ^ 1]
+
+    def solve(self, source, sink):
+        """Send as much flow as possible from source to sink at minimum cost.
+
+        Returns:
+            (total_flow, total_cost). Final node potentials stay in `self.potential`
+            and form an optimal dual solution.
+        """
+        total_flow = 0.0
+        while True:
+            dist = self._dijkstra(source)
+            if dist[sink] == INF:
+                break
+            reach_max = max(d for d in dist if d < INF)
+            for v in range(self.n):
+                self.potential[v] += dist[v] if dist[v] < INF else reach_max
+            pushed = self._blocking_flow(source, sink)
+            if pushed <= EPS:
+                break
+            total_flow += pushed
+
+        total_cost = sum(self.cost[e] * self.cap[e ^ 1] for e in range(0, len(self.head), 2))
+        return total_flow, total_cost
+
+    def _dijkstra(self, source):
+        head, cap, cost, adj, pot = self.head, self.cap, self.cost, self.adj, self.potential
+        dist = [INF] * self.n
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            pu = pot[u]
+            for e in adj[u]:
+                if cap[e] <= EPS:
+                    continue
+                v = head[e]
+                rc = cost[e] + pu - pot[v]
+                nd = d + rc if rc > 0 else d
+                if nd < dist[v] - EPS:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _blocking_flow(self, source, sink):
+        """Dinic-style blocking flow restricted to zero-reduced-cost arcs."""
+        head, cap, cost, adj, pot = self.head, self.cap, self.cost, self.adj, self.potential
+        total = 0.0
+        while True:
+            level = self._admissible_levels(source)
+            if level[sink] < 0:
+                return total
+            it = [0] * self.n
+            stack, path = [source], []
+            while stack:
+                u = stack[-1]
+                if u == sink:
+                    push = min(cap[e] for e in path)
+                    for e in path:
+                        cap[e] -= push
+                        cap[e ^ 1] += push
+                    total += push
+                    # Retreat to the tail of the first saturated arc and continue
+                    cut = next(i for i, e in enumerate(path) if cap[e] <= EPS)
+                    del stack[cut + 1:], path[cut:]
+                    continue
+                arcs, pu, lu = adj[u], pot[u], level[u] + 1
+                i = it[u]
+                while i < len(arcs):
+                    e = arcs[i]
+                    v = head[e]
+                    if cap[e] > EPS and level[v] == lu and abs(cost[e] + pu - pot[v]) <= COST_TOL:
+                        break
+                    i += 1
+                it[u] = i
+                if i < len(arcs):
+                    stack.append(head[arcs[i]])
+                    path.append(arcs[i])
+                else:
+                    level[u] = -1
+                    stack.pop()
+                    if path:
+                        path.pop()
+                        it[stack[-1]] += 1
+
+    def _admissible_levels(self, source):
+        head, cap, cost, adj, pot = self.head, self.cap, self.cost, self.adj, self.potential
+        level = [-1] * self.n
+        level[source] = 0
+        queue = [source]
+        for u in queue:
+            pu, lu = pot[u], level[u] + 1
+            for e in adj[u]:
+                v = head[e]
+                if level[v] < 0 and cap[e] > EPS and abs(cost[e] + pu - pot[v]) <= COST_TOL:
+                    level[v] = lu
+                    queue.append(v)
+        return level
+
+
+def _lane_volumes(df_flows, volume_col, include_intrastate):
+    lanes = df_flows.groupby(["origin", "destination"], as_index=False)[volume_col].sum()
+    if not include_intrastate:
+        lanes = lanes[lanes["origin"] != lanes["destination"]]
+    return lanes[lanes[volume_col] > 0].reset_index(drop=True)
+
+
+def _hub_capacities(hub_states, hub_capacity):
+    if hub_capacity is None:
+        return np.full(len(hub_states), INF)
+    if isinstance(hub_capacity, dict):
+        return np.array([float(hub_capacity.get(h, INF)) for h in hub_states])
+    return np.full(len(hub_states), float(hub_capacity))
+
+
+def optimize_lane_assignment(df_flows, df_costs, hub_capacity=None, hubs=None,
+                             max_hubs_per_lane=5, volume_col="tons_m",
+                             include_intrastate=False, unserved_penalty=None):
+    """Assign lane volumes to hubs at minimum total cost under hub capacity limits.
+
+    Args:
+        df_flows: lane volumes with origin, destination and `volume_col`
+            (e.g. freight_lanes_truck or the full FAF OD matrix)
+        df_costs: route costs with origin, destination, total_cost (per truckload)
+        hub_capacity: None (unlimited), a number applied to every hub, or
+            a dict of {state: capacity} in `volume_col` units
+        hubs: candidate hub states (defaults to every state in the cost matrix)
+        max_hubs_per_lane: cheapest candidate hubs kept per lane (plus the lane's
+            own origin and destination), which keeps the network sparse
+        unserved_penalty: $/ton for volume no hub can absorb (defaults to 10x the
+            most expensive candidate)
+    Returns:
+        (assignment, shadow_prices). `assignment` has one row per lane/hub with flow;
+        `shadow_prices` gives hub throughput, utilization and the marginal saving
+        ($/ton) of one more unit of capacity.
+    """
+    lanes = _lane_volumes(df_flows, volume_col, include_intrastate)
+    states, cost = route_cost_matrix(df_costs)
+    if hubs is None:
+        hubs = states
+    hub_states = np.array([h for h in hubs if h in set(states)], dtype=object)
+    hub_idx = pd.Index(states).get_indexer(hub_states)
+
+    oi = pd.Index(states).get_indexer(lanes["origin"])
+    di = pd.Index(states).get_indexer(lanes["destination"])
+    known = (oi >= 0) & (di >= 0)
+    if not known.all():
+        logger.warning(f"{(~known).sum()} lanes without route costs skipped")
+        lanes, oi, di = lanes[known].reset_index(drop=True), oi[known], di[known]
+
+    # $/ton of handling lane l through hub h: (C[o, h] + C[h, d]) / payload
+    via = (cost[oi][:, hub_idx] + cost[hub_idx][:, di].T) / TRUCK_PAYLOAD_TONS
+    order = np.argsort(np.where(np.isnan(via), INF, via), axis=1)[:, :max_hubs_per_lane]
+    finite = via[np.isfinite(via)]
+    if unserved_penalty is None:
+        unserved_penalty = 10 * finite.max() if finite.size else 1e6
+
+    n_lanes, n_hubs = len(lanes), len(hub_states)
+    source, sink = 0, 1
+    lane_node = 2 + np.arange(n_lanes)
+    hub_node = 2 + n_lanes + np.arange(n_hubs)
+    net = MinCostFlow(2 + n_lanes + n_hubs)
+
+    volumes = lanes[volume_col].to_numpy(dtype=float)
+    # Every lane ends up fully served or UNSERVED, so a per-lane constant on its
+    # source arc does not change the optimum. Offsetting each lane by its cheapest
+    # option puts all lanes at the same distance, and the first round routes every
+    # lane that does not compete for capacity at once.
+    cheapest = np.minimum(np.take_along_axis(via, order[:, :1], axis=1)[:, 0], unserved_penalty)
+    cheapest = np.where(np.isfinite(cheapest), cheapest, unserved_penalty)
+    offset = cheapest.max() - cheapest if n_lanes else cheapest
+    pos_of_state = {s: k for k, s in enumerate(hub_states)}
+    lane_arcs = []
+    for lane in range(n_lanes):
+        net.add_arc(source, lane_node[lane], volumes[lane], offset[lane])
+        candidates = set(order[lane].tolist())
+        for s in (lanes.at[lane, "origin"], lanes.at[lane, "destination"]):
+            if s in pos_of_state:
+                candidates.add(pos_of_state[s])
+        for k in sorted(candidates):
+            if np.isfinite(via[lane, k]):
+                lane_arcs.append((lane, k, net.add_arc(lane_node[lane], hub_node[k], INF, via[lane, k])))
+        lane_arcs.append((lane, -1, net.add_arc(lane_node[lane], sink, INF, unserved_penalty)))
+
+    capacities = _hub_capacities(hub_states, hub_capacity)
+    hub_arcs = [net.add_arc(hub_node[k], sink, capacities[k], 0.0) for k in range(n_hubs)]
+
+    net.solve(source, sink)
+    pot = net.potential
+    total_cost = sum(net.flow(e) * net.cost[e] for _, _, e in lane_arcs)
+    # tons_m volumes are millions of tons; anything else is taken as tons
+    scale = 1e6 if volume_col == "tons_m" else 1.0
+    logger.info(f"Lane assignment: {n_lanes} lanes, {n_hubs} hubs, "
+                f"{len(net.head) // 2} arcs, cost ${total_cost * scale:,.0f}")
+
+    rows = []
+    for lane, k, e in lane_arcs:
+        flow = net.flow(e)
+        if flow <= EPS:
+            continue
+        unit = net.cost[e]
+        rows.append({
+            "origin": lanes.at[lane, "origin"],
+            "destination": lanes.at[lane, "destination"],
+            "hub": hub_states[k] if k >= 0 else UNSERVED,
+            volume_col: round(flow, 4),
+            "unit_cost": round(unit, 4),
+            "cost_usd": round(flow * unit * scale, 2),
+            "marginal_cost": round(pot[sink] - pot[lane_node[lane]], 4),
+        })
+    assignment = pd.DataFrame(rows)
+
+    throughput = np.array([net.flow(e) for e in hub_arcs])
+    shadow_prices = pd.DataFrame({
+        "hub": hub_states,
+        "capacity": capacities,
+        "throughput": throughput.round(4),
+        "utilization": np.where(np.isfinite(capacities) & (capacities > 0),
+                                throughput / np.where(capacities > 0, capacities, 1), 0).round(4),
+        "shadow_price": [round(max(pot[sink] - pot[hub_node[k]], 0.0), 4) for k in range(n_hubs)],
+    }).sort_values("shadow_price", ascending=False).reset_index(drop=True)
+
+    return assignment, shadow_prices
+
+
+def store_lane_assignment(engine, source_table="freight_lanes_truck", hub_capacity=None):
+    """Solve the lane assignment from DB tables and store `lane_assignment` and
+    `hub_shadow_prices`."""
+    from src.database import read_sql_query, write_df_to_sql
+
+    df_flows = read_sql_query(f"SELECT origin, destination, tons_m FROM {source_table}", engine)
+    df_costs = read_sql_query("SELECT origin, destination, total_cost FROM route_costs", engine)
+    if df_flows.empty or df_costs.empty:
+        logger.warning("No lane volumes or route costs. Run FAF loading and cost estimation first.")
+        return {}
+
+    assignment, shadow_prices = optimize_lane_assignment(df_flows, df_costs, hub_capacity=hub_capacity)
+    write_df_to_sql(assignment, "lane_assignment", engine, if_exists="replace")
+    write_df_to_sql(shadow_prices, "hub_shadow_prices", engine, if_exists="replace")
+    logger.info(f"Stored {len(assignment)} lane assignments, {len(shadow_prices)} hub shadow prices")
+
+    unserved = assignment[assignment["hub"] == UNSERVED] if not assignment.empty else assignment
+    return {
+        "assignments": len(assignment),
+        "total_cost": assignment["cost_usd"].sum() if not assignment.empty else 0.0,
+        "unserved_tons_m": unserved["tons_m"].sum() if not unserved.empty else 0.0,
+        "binding_hubs": int((shadow_prices["shadow_price"] > 0).sum()),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from pathlib import Path
+    import sys
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from src.database import get_engine
+    r = store_lane_assignment(get_engine())
+    print(f"Results: {r}")
@@ -0,0 +1,95 @@
+"""
+Persisted model registry for the cost models.
+
+Fitted estimators are saved with joblib under MODEL_DIR, each tagged with a hash of
+its training data and feature list. The `ml_model_registry` table records every
+saved model, so an unchanged training set can reuse the stored model instead of
+refitting, and batch inference can load a model without retraining.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import joblib
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from src.database import write_df_to_sql
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(os.getenv("MODEL_DIR", Path(__file__).resolve().parents[2] / "data" / "models"))
+REGISTRY_TABLE = "ml_model_registry"
+
+
+def training_fingerprint(df, features, target):
+    """Hash of the training rows (features + target) and the feature list."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"features": list(features), "target": target}).encode())
+    h.update(pd.util.hash_pandas_object(df[[*features, target]], index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def save_model(name, model, features, data_hash, metrics, engine, extra=None):
+    """Persist a fitted model and register it. Returns the artifact path."""
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    path = MODEL_DIR / f"{name}-{data_hash}.joblib"
+    artifact = {"name": name, "model": model, "features": list(features),
+                "data_hash": data_hash, "metrics": metrics, **(extra or {})}
+    tmp = path.with_suffix(".tmp")
+    joblib.dump(artifact, tmp)
+    os.replace(tmp, path)
+
+    entry = pd.DataFrame([{
+        "name": name,
+        "data_hash": data_hash,
+        "features": ",".join(features),
+        "estimator": type(model).__name__,
+        "path": str(path),
+        "metrics": json.dumps(metrics, default=float),
+        "created_at": pd.Timestamp.now(),
+    }])
+    write_df_to_sql(entry, REGISTRY_TABLE, engine, if_exists="append")
+    return path
+
+
+def _registry(engine, name):
+    """Registered models for `name` whose artifact still exists, newest first.
+
+    An empty frame means no model was registered yet; any other database error is
+    logged and raised, so a broken registry never looks like "no model".
+    """
+    if not inspect(engine).has_table(REGISTRY_TABLE):
+        return pd.DataFrame()
+    query = text(f"SELECT name, data_hash, features, path, created_at FROM {REGISTRY_TABLE} "
+                 "WHERE name = :name ORDER BY created_at DESC").bindparams(name=name)
+    try:
+        with engine.connect() as conn:
+            df = pd.read_sql_query(query, conn)
+    except Exception:
+        logger.exception(f"Could not read {REGISTRY_TABLE} for model '{name}'")
+        raise
+    return df[df["path"].map(lambda p: Path(p).exists())]
+
+
+def find_model(name, data_hash, features, engine):
+    """Load the registered model trained on exactly this data and feature list, if any."""
+    reg = _registry(engine, name)
+    if reg.empty:
+        return None
+    hit = reg[(reg["data_hash"] == data_hash) & (reg["features"] == ",".join(features))]
+    if hit.empty:
+        return None
+    return joblib.load(hit.iloc[0]["path"])
+
+
+def load_latest_model(name, engine=None):
+    """Load the most recently registered model for `name`."""
+    from src.database import get_engine
+
+    reg = _registry(engine or get_engine(), name)
+    if reg.empty:
+        raise LookupError(f"No registered model '{name}'. Run train_cost_predictor first.")
+    return joblib.load(reg.iloc[0]["path"])
@@ -0,0 +1,163 @@
+"""
+Cross-validated model selection for route cost prediction.
+
+Every (estimator, feature set, fold) combination is an independent task run on a
+process pool. The feature matrix is built once, saved as a .npy file keyed by its
+content hash, and memory-mapped by each worker, so tasks only ship column and fold
+indices. The leaderboard (best first) replaces `ml_model_selection` (`ml_metrics`
+stays with the model behind `ml_predictions`), and the winning configuration is refitted on all rows and saved to the model registry.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.analysis import model_registry
+from src.analysis.cost_estimator import congestion_proxy
+
+logger = logging.getLogger(__name__)
+
+TARGET = "total_cost"
+FEATURE_SETS = {
+    "base": ["driving_mi", "driving_hr"],
+    "rich": ["driving_mi", "driving_hr", "diesel_price", "congestion_ratio", "tons_m"],
+}
+CANDIDATES = {
+    "linear": lambda: LinearRegression(),
+    "ridge": lambda: make_pipeline(StandardScaler(), Ridge(alpha=1.0)),
+    "gradient_boosting": lambda: GradientBoostingRegressor(n_estimators=200, max_depth=3,
+                                                           random_state=42),
+}
+SELECTED_MODEL_NAME = "route_cost_selected"
+LEADERBOARD_TABLE = "ml_model_selection"
+N_FOLDS = 5
+
+
+def build_feature_frame(engine):
+    """Route costs joined with congestion ratio and truck lane volume."""
+    from src.database import read_sql_query
+
+    df = read_sql_query(
+        "SELECT origin, destination, driving_mi, driving_hr, diesel_price, total_cost "
+        "FROM route_costs WHERE driving_mi > 0", engine)
+    df = congestion_proxy(df)
+    try:
+        lanes = read_sql_query("SELECT origin, destination, tons_m FROM freight_lanes_truck", engine)
+        lanes = lanes.groupby(["origin", "destination"], as_index=False)["tons_m"].sum()
+        df = df.merge(lanes, on=["origin", "destination"], how="left")
+    except Exception as e:
+        logger.warning(f"Truck lanes unavailable, tons_m set to 0: {e}")
+        df["tons_m"] = 0.0
+    df["tons_m"] = df["tons_m"].fillna(0.0)
+    df["diesel_price"] = df["diesel_price"].fillna(df["diesel_price"].median())
+    return df
+
+
+def cache_feature_matrix(df):
+    """Save the numeric features + target as a .npy keyed by content hash.
+
+    Returns:
+        (path, columns) where columns maps each array column to its name.
+    """
+    columns = [*sorted({c for cols in FEATURE_SETS.values() for c in cols}), TARGET]
+    data_hash = model_registry.training_fingerprint(df, columns[:-1], TARGET)
+    model_registry.MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    path = model_registry.MODEL_DIR / f"features-{data_hash}.npy"
+    if not path.exists():
+        tmp = path.with_suffix(".tmp.npy")
+        np.save(tmp, df[columns].to_numpy(dtype=float))
+        os.replace(tmp, path)
+    return path, columns
+
+
+def _score_fold(path, col_idx, candidate, fold, n_folds):
+    """Fit one candidate on one fold of the cached matrix (runs in a worker)."""
+    data = np.load(path, mmap_mode="r")
+    X, y = np.asarray(data[:, col_idx]), np.asarray(data[:, -1])
+    train, test = list(KFold(n_folds, shuffle=True, random_state=42).split(X))[fold]
+    start = time.perf_counter()
+    model = CANDIDATES[candidate]().fit(X[train], y[train])
+    pred = model.predict(X[test])
+    return {
+        "r2": r2_score(y[test], pred),
+        "mae": mean_absolute_error(y[test], pred),
+        "rmse": float(np.sqrt(mean_squared_error(y[test], pred))),
+        "n_test": len(test),
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+def select_cost_model(df, n_folds=N_FOLDS, n_jobs=None):
+    """Evaluate every candidate x feature set with k-fold CV.
+
+    Args:
+        df: feature frame from build_feature_frame
+        n_jobs: worker processes (default: all cores; 1 runs in-process)
+    Returns:
+        Leaderboard DataFrame sorted by mean R², best first.
+    """
+    path, columns = cache_feature_matrix(df)
+    tasks = [(model, fs, fold) for model in CANDIDATES for fs in FEATURE_SETS for fold in range(n_folds)]
+    args = [(str(path), [columns.index(c) for c in FEATURE_SETS[fs]], model, fold, n_folds)
+            for model, fs, fold in tasks]
+
+    n_jobs = n_jobs or os.cpu_count()
+    if n_jobs == 1:
+        results = [_score_fold(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_score_fold, *zip(*args, strict=True)))
+
+    scores = pd.DataFrame(results)
+    scores["model"] = [t[0] for t in tasks]
+    scores["features"] = [t[1] for t in tasks]
+    board = scores.groupby(["model", "features"], as_index=False).agg(
+        r2=("r2", "mean"), r2_std=("r2", "std"), mae=("mae", "mean"), rmse=("rmse", "mean"),
+        n_test=("n_test", "mean"), fit_seconds=("fit_seconds", "sum"))
+    board["folds"] = n_folds
+    board = board.sort_values("r2", ascending=False).reset_index(drop=True)
+    board["n_test"] = board["n_test"].round().astype(int)  # mean test rows per fold
+    return board.round({"r2": 4, "r2_std": 4, "mae": 2, "rmse": 2, "fit_seconds": 3})
+
+
+def run_model_selection(engine, n_folds=N_FOLDS, n_jobs=None):
+    """Run CV model selection, store the leaderboard in `ml_model_selection` and register the winner."""
+    from src.database import write_df_to_sql
+
+    df = build_feature_frame(engine)
+    if len(df) < n_folds * 10:
+        logger.warning("Insufficient route data for model selection, skipping")
+        return None
+
+    start = time.perf_counter()
+    board = select_cost_model(df, n_folds=n_folds, n_jobs=n_jobs)
+    write_df_to_sql(board, LEADERBOARD_TABLE, engine, if_exists="replace")
+    best = board.iloc[0]
+    logger.info(f"Model selection: {len(board)} configurations x {n_folds} folds "
+                f"in {time.perf_counter() - start:.1f}s, best {best['model']}/{best['features']}")
+
+    features = FEATURE_SETS[best["features"]]
+    model = CANDIDATES[best["model"]]().fit(df[features], df[TARGET])
+    metrics = best[["r2", "mae", "rmse", "n_test"]].to_dict()
+    model_registry.save_model(SELECTED_MODEL_NAME, model, features,
+                              model_registry.training_fingerprint(df, features, TARGET), metrics,
+                              engine, extra={"candidate": best["model"], "feature_set": best["features"]})
+    return board
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from pathlib import Path
+    import sys
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from src.database import get_engine
+    print(run_model_selection(get_engine()))
@@ -0,0 +1,158 @@
+# src/api/quote_service.py
+"""
+Long-lived single-quote service for order entry.
+
+Route distances/times, the latest diesel price per state and the USDA rate index are
+loaded once into a RouteCostMatrix. Point quotes are scalar array lookups behind an
+LRU cache keyed by (origin, destination, weight, mode). A background thread polls
+the `table_versions` counters of `route_costs` and `fuel_prices` and swaps in a fresh
+snapshot (and an empty cache) when either table changes.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+
+from src.analysis.cost_estimator import (
+    TRUCK_PAYLOAD_TONS, estimate_route_costs, latest_diesel_prices,
+)
+from src.analysis.freight_quotes import MIN_LOAD_FRACTION, MODE_COST_FACTORS, RouteCostMatrix
+from src.database import get_engine, read_sql_query, table_versions
+
+logger = logging.getLogger(__name__)
+
+WATCHED_TABLES = ["route_costs", "fuel_prices"]
+
+
+class _Snapshot:
+    """Immutable pricing state; replaced wholesale on reload."""
+
+    def __init__(self, matrix: RouteCostMatrix, signature: tuple, cache_size: int):
+        self.matrix = matrix
+        self.signature = signature
+        self.state_pos = {s: i for i, s in enumerate(matrix.states)}
+        self.loaded_at = time.time()
+        self.price = lru_cache(maxsize=cache_size)(self._price)
+
+    def _price(self, origin, destination, weight, mode):
+        o = self.state_pos.get(origin)
+        d = self.state_pos.get(destination)
+        factor = MODE_COST_FACTORS.get(mode)
+        if o is None or d is None or factor is None:
+            return None
+        truckload = float(self.matrix.truckload_cost[o, d])
+        if np.isnan(truckload):
+            return None
+        loads = max(weight / TRUCK_PAYLOAD_TONS, MIN_LOAD_FRACTION)
+        return (float(self.matrix.miles[o, d]), float(self.matrix.hours[o, d]),
+                round(loads, 3), round(truckload * loads * factor, 2))
+
+
+class QuoteService:
+    """Sub-millisecond point quotes from preloaded arrays, with hot reload and latency metrics."""
+
+    def __init__(self, engine=None, cache_size: int = 65_536, reload_interval: float = 30.0,
+                 latency_window: int = 100_000):
+        self.engine = engine or get_engine()
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self._latencies = deque(maxlen=latency_window)
+        self._latency_lock = threading.Lock()
+        self._reloads = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = self._load(self._signature())
+
+    # ── Loading ──
+    def _signature(self):
+        versions = table_versions(self.engine, WATCHED_TABLES)
+        return tuple((table, versions.get(table)) for table in WATCHED_TABLES)
+
+    def _load(self, signature):
+        df_routes = read_sql_query(
+            "SELECT origin, destination, driving_mi, driving_hr FROM route_costs", self.engine)
+        diesel = latest_diesel_prices(self.engine)
+        try:
+            df_rates = read_sql_query(
+                "SELECT year, quarter, origin_state, rate_per_mile FROM truck_rates", self.engine)
+        except Exception:
+            df_rates = None
+
+        # Reprice with today's diesel: route_costs may have been built on older prices
+        df_costs = estimate_route_costs(df_routes, {s: {"diesel": p} for s, p in diesel.items()})
+        matrix = RouteCostMatrix(df_costs, df_rates)
+        logger.info(f"Quote service loaded: {len(matrix.states)} states, "
+                    f"{len(diesel)} diesel prices")
+        return _Snapshot(matrix, signature, self.cache_size)
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload if `route_costs` or `fuel_prices` changed (or always with force=True)."""
+        signature = self._signature()
+        if not force and signature == self._snapshot.signature:
+            return False
+        self._snapshot = self._load(signature)
+        self._reloads += 1
+        return True
+
+    def start(self):
+        """Poll for table changes every `reload_interval` seconds in a daemon thread."""
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="quote-service-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.warning(f"Quote service reload failed, keeping previous snapshot: {e}")
+
+    # ── Quoting ──
+    def quote(self, origin: str, destination: str, weight: float = TRUCK_PAYLOAD_TONS,
+              mode: str = "Truck"):
+        """Quote one shipment. Returns None when the lane or mode cannot be priced."""
+        start = time.perf_counter()
+        snapshot = self._snapshot
+        priced = snapshot.price(origin, destination, float(weight), mode)
+        with self._latency_lock:
+            self._latencies.append(time.perf_counter() - start)
+        if priced is None:
+            return None
+        miles, hours, loads, quote = priced
+        return {"origin": origin, "destination": destination, "weight": weight, "mode": mode,
+                "driving_mi": miles, "driving_hr": hours, "truckloads": loads, "quote": quote}
+
+    def metrics(self) -> dict:
+        """Latency percentiles (ms) over the last `latency_window` quotes, plus cache stats."""
+        with self._latency_lock:
+            lat = np.array(self._latencies) * 1000
+        info = self._snapshot.price.cache_info()
+        return {
+            "quotes": len(lat),
+            "p50_ms": round(float(np.percentile(lat, 50)), 4) if len(lat) else None,
+            "p99_ms": round(float(np.percentile(lat, 99)), 4) if len(lat) else None,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+            "reloads": self._reloads,
+            "loaded_at": self._snapshot.loaded_at,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    service = QuoteService()
+    print(service.quote("CA", "TX"))
+    print(service.metrics())
@@ -1,3 +1,17 @@
-from .database import get_engine, get_raw_connection, write_df_to_sql, read_sql_query
+from .bulk import bulk_write, publish_snapshot, staged_load
+from .database import (get_engine, get_raw_connection, write_df_to_sql, read_sql_query,
+                       iter_sql_chunks)
+from .cache import VERSIONS_TABLE, cache_stats, clear_query_cache, table_versions
+from .indexes import INDEX_SPEC, ensure_all_indexes, missing_indexes
+from .schema import TABLE_SCHEMAS, migrate
+from .fuel_history import (LATEST_FUEL_VIEW, append_fuel_snapshot, compact_fuel_history,
+                           current_fuel_table, ensure_latest_fuel_view, fuel_prices_as_of,
+                           join_fuel_as_of)
 
-__all__ = ["get_engine", "get_raw_connection", "write_df_to_sql", "read_sql_query"]
+__all__ = ["INDEX_SPEC", "LATEST_FUEL_VIEW", "TABLE_SCHEMAS", "VERSIONS_TABLE",
+           "append_fuel_snapshot", "bulk_write", "cache_stats", "clear_query_cache",
+           "compact_fuel_history", "current_fuel_table", "ensure_all_indexes",
+           "ensure_latest_fuel_view", "fuel_prices_as_of", "get_engine",
+           "get_raw_connection", "iter_sql_chunks", "join_fuel_as_of", "migrate",
+           "missing_indexes", "publish_snapshot", "read_sql_query", "staged_load",
+           "table_versions", "write_df_to_sql"]
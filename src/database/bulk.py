@@ -0,0 +1,278 @@
+# src/database/bulk.py
+"""
+Carga masiva de DataFrames con la ruta más rápida de cada dialecto.
+
+- PostgreSQL (psycopg2): COPY FROM STDIN en lotes CSV.
+- SQLite: executemany por lotes dentro de una única transacción, con pragmas de carga.
+- Resto: INSERT multi-fila de pandas.
+
+El esquema de la tabla lo crea pandas (a partir de df.head(0)) con los tipos declarados
+en schema.TABLE_SCHEMAS, y las columnas diccionario se guardan como códigos. `replace` carga en <tabla>__staging y la intercambia con
+DROP + RENAME en una transacción corta, así los lectores nunca ven la tabla vacía o a
+medio escribir. `upsert` borra las claves entrantes e inserta las filas nuevas en la
+misma transacción. Tras cada carga se aplican los índices de indexes.INDEX_SPEC y se
+incrementa la versión de la tabla (cache.py).
+"""
+import csv
+import io
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+from .cache import bump_version
+from .indexes import STAGING_SUFFIX, ensure_indexes, rename_indexes
+from .schema import encode_frame
+
+logger = logging.getLogger(__name__)
+
+BATCH_ROWS = 50_000
+KEY_BATCH = 500
+# temp_store no puede cambiarse dentro de una transacción: lo fija _build_engine al conectar
+SQLITE_LOAD_PRAGMAS = ["PRAGMA cache_size = -65536"]
+COPY_NULL = "\\N"
+_snapshot = threading.local()
+# Mismo formato que usa pandas/SQLAlchemy al guardar datetimes en SQLite
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _placeholder(conn):
+    return "?" if conn.dialect.paramstyle == "qmark" else "%s"
+
+
+def _python_rows(df):
+    """Filas como tuplas de valores Python nativos (None para nulos, texto ISO para fechas)."""
+    cols = []
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            col = col.dt.strftime(DATETIME_FORMAT).astype(object).where(col.notna(), None)
+        else:
+            col = col.astype(object).where(col.notna(), None)
+        cols.append(col.tolist())
+    return list(zip(*cols, strict=True))
+
+
+def _insert_executemany(conn, table, df):
+    cols = ", ".join(_quote(conn, c) for c in df.columns)
+    marks = ", ".join([_placeholder(conn)] * len(df.columns))
+    sql = f"INSERT INTO {_quote(conn, table)} ({cols}) VALUES ({marks})"
+    if conn.dialect.name == "sqlite":
+        for pragma in SQLITE_LOAD_PRAGMAS:
+            conn.exec_driver_sql(pragma)
+    for start in range(0, len(df), BATCH_ROWS):
+        conn.exec_driver_sql(sql, _python_rows(df.iloc[start:start + BATCH_ROWS]))
+
+
+def _insert_copy(conn, table, df):
+    cols = ", ".join(_quote(conn, c) for c in df.columns)
+    sql = f"COPY {_quote(conn, table)} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        for start in range(0, len(df), BATCH_ROWS):
+            buf = io.StringIO()
+            df.iloc[start:start + BATCH_ROWS].to_csv(buf, index=False, header=False,
+                                                     na_rep=COPY_NULL, quoting=csv.QUOTE_MINIMAL)
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+
+
+def _delete_keys(conn, table, df, keys):
+    """Borra las filas cuya clave aparece en df, por lotes de (k1, k2) IN (VALUES ...)."""
+    key_cols = ", ".join(_quote(conn, k) for k in keys)
+    mark = "(" + ", ".join([_placeholder(conn)] * len(keys)) + ")"
+    values = list(dict.fromkeys(_python_rows(df[keys])))
+    for start in range(0, len(values), KEY_BATCH):
+        batch = values[start:start + KEY_BATCH]
+        sql = (f"DELETE FROM {_quote(conn, table)} WHERE ({key_cols}) IN "
+               f"(VALUES {', '.join([mark] * len(batch))})")
+        conn.exec_driver_sql(sql, tuple(v for row in batch for v in row))
+
+
+def load_method(dialect) -> str:
+    """Cargador más rápido del dialecto: copy, executemany o to_sql."""
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        return "copy"
+    return "executemany" if dialect.name == "sqlite" else "to_sql"
+
+
+def _insert(conn, table, df, method):
+    if not len(df):
+        return
+    if method == "copy":
+        _insert_copy(conn, table, df)
+    elif method == "executemany":
+        _insert_executemany(conn, table, df)
+    else:
+        df.to_sql(table, conn, if_exists="append", index=False, method="multi", chunksize=1000)
+
+
+def _drop(conn, table):
+    if inspect(conn).has_table(table):
+        conn.exec_driver_sql(f"DROP TABLE {_quote(conn, table)}")
+
+
+def _swap_in(conn, name):
+    """Sustituye `name` por su tabla de staging (DROP + RENAME) en la transacción de `conn`."""
+    staging = name + STAGING_SUFFIX
+    sqlite = conn.dialect.name == "sqlite"
+    if sqlite:
+        # pysqlite no abre transacción antes de DDL: el SAVEPOINT la abre y el commit
+        # del engine la cierra. legacy_alter_table evita que el RENAME reescriba vistas.
+        conn.exec_driver_sql("SAVEPOINT table_swap")
+        conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    _drop(conn, name)
+    conn.exec_driver_sql(f"ALTER TABLE {_quote(conn, staging)} RENAME TO {_quote(conn, name)}")
+    if sqlite:
+        conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+        ensure_indexes(conn, name)
+    else:
+        rename_indexes(conn, staging, name)
+    bump_version(conn, name)
+
+
+def _load_staging(engine, name, df, method):
+    """Carga `df` completo en <name>__staging, en su propia transacción."""
+    staging = name + STAGING_SUFFIX
+    with engine.begin() as conn:
+        df, dtype = encode_frame(conn, name, df)
+        _drop(conn, staging)
+        df.head(0).to_sql(staging, conn, index=False, dtype=dtype)
+        _insert(conn, staging, df, method)
+        if conn.dialect.name != "sqlite":
+            ensure_indexes(conn, staging, spec_table=name)
+
+
+@contextmanager
+def publish_snapshot(engine):
+    """Publica juntas todas las tablas escritas con replace dentro del bloque.
+
+    Cada replace se carga en su tabla de staging y, al salir sin error, todas se
+    intercambian en una única transacción: los lectores ven o todas las tablas
+    anteriores o todas las nuevas. Si el bloque falla se descartan los staging.
+    """
+    if getattr(_snapshot, "tables", None) is not None:
+        yield  # anidado: publica el bloque exterior
+        return
+    _snapshot.tables = []
+    try:
+        yield
+        tables = list(dict.fromkeys(_snapshot.tables))
+        if tables:
+            with engine.begin() as conn:
+                for name in tables:
+                    _swap_in(conn, name)
+            logger.info(f"Snapshot publicado: {', '.join(tables)}")
+    except Exception:
+        with engine.begin() as conn:
+            for name in _snapshot.tables:
+                _drop(conn, name + STAGING_SUFFIX)
+        raise
+    finally:
+        _snapshot.tables = None
+
+
+@contextmanager
+def staged_load(engine, name):
+    """Carga `name` por bloques en <name>__staging y la publica con un único swap.
+
+    Los lectores siguen viendo la tabla anterior hasta el final; si el bloque falla
+    se descarta el staging y la tabla queda intacta. Dentro de publish_snapshot el
+    swap se une al del snapshot.
+    Yields:
+        write(df): añade un bloque al staging.
+    """
+    method = load_method(engine.dialect)
+    staging = name + STAGING_SUFFIX
+    loaded = []
+
+    def write(df):
+        if not loaded:
+            _load_staging(engine, name, df, method)
+        else:
+            with engine.begin() as conn:
+                df, _ = encode_frame(conn, name, df)
+                _insert(conn, staging, df, method)
+        loaded.append(len(df))
+
+    try:
+        yield write
+    except Exception:
+        with engine.begin() as conn:
+            _drop(conn, staging)
+        raise
+    if not loaded:
+        return
+    if getattr(_snapshot, "tables", None) is not None:
+        _snapshot.tables.append(name)
+    else:
+        with engine.begin() as conn:
+            _swap_in(conn, name)
+    logger.info(f"{name}: {sum(loaded)} filas en {len(loaded)} bloques publicadas")
+
+
+@contextmanager
+def _transaction(bind):
+    """engine.begin() de un Engine; una Connection se usa tal cual, en su transacción."""
+    if isinstance(bind, Connection):
+        yield bind
+    else:
+        with bind.begin() as conn:
+            yield conn
+
+
+def bulk_write(df, name, engine, if_exists="replace", keys=None):
+    """Escribe un DataFrame con el cargador más rápido para el dialecto del engine.
+
+    replace carga en staging y lo intercambia con un RENAME (o lo deja pendiente si
+    hay un publish_snapshot abierto); append y upsert escriben en una transacción, o
+    en la de `engine` si es una Connection ya abierta.
+    Args:
+        if_exists: "replace", "append" o "upsert" (upsert requiere `keys`)
+        keys: columnas que identifican una fila en upsert
+    Returns:
+        dict con rows, seconds, rows_per_sec y method.
+    """
+    if if_exists not in ("replace", "append", "upsert"):
+        raise ValueError(f"if_exists debe ser replace, append o upsert, no {if_exists!r}")
+    if if_exists == "upsert" and not keys:
+        raise ValueError("upsert requiere columnas clave (keys)")
+    if if_exists == "replace" and isinstance(engine, Connection):
+        raise ValueError("replace requiere un Engine (carga en staging en su propia transacción)")
+
+    method = load_method(engine.dialect)
+
+    start = time.perf_counter()
+    if if_exists == "replace":
+        _load_staging(engine, name, df, method)
+        if getattr(_snapshot, "tables", None) is not None:
+            _snapshot.tables.append(name)
+        else:
+            with engine.begin() as conn:
+                _swap_in(conn, name)
+    else:
+        with _transaction(engine) as conn:
+            df, dtype = encode_frame(conn, name, df)
+            if not inspect(conn).has_table(name):
+                df.head(0).to_sql(name, conn, index=False, dtype=dtype)
+            elif if_exists == "upsert" and len(df):
+                _delete_keys(conn, name, df, list(keys))
+            _insert(conn, name, df, method)
+            ensure_indexes(conn, name)
+            bump_version(conn, name)
+    seconds = time.perf_counter() - start
+
+    rate = len(df) / seconds if seconds > 0 else float("inf")
+    logger.info(f"{name}: {len(df)} filas ({if_exists}, {method}) en {seconds:.2f}s "
+                f"({rate:,.0f} filas/s)")
+    return {"rows": len(df), "seconds": seconds, "rows_per_sec": rate, "method": method}
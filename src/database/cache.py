@@ -0,0 +1,194 @@
+# src/database/cache.py
+"""
+Versiones de tabla y caché de resultados de consultas.
+
+Cada escritura por `write_df_to_sql` incrementa la versión de su tabla en
+`table_versions`. `read_sql_query` guarda el resultado bajo la clave
+(URL de la base, texto SQL, versiones de las tablas que lee), así que una lectura
+repetida de tablas sin cambios no toca la base de datos, y una escritura invalida
+exactamente las consultas que la leían. Solo se cachean consultas cuyas tablas se
+resuelven todas (ver tables_in) y tienen versión: una tabla escrita fuera del
+pipeline se lee siempre de la base.
+
+QUERY_CACHE=0 desactiva la caché; QUERY_CACHE_DIR añade una copia en disco
+compartida entre procesos.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_TABLE = "table_versions"
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE", "1") != "0"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "128"))
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR")
+
+# Vistas -> tablas de las que dependen
+VIEW_DEPENDENCIES = {"fuel_prices_latest": ["fuel_prices"]}
+
+# Literales, comentarios e identificadores entre comillas; luego tokens
+_STRIP_RE = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TOKEN_RE = re.compile(r"[\w.$]+|[(),;]|[^\s\w]")
+_IDENT_RE = re.compile(r"^[A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)*$")
+# Palabras que cierran la lista de tablas de un FROM
+_CLAUSE_WORDS = {
+    "WHERE", "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "JOIN",
+    "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER", "ON", "USING", "WINDOW",
+    "OFFSET", "FETCH", "RETURNING", "AS", "SELECT", "FOR", "VALUES", "SET", "LATERAL",
+}
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def bump_version(conn, table: str):
+    """Incrementa la versión de `table` dentro de la transacción de escritura."""
+    if table == VERSIONS_TABLE:
+        return
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} "
+        "(table_name VARCHAR(255) PRIMARY KEY, version INTEGER NOT NULL, updated_at VARCHAR(32))")
+    params = {"t": table, "now": str(pd.Timestamp.now())}
+    updated = conn.execute(text(
+        f"UPDATE {VERSIONS_TABLE} SET version = version + 1, updated_at = :now WHERE table_name = :t"),
+        params)
+    if updated.rowcount == 0:
+        conn.execute(text(
+            f"INSERT INTO {VERSIONS_TABLE} (table_name, version, updated_at) VALUES (:t, 1, :now)"),
+            params)
+
+
+def _tokens(sql):
+    sql = _STRIP_RE.sub(" '' ", sql)
+    sql = re.sub(r'["`\[\]]', "", sql)
+    return _TOKEN_RE.findall(sql)
+
+
+def _skip_parens(tokens, i):
+    """Índice tras el paréntesis que cierra el abierto en tokens[i]."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        depth += {"(": 1, ")": -1}.get(tokens[j], 0)
+        if depth == 0:
+            return j + 1
+    return len(tokens)
+
+
+def _is_alias(token):
+    return bool(_IDENT_RE.match(token)) and "." not in token and token.upper() not in _CLAUSE_WORDS
+
+
+def _scan(tokens):
+    """Nombres tras cada FROM/JOIN de `tokens`, o None si alguno no se resuelve."""
+    names = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i].upper() not in ("FROM", "JOIN"):
+            i += 1
+            continue
+        i += 1
+        while i < len(tokens):
+            if tokens[i] == "(":  # subconsulta como tabla derivada
+                end = _skip_parens(tokens, i)
+                inner = _scan(tokens[i + 1:end - 1])
+                if inner is None:
+                    return None
+                names += inner
+                i = end
+            elif _IDENT_RE.match(tokens[i]) and tokens[i].upper() not in _CLAUSE_WORDS:
+                names.append(tokens[i].split(".")[-1].lower())
+                i += 1
+                if i < len(tokens) and tokens[i] == "(":  # función de tabla
+                    return None
+            else:
+                return None
+            if i < len(tokens) and tokens[i].upper() == "AS":
+                i += 1
+            if i < len(tokens) and _is_alias(tokens[i]):
+                i += 1
+            if i < len(tokens) and tokens[i] == ",":
+                i += 1
+                continue
+            break
+    return names
+
+
+def tables_in(sql: str):
+    """Tablas que lee una consulta, con las vistas expandidas a sus tablas.
+
+    Recorre cada FROM (incluidas las listas separadas por comas y las tablas
+    derivadas) y cada JOIN.
+    Returns:
+        Lista ordenada, o None si alguna referencia no se puede resolver (función de
+        tabla, sintaxis desconocida): esas consultas no se cachean.
+    """
+    names = _scan(_tokens(sql))
+    if names is None:
+        return None
+    tables = []
+    for name in dict.fromkeys(names):
+        tables += VIEW_DEPENDENCIES.get(name, [name])
+    return sorted(set(tables))
+
+
+def table_versions(engine, tables) -> dict:
+    """{tabla: versión} de las tablas pedidas que tienen versión registrada."""
+    if not tables or not inspect(engine).has_table(VERSIONS_TABLE):
+        return {}
+    query = text(f"SELECT table_name, version FROM {VERSIONS_TABLE} WHERE table_name IN :tables"
+                 ).bindparams(bindparam("tables", expanding=True))
+    with engine.connect() as conn:
+        return dict(conn.execute(query, {"tables": list(tables)}).fetchall())
+
+
+def _disk_path(key):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return Path(QUERY_CACHE_DIR) / f"{digest}.pkl"
+
+
+def cached_query(sql: str, engine, read):
+    """Devuelve `read()` cacheado por (base, SQL, versiones). Los resultados se copian."""
+    tables = tables_in(sql)
+    versions = table_versions(engine, tables) if QUERY_CACHE_ENABLED else {}
+    if not tables or set(versions) != set(tables):
+        return read()
+
+    key = (engine.url.render_as_string(hide_password=True), sql, tuple(sorted(versions.items())))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return _cache[key].copy()
+    df = None
+    if QUERY_CACHE_DIR and _disk_path(key).exists():
+        df = pd.read_pickle(_disk_path(key))
+    if df is None:
+        df = read()
+        if QUERY_CACHE_DIR:
+            Path(QUERY_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+            df.to_pickle(_disk_path(key))
+    with _lock:
+        _stats["misses"] += 1
+        _cache[key] = df
+        while len(_cache) > QUERY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return df.copy()
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def clear_query_cache():
+    with _lock:
+        _cache.clear()
+        _stats.update(hits=0, misses=0)
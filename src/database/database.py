@@ -1,16 +1,50 @@
 import os
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from dotenv import load_dotenv
 
+from .bulk import bulk_write
+from .cache import cached_query
+from .indexes import ensure_all_indexes
+from .schema import decode_frame, migrate
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Perfil de rendimiento SQLite: WAL para que las lecturas del dashboard no esperen a
+# las escrituras del pipeline, caché de páginas y mmap más grandes, temporales en memoria
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),
+    "temp_store": "MEMORY",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000")),
+}
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_RECYCLE_S = 1800
+
+def _apply_sqlite_pragmas(dbapi_conn, _record):
+    cursor = dbapi_conn.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
 def _build_engine(url: str):
     connect_args = {}
+    pool_args = {"pool_size": POOL_SIZE, "max_overflow": POOL_MAX_OVERFLOW}
     if url.startswith("sqlite"):
         connect_args["check_same_thread"] = False
-    return create_engine(url, connect_args=connect_args)
+        if make_url(url).database in (None, "", ":memory:"):
+            pool_args = {}  # SQLite en memoria: una conexión por hilo (SingletonThreadPool)
+    else:
+        pool_args.update(pool_pre_ping=True, pool_recycle=POOL_RECYCLE_S)
+    engine = create_engine(url, connect_args=connect_args, **pool_args)
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
 
 _engine = None
 
@@ -26,6 +60,7 @@ def get_engine():
         try:
             with _engine.connect():
                 logger.info(f"[OK] Conectado a: {db_url.split('://')[0]}://...")
+            _migrate(_engine)
             return _engine
         except Exception as e:
             logger.warning(f"No se pudo conectar a {db_url}: {e}")
@@ -35,6 +70,7 @@ def get_engine():
     logger.info(f"Usando fallback SQLite: {fallback_url}")
     _engine = _build_engine(fallback_url)
     _ensure_tables(_engine)
+    _migrate(_engine)
     return _engine
 
 def get_raw_connection(engine=None):
@@ -42,28 +78,77 @@ def get_raw_connection(engine=None):
         engine = get_engine()
     return engine.raw_connection()
 
-def write_df_to_sql(df, name, engine=None, if_exists="replace"):
-    eng = engine or get_engine()
-    with eng.connect() as conn:
-        raw = conn.connection
-        df.to_sql(name, raw, if_exists=if_exists, index=False)
+def write_df_to_sql(df, name, engine=None, if_exists="replace", keys=None):
+    """Escribe `df` en la tabla `name` con el cargador masivo del dialecto (ver bulk.py).
+
+    if_exists: "replace", "append" o "upsert" (con `keys`). Devuelve las métricas de carga.
+    """
+    return bulk_write(df, name, engine or get_engine(), if_exists=if_exists, keys=keys)
 
 def read_sql_query(query, engine=None):
+    """Ejecuta `query` y devuelve un DataFrame; las consultas de texto pasan por la caché
+    por versión de tabla (ver cache.py)."""
     eng = engine or get_engine()
     import pandas as pd
+
+    def _read():
+        with eng.connect() as conn:
+            raw = conn.connection
+            return decode_frame(conn, pd.read_sql_query(query, raw))
+
+    if isinstance(query, str):
+        return cached_query(query, eng, _read)
+    return _read()
+
+READ_CHUNKSIZE = 50_000
+
+def iter_sql_chunks(table, engine=None, columns=None, where=None, params=None,
+                    chunksize=READ_CHUNKSIZE):
+    """Lee `table` por bloques de DataFrame sin materializar la tabla completa.
+
+    Usa cursores de servidor en PostgreSQL (stream_results) y fetchmany en SQLite.
+    Args:
+        columns: lista de columnas (None = todas)
+        where: condición SQL sin el WHERE, con parámetros :nombre
+        params: valores de los parámetros de `where`
+    Yields:
+        DataFrames de hasta `chunksize` filas.
+    """
+    from sqlalchemy import text
+    import pandas as pd
+    eng = engine or get_engine()
+    prep = eng.dialect.identifier_preparer
+    cols = ", ".join(prep.quote(c) for c in columns) if columns else "*"
+    sql = f"SELECT {cols} FROM {prep.quote(table)}" + (f" WHERE {where}" if where else "")
     with eng.connect() as conn:
-        raw = conn.connection
-        return pd.read_sql_query(query, raw)
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunksize).execute(
+            text(sql), params or {})
+        keys = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunksize)
+            if not rows:
+                break
+            yield decode_frame(conn, pd.DataFrame(rows, columns=keys))
+
+def _migrate(engine):
+    try:
+        applied = migrate(engine)
+        if applied:
+            logger.info(f"Migraciones de esquema aplicadas: {applied}")
+    except Exception as e:
+        logger.warning(f"No se pudieron aplicar las migraciones: {e}")
 
 def _ensure_tables(engine):
     try:
         import pandas as pd
         inspector = __import__("sqlalchemy").inspect(engine)
-        existing = inspector.get_table_names()
+        # fuel_prices es una vista sobre sus particiones mensuales (fuel_history.py)
+        existing = inspector.get_table_names() + inspector.get_view_names()
         for table in ["shipping_stats", "fuel_prices", "weather_data"]:
             if table not in existing:
                 write_df_to_sql(pd.DataFrame(), table, engine)
                 logger.info(f"Tabla '{table}' creada")
+        ensure_all_indexes(engine)
     except Exception as e:
         logger.warning(f"No se pudieron verificar tablas: {e}")
 
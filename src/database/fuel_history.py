@@ -0,0 +1,320 @@
+"""
+Monthly-partitioned `fuel_prices` history with latest-snapshot access and retention.
+
+Every scrape appends a full snapshot, so the history is split by month of `scraped_at`:
+
+- SQLite: one table per month (`fuel_prices_pYYYYMM`) and a `fuel_prices` view that
+  UNION ALLs them, so existing readers keep working.
+- PostgreSQL: `fuel_prices` is a native RANGE-partitioned table with the same
+  monthly partitions.
+
+`fuel_prices_latest` selects from the newest partition only, so "current prices"
+reads never scan the history. `compact_fuel_history` replaces snapshots older than
+FUEL_RETENTION_DAYS with daily or weekly per-state averages. `fuel_prices_as_of` and
+`join_fuel_as_of` give point-in-time prices (one row per state) instead of joining the
+whole history. A database that still has a plain `fuel_prices` table keeps the
+previous single-table behaviour until it is converted (schema migration 2 or the
+first `append_fuel_snapshot`).
+"""
+import logging
+import os
+import re
+
+import pandas as pd
+from sqlalchemy import Column, MetaData, Table, inspect, text
+
+from .bulk import DATETIME_FORMAT, _insert, load_method
+from .cache import bump_version
+from .indexes import ensure_indexes
+from .schema import DICTIONARIES, TABLE_SCHEMAS, decode_frame, encode_frame
+
+logger = logging.getLogger(__name__)
+
+LATEST_FUEL_VIEW = "fuel_prices_latest"
+LATEST_FUEL_COLUMNS = ["state", "regular", "mid_grade", "premium", "diesel", "scraped_at"]
+FUEL_COLUMNS = [*LATEST_FUEL_COLUMNS, "pipeline_run_id", "data_source"]
+PRICE_COLUMNS = ["regular", "mid_grade", "premium", "diesel"]
+
+PARTITION_PREFIX = "fuel_prices_p"
+_PARTITION_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{6}})$")
+FUEL_RETENTION_DAYS = int(os.getenv("FUEL_RETENTION_DAYS", "90"))
+FUEL_COMPACTION = os.getenv("FUEL_COMPACTION", "daily")
+COMPACTION_PERIODS = {"daily": "D", "weekly": "W-SUN"}  # weekly periods start on Monday
+
+
+def partition_name(when) -> str:
+    """Partition holding rows scraped at `when` (timestamp or monthly period)."""
+    return f"{PARTITION_PREFIX}{pd.Period(when, freq='M').strftime('%Y%m')}"
+
+
+def fuel_partitions(conn) -> list:
+    """Monthly partitions present, oldest first."""
+    return sorted(t for t in inspect(conn).get_table_names() if _PARTITION_RE.match(t))
+
+
+def current_fuel_table(engine) -> str:
+    """Table to read current prices from: the newest partition, or legacy `fuel_prices`."""
+    with engine.connect() as conn:
+        partitions = fuel_partitions(conn)
+    return partitions[-1] if partitions else "fuel_prices"
+
+
+def _partition_start(name):
+    return pd.Timestamp(f"{_PARTITION_RE.match(name).group(1)}01")
+
+
+def _fuel_table(name, **kwargs):
+    columns = [Column(c, TABLE_SCHEMAS["fuel_prices"][c] or DICTIONARIES[c][1]) for c in FUEL_COLUMNS]
+    return Table(name, MetaData(), *columns, **kwargs)
+
+
+def _begin(conn):
+    # pysqlite does not BEGIN before DDL; the SAVEPOINT opens the transaction (see bulk._swap_in)
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("SAVEPOINT fuel_history")
+
+
+def _is_legacy_table(conn) -> bool:
+    """True when `fuel_prices` is still a plain, unpartitioned table."""
+    if conn.dialect.name == "postgresql":
+        kind = conn.execute(text("SELECT c.relkind FROM pg_class c "
+                                 "WHERE c.relname = 'fuel_prices' AND pg_table_is_visible(c.oid)")
+                            ).scalar()
+        return kind == "r"
+    return "fuel_prices" in inspect(conn).get_table_names()
+
+
+def _create_partition(conn, period):
+    name = partition_name(period)
+    if conn.dialect.name == "postgresql":
+        _fuel_table("fuel_prices", postgresql_partition_by="RANGE (scraped_at)").create(conn, checkfirst=True)
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF fuel_prices FOR VALUES "
+            f"FROM ('{period.start_time:%Y-%m-%d}') TO ('{(period + 1).start_time:%Y-%m-%d}')")
+    else:
+        _fuel_table(name).create(conn, checkfirst=True)
+    ensure_indexes(conn, name)
+    logger.info(f"Partición {name} creada")
+    return name
+
+
+def _refresh_views(conn):
+    """Recreate the `fuel_prices` union view (SQLite) and the latest view over the newest partition."""
+    partitions = fuel_partitions(conn)
+    conn.exec_driver_sql(f"DROP VIEW IF EXISTS {LATEST_FUEL_VIEW}")
+    if conn.dialect.name == "sqlite":
+        cols = ", ".join(FUEL_COLUMNS)
+        conn.exec_driver_sql("DROP VIEW IF EXISTS fuel_prices")
+        conn.exec_driver_sql("CREATE VIEW fuel_prices AS " + " UNION ALL ".join(
+            f"SELECT {cols} FROM {p}" for p in partitions))
+    newest = partitions[-1]
+    conn.exec_driver_sql(
+        f"CREATE VIEW {LATEST_FUEL_VIEW} AS SELECT {', '.join(LATEST_FUEL_COLUMNS)} FROM {newest} "
+        f"WHERE scraped_at = (SELECT MAX(scraped_at) FROM {newest})")
+    logger.info(f"Vista '{LATEST_FUEL_VIEW}' sobre {newest}")
+
+
+def _append(conn, df) -> list:
+    """Route `df` rows to their monthly partitions. Returns the partitions created."""
+    df = df.reindex(columns=FUEL_COLUMNS)
+    df["scraped_at"] = pd.to_datetime(df["scraped_at"], errors="coerce", format="mixed")
+    undated = df["scraped_at"].isna()
+    if undated.any():
+        logger.warning(f"{int(undated.sum())} filas de fuel_prices sin scraped_at descartadas")
+        df = df[~undated]
+
+    existing = set(fuel_partitions(conn))
+    created = []
+    method = load_method(conn.dialect)
+    for period, group in df.groupby(df["scraped_at"].dt.to_period("M")):
+        name = partition_name(period)
+        if name not in existing:
+            created.append(_create_partition(conn, period))
+        group, _ = encode_frame(conn, name, group)
+        _insert(conn, name, group, method)
+        bump_version(conn, name)
+    bump_version(conn, "fuel_prices")
+    return created
+
+
+def _convert_legacy(conn):
+    """Move a plain `fuel_prices` table into monthly partitions."""
+    legacy = decode_frame(conn, pd.read_sql_query(text("SELECT * FROM fuel_prices"), conn))
+    conn.exec_driver_sql(f"DROP VIEW IF EXISTS {LATEST_FUEL_VIEW}")
+    conn.exec_driver_sql("DROP TABLE fuel_prices")
+    _append(conn, legacy)
+    if not fuel_partitions(conn):
+        _create_partition(conn, pd.Timestamp.now().to_period("M"))
+    _refresh_views(conn)
+    logger.info(f"fuel_prices convertida a particiones mensuales ({len(legacy)} filas)")
+
+
+def partition_fuel_history(engine) -> bool:
+    """Convert a legacy `fuel_prices` table into monthly partitions (schema migration 2).
+
+    Returns:
+        True when a table was converted.
+    """
+    with engine.begin() as conn:
+        _begin(conn)
+        if not _is_legacy_table(conn):
+            return False
+        _convert_legacy(conn)
+    return True
+
+
+def append_fuel_snapshot(df, engine) -> list:
+    """Append a fuel price snapshot to its monthly partition(s) in one transaction.
+
+    Creates missing partitions and refreshes the views when one is added.
+    Returns:
+        Names of the partitions created.
+    """
+    with engine.begin() as conn:
+        _begin(conn)
+        if _is_legacy_table(conn):
+            _convert_legacy(conn)
+        created = _append(conn, df)
+        if created or LATEST_FUEL_VIEW not in inspect(conn).get_view_names():
+            _refresh_views(conn)
+    logger.info(f"fuel_prices: {len(df)} filas añadidas")
+    return created
+
+
+def compact_fuel_history(engine, keep_days=None, granularity=None, now=None) -> dict:
+    """Replace snapshots older than `keep_days` with per-state daily or weekly averages.
+
+    Rows in the retention window are untouched; compacted rows keep `scraped_at` at
+    the start of their period and carry data_source "compacted_<granularity>".
+    Running it again is a no-op for periods that are already compacted.
+    Args:
+        keep_days: retention window in days (default FUEL_RETENTION_DAYS)
+        granularity: "daily" or "weekly" (default FUEL_COMPACTION)
+        now: reference time (default now)
+    Returns:
+        {partition: {"rows_before": n, "rows_after": m}} for the partitions compacted.
+    """
+    keep_days = FUEL_RETENTION_DAYS if keep_days is None else keep_days
+    granularity = granularity or FUEL_COMPACTION
+    if granularity not in COMPACTION_PERIODS:
+        raise ValueError(f"granularity debe ser daily o weekly, no {granularity!r}")
+    freq = COMPACTION_PERIODS[granularity]
+    # Align the cutoff to a period start so no day/week is compacted half-way
+    cutoff = (pd.Timestamp(now or pd.Timestamp.now()) - pd.Timedelta(days=keep_days)).to_period(freq).start_time
+
+    summary = {}
+    cols = ", ".join(FUEL_COLUMNS)
+    with engine.begin() as conn:
+        _begin(conn)
+        if _is_legacy_table(conn):
+            return summary
+        bound = {"cutoff": cutoff.strftime(DATETIME_FORMAT) if conn.dialect.name == "sqlite"
+                 else cutoff.to_pydatetime()}
+        method = load_method(conn.dialect)
+        for name in fuel_partitions(conn):
+            if _partition_start(name) >= cutoff:
+                continue
+            old = decode_frame(conn, pd.read_sql_query(
+                text(f"SELECT {cols} FROM {name} WHERE scraped_at < :cutoff"), conn, params=bound))
+            if old.empty:
+                continue
+            old["scraped_at"] = old["scraped_at"].dt.to_period(freq).dt.start_time
+            compacted = old.groupby(["state", "scraped_at"], as_index=False)[PRICE_COLUMNS].mean()
+            if len(compacted) == len(old):
+                continue
+            compacted["pipeline_run_id"] = None
+            compacted["data_source"] = f"compacted_{granularity}"
+            conn.execute(text(f"DELETE FROM {name} WHERE scraped_at < :cutoff"), bound)
+            compacted, _ = encode_frame(conn, name, compacted.reindex(columns=FUEL_COLUMNS))
+            _insert(conn, name, compacted, method)
+            bump_version(conn, name)
+            summary[name] = {"rows_before": len(old), "rows_after": len(compacted)}
+        if summary:
+            bump_version(conn, "fuel_prices")
+    for name, counts in summary.items():
+        logger.info(f"{name} compactada ({granularity}): {counts['rows_before']} -> "
+                    f"{counts['rows_after']} filas")
+    return summary
+
+
+def fuel_prices_as_of(engine, as_of=None, columns=None):
+    """Fuel row valid per state at `as_of`: the latest row with scraped_at <= as_of.
+
+    The ROW_NUMBER() window runs in the database, so one row per state comes back no
+    matter how long the history is. Without `as_of` it runs over the whole history
+    too, so a state missing from the newest partition (e.g. quarantined in the first
+    scrape of a month) keeps its last valid price.
+    Args:
+        as_of: timestamp (None = current prices)
+        columns: columns to return (default LATEST_FUEL_COLUMNS; state and scraped_at always)
+    """
+    from .database import read_sql_query
+
+    columns = list(dict.fromkeys(["state", "scraped_at", *(columns or LATEST_FUEL_COLUMNS)]))
+    cols = ", ".join(columns)
+    where = ""
+    if as_of is not None:
+        where = f" WHERE scraped_at <= '{pd.Timestamp(as_of).strftime(DATETIME_FORMAT)}'"
+    return read_sql_query(
+        f"SELECT {cols} FROM (SELECT {cols}, ROW_NUMBER() OVER "
+        f"(PARTITION BY state ORDER BY scraped_at DESC) AS rn FROM fuel_prices{where}) ranked "
+        "WHERE rn = 1 ORDER BY state", engine)
+
+
+def join_fuel_as_of(df, engine, as_of=None, time_col=None, columns=None):
+    """Left-join fuel prices onto `df` by state, point-in-time; output keeps len(df) rows.
+
+    - time_col: each row gets the snapshot valid at its own timestamp (sorted
+      merge_asof over the history up to the latest row time).
+    - otherwise: every row gets the snapshot valid at `as_of` (current when None).
+    """
+    columns = [c for c in (columns or PRICE_COLUMNS) if c not in ("state", "scraped_at")]
+    if time_col is None:
+        fuel = fuel_prices_as_of(engine, as_of, columns)
+        return df.merge(fuel[["state", *columns]], on="state", how="left")
+
+    from .database import read_sql_query
+
+    left = df.reset_index(drop=True)
+    times = pd.to_datetime(left[time_col], errors="coerce")
+    if times.isna().all():
+        return left.reindex(columns=list(left.columns) + columns)
+    until = times.max().strftime(DATETIME_FORMAT)
+    fuel = read_sql_query(f"SELECT state, scraped_at, {', '.join(columns)} FROM fuel_prices "
+                          f"WHERE scraped_at <= '{until}'", engine)
+    keyed = left.assign(_row=range(len(left)), _asof=times)[times.notna()]
+    merged = pd.merge_asof(keyed.sort_values("_asof", kind="stable"),
+                           fuel.dropna(subset=["scraped_at"]).sort_values("scraped_at"),
+                           left_on="_asof", right_on="scraped_at", by="state", direction="backward")
+    return left.join(merged.set_index("_row")[columns])
+
+
+def ensure_latest_fuel_view(engine):
+    """Create the latest-snapshot view (and the legacy table's indexes) if missing.
+
+    Returns:
+        True when the view is available, False when `fuel_prices` has no history yet.
+    """
+    inspector = inspect(engine)
+    if [t for t in inspector.get_table_names() if _PARTITION_RE.match(t)]:
+        if LATEST_FUEL_VIEW not in inspector.get_view_names():
+            with engine.begin() as conn:
+                _begin(conn)
+                _refresh_views(conn)
+        return True
+
+    if "fuel_prices" not in inspector.get_table_names():
+        return False
+    columns = {c["name"] for c in inspector.get_columns("fuel_prices")}
+    if not set(LATEST_FUEL_COLUMNS) <= columns:
+        return False
+
+    with engine.begin() as conn:
+        ensure_indexes(conn, "fuel_prices")
+        if LATEST_FUEL_VIEW not in inspector.get_view_names():
+            cols = ", ".join(LATEST_FUEL_COLUMNS)
+            conn.execute(text(
+                f"CREATE VIEW {LATEST_FUEL_VIEW} AS SELECT {cols} FROM fuel_prices "
+                "WHERE scraped_at = (SELECT MAX(scraped_at) FROM fuel_prices)"))
+            logger.info(f"Vista '{LATEST_FUEL_VIEW}' creada")
+    return True
@@ -0,0 +1,131 @@
+# src/database/indexes.py
+"""
+Índices declarativos de las tablas consultadas por el pipeline y el dashboard.
+
+`to_sql(..., if_exists="replace")` borra la tabla junto con sus índices, así que
+`bulk_write` vuelve a aplicar INDEX_SPEC tras cada carga. Las claves admiten
+patrones fnmatch (p. ej. las tablas freight_lanes_<modo>). Un índice solo se crea
+si la tabla tiene todas sus columnas.
+"""
+import argparse
+import logging
+from fnmatch import fnmatch
+
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+# Sufijo de las tablas de staging de bulk_write (no llevan índices propios)
+STAGING_SUFFIX = "__staging"
+
+LANE_INDEX = [("origin", "destination")]
+INDEX_SPEC = {
+    "fuel_prices": [("state", "scraped_at"), ("scraped_at",)],
+    "fuel_prices_p*": [("state", "scraped_at"), ("scraped_at",)],
+    "shipping_stats": [("state",)],
+    "weather_data": [("state",)],
+    "freight_by_state": [("state",)],
+    "state_routes": LANE_INDEX,
+    "route_costs": LANE_INDEX,
+    "route_congestion": LANE_INDEX,
+    "lane_efficiency": LANE_INDEX,
+    "lane_assignment": LANE_INDEX,
+    "freight_lanes": LANE_INDEX,
+    "freight_lanes_*": LANE_INDEX,
+    "shipping_stats_changes": [("pipeline_run_id",)],
+    "quarantine_rows": [("source", "quarantined_at")],
+    "ml_model_registry": [("name", "created_at")],
+}
+
+
+def index_name(table: str, columns) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def spec_for(table: str) -> list:
+    """Índices declarados para `table` (entrada exacta o por patrón)."""
+    if table.endswith(STAGING_SUFFIX):
+        return []
+    if table in INDEX_SPEC:
+        return INDEX_SPEC[table]
+    return next((cols for pattern, cols in INDEX_SPEC.items() if fnmatch(table, pattern)), [])
+
+
+def _applicable(conn, table, spec_table=None):
+    insp = inspect(conn)
+    if not insp.has_table(table):
+        return [], set()
+    columns = {c["name"] for c in insp.get_columns(table)}
+    wanted = [cols for cols in spec_for(spec_table or table) if set(cols) <= columns]
+    existing = {ix["name"] for ix in insp.get_indexes(table)}
+    return wanted, existing
+
+
+def ensure_indexes(conn, table: str, spec_table: str | None = None) -> list:
+    """Crea los índices declarados que falten en `table`. Devuelve los nombres creados.
+
+    `spec_table` permite indexar una tabla de staging con el spec de su tabla final.
+    """
+    wanted, existing = _applicable(conn, table, spec_table)
+    prep = conn.dialect.identifier_preparer
+    created = []
+    for cols in wanted:
+        name = index_name(table, cols)
+        if name in existing:
+            continue
+        col_sql = ", ".join(prep.quote(c) for c in cols)
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {prep.quote(name)} ON {prep.quote(table)} ({col_sql})")
+        created.append(name)
+    if created:
+        logger.info(f"Índices creados en {table}: {', '.join(created)}")
+    return created
+
+
+def rename_indexes(conn, old_table: str, new_table: str):
+    """Renombra los índices declarados tras renombrar una tabla (PostgreSQL)."""
+    prep = conn.dialect.identifier_preparer
+    for cols in spec_for(new_table):
+        conn.exec_driver_sql(f"ALTER INDEX IF EXISTS {prep.quote(index_name(old_table, cols))} "
+                             f"RENAME TO {prep.quote(index_name(new_table, cols))}")
+
+
+def missing_indexes(engine) -> list:
+    """Índices declarados que no existen en las tablas presentes.
+
+    Returns:
+        Lista de dicts {table, index, columns}.
+    """
+    missing = []
+    with engine.connect() as conn:
+        for table in inspect(conn).get_table_names():
+            wanted, existing = _applicable(conn, table)
+            missing += [{"table": table, "index": index_name(table, cols), "columns": list(cols)}
+                        for cols in wanted if index_name(table, cols) not in existing]
+    return missing
+
+
+def ensure_all_indexes(engine) -> list:
+    """Aplica INDEX_SPEC a todas las tablas existentes."""
+    created = []
+    with engine.begin() as conn:
+        for table in inspect(conn).get_table_names():
+            created += ensure_indexes(conn, table)
+    return created
+
+
+if __name__ == "__main__":
+    from src.database import get_engine
+
+    parser = argparse.ArgumentParser(description="Comprueba los índices declarados en INDEX_SPEC")
+    parser.add_argument("--fix", action="store_true", help="Crear los índices que falten")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    missing = missing_indexes(engine)
+    for m in missing:
+        print(f"[MISSING] {m['table']}: {m['index']} ({', '.join(m['columns'])})")
+    if not missing:
+        print("[OK] Todos los índices declarados existen")
+    elif args.fix:
+        print(f"[OK] {len(ensure_all_indexes(engine))} índices creados")
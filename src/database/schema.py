@@ -0,0 +1,190 @@
+# src/database/schema.py
+"""
+Esquemas tipados y migraciones versionadas de las tablas del pipeline.
+
+TABLE_SCHEMAS fija el tipo SQL de cada columna conocida (enteros pequeños, REAL,
+CHAR(2), TIMESTAMP) en lugar de lo que infiere `to_sql`. Las columnas de baja
+cardinalidad (run id, modo, mercancía, tramo de congestión, fuente) se guardan como
+códigos enteros que referencian tablas diccionario `dim_*` (id, value).
+
+- `encode_frame` traduce los valores a códigos (dando de alta los nuevos) y devuelve
+  los tipos para crear la tabla; lo usa bulk_write en cada carga.
+- `decode_frame` vuelve a convertir los códigos en pandas categoricals y las columnas
+  de fecha en datetime; lo usan read_sql_query e iter_sql_chunks.
+- `migrate` aplica las migraciones pendientes y las registra en schema_migrations.
+"""
+import logging
+from fnmatch import fnmatch
+
+import pandas as pd
+from sqlalchemy import REAL, BigInteger, DateTime, Float, Integer, SmallInteger, String, inspect, text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+# Columna -> (tabla diccionario, tipo del código)
+DICTIONARIES = {
+    "pipeline_run_id": ("dim_pipeline_runs", Integer()),
+    "mode": ("dim_modes", SmallInteger()),
+    "commodity": ("dim_commodities", SmallInteger()),
+    "congestion_tier": ("dim_congestion_tiers", SmallInteger()),
+    "data_source": ("dim_data_sources", SmallInteger()),
+}
+TIMESTAMP_COLUMNS = {"scraped_at", "changed_at", "quarantined_at", "created_at", "priced_at"}
+
+STATE = String(2)
+_LANE = {"origin": STATE, "destination": STATE, "commodity": None, "mode": None,
+         "tons_2024": REAL(), "tons_m": REAL()}
+_COSTS = {"origin": STATE, "destination": STATE, "driving_mi": REAL(), "driving_hr": REAL(),
+          "diesel_price": REAL(), "fuel_cost": Float(), "driver_cost": Float(),
+          "maint_cost": Float(), "total_cost": Float(), "cost_per_mi": REAL(), "fuel_pct": REAL(),
+          "priced_at": DateTime()}
+_CONGESTION = {"congestion_ratio": REAL(), "congestion_tier": None}
+
+# None = columna diccionario (el tipo lo pone DICTIONARIES)
+TABLE_SCHEMAS = {
+    "shipping_stats": {"rank": SmallInteger(), "state": STATE, "postal": STATE,
+                       "population": BigInteger(), "population_per_rank": Float(),
+                       "row_fingerprint": BigInteger(), "pipeline_run_id": None},
+    "fuel_prices": {"state": STATE, "regular": REAL(), "mid_grade": REAL(), "premium": REAL(),
+                    "diesel": REAL(), "scraped_at": DateTime(), "pipeline_run_id": None,
+                    "data_source": None},
+    "shipping_stats_changes": {"state": STATE, "change": String(8), "pipeline_run_id": None,
+                               "changed_at": DateTime()},
+    "route_costs": _COSTS,
+    "route_congestion": {**_COSTS, **_CONGESTION},
+    "lane_efficiency": {**_LANE, **_COSTS, **_CONGESTION,
+                        "tons_per_dollar": Float(), "tons_per_mile": REAL()},
+    "freight_lanes": _LANE,
+    "freight_lanes_*": _LANE,
+    "freight_mode_split": {"mode": None, "tons_2024": REAL()},
+    "freight_commodities": {"commodity": None, "tons_2024": REAL()},
+}
+# Particiones mensuales del histórico (fuel_history.py): mismo esquema que fuel_prices
+TABLE_SCHEMAS["fuel_prices_p*"] = TABLE_SCHEMAS["fuel_prices"]
+
+
+def schema_for(table: str) -> dict:
+    """Tipos declarados para `table` (entrada exacta o patrón), {} si no tiene esquema."""
+    if table in TABLE_SCHEMAS:
+        return TABLE_SCHEMAS[table]
+    return next((s for pattern, s in TABLE_SCHEMAS.items() if fnmatch(table, pattern)), {})
+
+
+def _dictionary_codes(conn, dim: str, values) -> dict:
+    """{valor: código} de `dim`, dando de alta los valores nuevos."""
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {dim} "
+                         "(id INTEGER PRIMARY KEY, value VARCHAR(255) NOT NULL UNIQUE)")
+    codes = {v: i for i, v in conn.execute(text(f"SELECT id, value FROM {dim}"))}
+    new = [v for v in values if v not in codes]
+    if new:
+        next_id = max(codes.values(), default=0) + 1
+        rows = [{"id": next_id + i, "value": v} for i, v in enumerate(new)]
+        conn.execute(text(f"INSERT INTO {dim} (id, value) VALUES (:id, :value)"), rows)
+        codes.update((r["value"], r["id"]) for r in rows)
+    return codes
+
+
+def encode_frame(conn, table: str, df: pd.DataFrame):
+    """Aplica el esquema declarado de `table` a `df`.
+
+    Returns:
+        (df codificado, {columna: tipo SQLAlchemy}) — sin cambios si no hay esquema.
+    """
+    schema = schema_for(table)
+    if not schema:
+        return df, None
+    out = df.copy()
+    dtype = {}
+    for col, sql_type in schema.items():
+        if col not in out.columns:
+            continue
+        if col in DICTIONARIES:
+            dim, sql_type = DICTIONARIES[col]
+            values = out[col].astype(object).where(out[col].notna(), None)
+            codes = _dictionary_codes(conn, dim, sorted({str(v) for v in values if v is not None}))
+            out[col] = values.map(lambda v, codes=codes: codes[str(v)] if v is not None else None
+                                  ).astype("Int64")
+        elif isinstance(sql_type, DateTime) and not pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = pd.to_datetime(out[col], errors="coerce", format="mixed")
+        elif isinstance(sql_type, (SmallInteger, Integer, BigInteger)):
+            out[col] = pd.to_numeric(out[col], errors="coerce").round().astype("Int64")
+        dtype[col] = sql_type
+    return out, dtype
+
+
+def decode_frame(conn, df: pd.DataFrame) -> pd.DataFrame:
+    """Códigos diccionario -> pandas categoricals; columnas de fecha -> datetime."""
+    insp = None
+    for col in df.columns:
+        if col in DICTIONARIES and pd.api.types.is_numeric_dtype(df[col]):
+            dim = DICTIONARIES[col][0]
+            insp = insp or inspect(conn)
+            if not insp.has_table(dim):
+                continue
+            labels = dict(conn.execute(text(f"SELECT id, value FROM {dim}")).fetchall())
+            df[col] = pd.Categorical(df[col].map(labels), categories=sorted(labels.values()))
+        elif col in TIMESTAMP_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
+    return df
+
+
+# ── Migraciones ──
+
+def _rebuild_declared_tables(engine):
+    """Reescribe las tablas con esquema declarado para aplicar tipos y diccionarios."""
+    from .bulk import bulk_write
+
+    from .fuel_history import PARTITION_PREFIX
+
+    for table in inspect(engine).get_table_names():
+        # Las particiones de fuel_prices ya se crean tipadas (y en PostgreSQL no admiten replace)
+        if not schema_for(table) or table.endswith("__staging") or table.startswith(PARTITION_PREFIX):
+            continue
+        with engine.connect() as conn:
+            df = decode_frame(conn, pd.read_sql_query(text(f"SELECT * FROM {table}"), conn))
+        if len(df.columns):
+            bulk_write(df, table, engine, if_exists="replace")
+            logger.info(f"Tabla {table} migrada al esquema tipado")
+
+
+def _partition_fuel_history(engine):
+    """Convierte la tabla fuel_prices en particiones mensuales (ver fuel_history.py)."""
+    from .fuel_history import partition_fuel_history
+
+    partition_fuel_history(engine)
+
+
+MIGRATIONS = [
+    (1, "typed schemas and dictionary-encoded categorical columns", _rebuild_declared_tables),
+    (2, "monthly partitions for the fuel_prices history", _partition_fuel_history),
+]
+
+
+def applied_migrations(engine) -> list:
+    if not inspect(engine).has_table(MIGRATIONS_TABLE):
+        return []
+    with engine.connect() as conn:
+        return [r[0] for r in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE} ORDER BY 1"))]
+
+
+def migrate(engine) -> list:
+    """Aplica las migraciones pendientes en orden. Devuelve las versiones aplicadas."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} "
+                             "(version INTEGER PRIMARY KEY, description VARCHAR(255), "
+                             "applied_at VARCHAR(32))")
+    done = set(applied_migrations(engine))
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+        step(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {MIGRATIONS_TABLE} (version, description, applied_at) "
+                              "VALUES (:v, :d, :t)"),
+                         {"v": version, "d": description, "t": str(pd.Timestamp.now())})
+        logger.info(f"Migración {version} aplicada: {description}")
+        applied.append(version)
+    return applied
@@ -0,0 +1,148 @@
+"""
+FAF aggregations on embedded DuckDB (ANALYTICS_BACKEND=duckdb).
+
+The FAF CSV is filtered to domestic state-to-state rows and converted once to a
+Parquet file next to the zip. Every aggregate is then a SQL query over that file,
+run by DuckDB's parallel vectorized engine with a memory limit and a temp directory,
+so intermediate data spills to disk instead of living in a pandas frame.
+
+Group sums are cast back to FLOAT (float32, like the pandas path) and the derived
+columns (tons_m, value_b, ...) are computed with the same pandas expressions, so the
+tables match freight_tables() from faf_loader up to float32 summation error (pandas
+accumulates in float32, DuckDB in double).
+"""
+import os
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+from src.etl.enrichment.faf_loader import (
+    FAF_FILENAME, FAF_YEARS, FREIGHT_MODES, MODE_NAMES, RAW_DIR, SCTG_NAMES, STATE_FIPS,
+    TONS_COLUMNS, VALUE_COLUMNS, download_faf,
+)
+
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", str(os.cpu_count() or 1)))
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "2GB")
+DUCKDB_TEMP_DIR = Path(os.getenv("DUCKDB_TEMP_DIR", str(RAW_DIR.parent / "tmp" / "duckdb")))
+
+
+def connect():
+    """In-process DuckDB connection with parallelism, memory limit and spill directory."""
+    import duckdb
+
+    DUCKDB_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    return duckdb.connect(config={
+        "threads": DUCKDB_THREADS,
+        "memory_limit": DUCKDB_MEMORY_LIMIT,
+        "temp_directory": str(DUCKDB_TEMP_DIR),
+        "preserve_insertion_order": False,
+    })
+
+
+def _lookups(con):
+    con.register("fips", pd.DataFrame(list(STATE_FIPS.items()), columns=["code", "state"]))
+    con.register("modes", pd.DataFrame(list(MODE_NAMES.items()), columns=["code", "name"]))
+    con.register("sctg", pd.DataFrame(list(SCTG_NAMES.items()), columns=["code", "name"]))
+
+
+def faf_parquet(zip_path=None, parquet_path=None):
+    """Domestic state-to-state FAF rows as Parquet, built from the zip on first use.
+
+    Same filters and code mappings as faf_loader.load_faf.
+    """
+    zip_path = Path(zip_path or download_faf(FAF_FILENAME))
+    parquet_path = Path(parquet_path or zip_path.with_suffix(".parquet"))
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= zip_path.stat().st_mtime:
+        return parquet_path
+
+    with zipfile.ZipFile(zip_path) as zf:
+        csv_name = next(n for n in zf.namelist() if n.endswith(".csv"))
+        csv_path = Path(zf.extract(csv_name, DUCKDB_TEMP_DIR))
+    measures = ", ".join(f"f.{c}::FLOAT AS {c}" for c in TONS_COLUMNS + VALUE_COLUMNS)
+    tmp = parquet_path.with_name(f".{parquet_path.name}.tmp")
+    con = connect()
+    try:
+        _lookups(con)
+        con.execute(f"""
+            COPY (
+                SELECT o.state AS origin, d.state AS destination,
+                       COALESCE(m.name, 'Other') AS mode, COALESCE(c.name, 'Unknown') AS commodity,
+                       {measures}
+                FROM read_csv('{csv_path.as_posix()}', header = true) f
+                JOIN fips o ON o.code = TRY_CAST(f.dms_origst AS DOUBLE)::BIGINT
+                JOIN fips d ON d.code = TRY_CAST(f.dms_destst AS DOUBLE)::BIGINT
+                LEFT JOIN modes m ON m.code = f.dms_mode
+                LEFT JOIN sctg c ON c.code = f.sctg2
+                WHERE f.trade_type = 1
+            ) TO '{tmp.as_posix()}' (FORMAT parquet, COMPRESSION zstd)
+        """)
+    finally:
+        con.close()
+        csv_path.unlink(missing_ok=True)
+    os.replace(tmp, parquet_path)
+    return parquet_path
+
+
+def freight_tables_duckdb(source=None):
+    """All FAF aggregate tables computed by DuckDB over the FAF Parquet file.
+
+    Returns:
+        {table_name: DataFrame}, same tables and columns as faf_loader.freight_tables().
+    """
+    source = Path(source or faf_parquet())
+    con = connect()
+    try:
+        con.execute(f"CREATE VIEW faf AS SELECT * FROM read_parquet('{source.as_posix()}')")
+
+        def q(sql):
+            return con.execute(sql).df()
+
+        t = "tons_2024"
+        yearly_sums = q("SELECT " + ", ".join(
+            f"SUM(tons_{y})::FLOAT AS tons_{y}, SUM(value_{y})::FLOAT AS value_{y}" for y in FAF_YEARS)
+            + " FROM faf").iloc[0]
+        yearly = pd.DataFrame([
+            {"year": y, "tons_m": round(yearly_sums[f"tons_{y}"] / 1e3, 2),
+             "value_b": round(yearly_sums[f"value_{y}"] / 1e3, 2)} for y in FAF_YEARS])
+
+        state_latest = q("SELECT origin AS state, SUM(tons_2024)::FLOAT AS tons, "
+                         "SUM(value_2024)::FLOAT AS value, 2024::BIGINT AS year "
+                         "FROM faf GROUP BY origin ORDER BY origin")
+        state_latest["tons_m"] = (state_latest["tons"] / 1e3).round(2)
+        state_latest["value_b"] = (state_latest["value"] / 1e3).round(2)
+
+        lanes = q(f"SELECT origin, destination, commodity, mode, SUM({t})::FLOAT AS {t} FROM faf "
+                  f"GROUP BY ALL ORDER BY {t} DESC, origin, destination, commodity, mode LIMIT 100")
+        lanes["tons_m"] = (lanes[t] / 1e3).round(2)
+
+        balance = q(f"""
+            WITH o AS (SELECT origin AS state, SUM({t})::FLOAT AS outbound FROM faf GROUP BY 1),
+                 i AS (SELECT destination AS state, SUM({t})::FLOAT AS inbound FROM faf GROUP BY 1)
+            SELECT COALESCE(o.state, i.state) AS state,
+                   COALESCE(outbound, 0)::FLOAT AS outbound, COALESCE(inbound, 0)::FLOAT AS inbound
+            FROM o FULL OUTER JOIN i ON o.state = i.state ORDER BY 1""")
+        balance["net_tons"] = balance["outbound"] - balance["inbound"]
+        balance["net_tons_m"] = (balance["net_tons"] / 1e3).round(2)
+
+        tables = {
+            "freight_by_state": state_latest,
+            "freight_lanes": lanes,
+            "freight_mode_split": q(f"SELECT mode, SUM({t})::FLOAT AS {t} FROM faf "
+                                    f"GROUP BY mode ORDER BY {t} DESC, mode"),
+            "freight_commodities": q(f"SELECT commodity, SUM({t})::FLOAT AS {t} FROM faf "
+                                     f"GROUP BY commodity ORDER BY {t} DESC, commodity"),
+            "freight_yearly": yearly,
+            "freight_trade_balance": balance,
+            # load_faf never reads the ton-mile columns, so avg haul is empty on both paths
+            "freight_avg_haul": pd.DataFrame(),
+        }
+        for mode_name in FREIGHT_MODES:
+            by_mode = q(f"SELECT origin, destination, SUM({t})::FLOAT AS {t} FROM faf "
+                        f"WHERE mode = '{mode_name}' GROUP BY ALL "
+                        f"ORDER BY {t} DESC, origin, destination LIMIT 20")
+            by_mode["tons_m"] = (by_mode[t] / 1e3).round(2)
+            tables[f"freight_lanes_{mode_name.lower()}"] = by_mode
+        return tables
+    finally:
+        con.close()
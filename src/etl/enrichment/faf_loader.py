@@ -1,3 +1,4 @@
+import os
 import zipfile
 import pandas as pd
 from pathlib import Path
@@ -34,10 +35,19 @@
     41: "Meat", 42: "Live Animals",
 }
 
+FAF_YEARS = range(2018, 2025)
+FAF_COLUMNS = ["dms_origst", "dms_destst", "dms_mode", "sctg2", "trade_type"]
+TONS_COLUMNS = [f"tons_{y}" for y in FAF_YEARS]
+VALUE_COLUMNS = [f"value_{y}" for y in FAF_YEARS]
+FREIGHT_MODES = ["Truck", "Rail", "Water", "Air"]
+# "pandas" (default) or "duckdb" (see faf_duckdb.py)
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "pandas").lower()
+
 MODE_NAMES = {1: "Truck", 2: "Rail", 3: "Water", 4: "Air", 5: "Pipeline", 6: "Other", 7: "Multiple", 8: "Parcel"}
 
 
-def load_faf(filename=FAF_FILENAME):
+def download_faf(filename=FAF_FILENAME):
+    """Return the path of the FAF zip, downloading it on first use."""
     faf_path = RAW_DIR / filename
     if not faf_path.exists():
         RAW_DIR.mkdir(parents=True, exist_ok=True)
@@ -57,19 +67,18 @@ def load_faf(filename=FAF_FILENAME):
             print("      https://www.bts.gov/faf")
             print(f"      and place the zip at: {faf_path}")
             raise
-    zf = zipfile.ZipFile(faf_path)
+    return faf_path
+
+
+def load_faf(filename=FAF_FILENAME):
+    zf = zipfile.ZipFile(download_faf(filename))
     csv_name = [n for n in zf.namelist() if n.endswith(".csv")][0]
-    cols = [
-        "dms_origst", "dms_destst", "dms_mode", "sctg2", "trade_type",
-    ]
-    year_cols = [f"tons_{y}" for y in range(2018, 2025)]
-    val_cols = [f"value_{y}" for y in range(2018, 2025)]
-    use_cols = cols + year_cols + val_cols
+    use_cols = FAF_COLUMNS + TONS_COLUMNS + VALUE_COLUMNS
 
     print(f"[FAF] Loading {csv_name}...")
     df = pd.read_csv(
         zf.open(csv_name), usecols=use_cols, low_memory=False,
-        dtype={c: "float32" for c in year_cols + val_cols},
+        dtype=dict.fromkeys(TONS_COLUMNS + VALUE_COLUMNS, "float32"),
     )
     print(f"[FAF] Loaded {len(df):,} rows")
 
@@ -177,47 +186,46 @@ def top_lanes_by_mode(df, year=2024, mode_name="Truck"):
     return lanes
 
 
-def store_freight_data(engine):
-    """Load FAF data and store aggregate tables in DB."""
-    from src.database import write_df_to_sql
-
-    df = load_faf()
-
-    # State aggregates
+def freight_tables(df):
+    """All FAF aggregate tables, as {table_name: DataFrame}, from the loaded FAF frame."""
     _, state_latest = state_aggregation(df)
-    write_df_to_sql(state_latest, "freight_by_state", engine, if_exists="replace")
-
-    # Top lanes
-    lanes = lanes_aggregation(df)
-    write_df_to_sql(lanes, "freight_lanes", engine, if_exists="replace")
-
-    # Mode split
-    modes = mode_split(df)
-    write_df_to_sql(modes, "freight_mode_split", engine, if_exists="replace")
-
-    # Commodity split
-    commodities = commodity_split(df)
-    write_df_to_sql(commodities, "freight_commodities", engine, if_exists="replace")
-
-    # Yearly trends
-    yearly = aggregate_yearly(df)
-    write_df_to_sql(yearly, "freight_yearly", engine, if_exists="replace")
-
-    # Trade balance
-    bal = trade_balance(df)
-    write_df_to_sql(bal, "freight_trade_balance", engine, if_exists="replace")
-
-    # Avg haul distance
-    haul = avg_haul(df)
-    if not haul.empty:
-        write_df_to_sql(haul, "freight_avg_haul", engine, if_exists="replace")
-
-    # Top lanes by mode
-    for mode_name in ["Truck", "Rail", "Water", "Air"]:
-        ml = top_lanes_by_mode(df, mode_name=mode_name)
-        if not ml.empty:
-            write_df_to_sql(ml, f"freight_lanes_{mode_name.lower()}", engine, if_exists="replace")
-
+    tables = {
+        "freight_by_state": state_latest,
+        "freight_lanes": lanes_aggregation(df),
+        "freight_mode_split": mode_split(df),
+        "freight_commodities": commodity_split(df),
+        "freight_yearly": aggregate_yearly(df),
+        "freight_trade_balance": trade_balance(df),
+        "freight_avg_haul": avg_haul(df),
+    }
+    for mode_name in FREIGHT_MODES:
+        tables[f"freight_lanes_{mode_name.lower()}"] = top_lanes_by_mode(df, mode_name=mode_name)
+    return tables
+
+
+def store_freight_data(engine, backend=None):
+    """Load FAF data and store aggregate tables in DB.
+
+    backend: "pandas" or "duckdb" (defaults to ANALYTICS_BACKEND)
+    """
+    from src.database import publish_snapshot, write_df_to_sql
+
+    if (backend or ANALYTICS_BACKEND) == "duckdb":
+        from src.etl.enrichment.faf_duckdb import freight_tables_duckdb
+        tables = freight_tables_duckdb()
+    else:
+        tables = freight_tables(load_faf())
+
+    # Publish all FAF tables together: readers never mix old and new aggregates
+    with publish_snapshot(engine):
+        for name, table in tables.items():
+            # Avg haul and per-mode lanes are skipped when the source has no rows for them
+            optional = name == "freight_avg_haul" or name.startswith("freight_lanes_")
+            if not (optional and table.empty):
+                write_df_to_sql(table, name, engine, if_exists="replace")
+
+    state_latest, lanes, yearly = (tables["freight_by_state"], tables["freight_lanes"],
+                                   tables["freight_yearly"])
     return {
         "state_rows": len(state_latest),
         "lane_rows": len(lanes),
@@ -46,6 +46,24 @@ def fetch_truck_rates(year=2025):
     return pd.DataFrame(rows)
 
 
+def rate_per_mile_by_state(df_rates):
+    """Average USDA rate per mile for each origin state, from the latest quarter.
+
+    Regional origins ("IL,IN,MI,OH,WI") count for every state they cover.
+    Returns:
+        Series indexed by state code
+    """
+    if df_rates is None or df_rates.empty:
+        return pd.Series(dtype=float)
+    latest = df_rates[["year", "quarter"]].drop_duplicates().sort_values(["year", "quarter"]).iloc[-1]
+    df = df_rates[(df_rates["year"] == latest["year"]) & (df_rates["quarter"] == latest["quarter"])]
+    df = df[df["rate_per_mile"] > 0].dropna(subset=["origin_state"])
+    states = df["origin_state"].astype(str).str.split(",")
+    df = df.assign(state=states).explode("state")
+    df["state"] = df["state"].str.strip()
+    return df[df["state"].str.len() == 2].groupby("state")["rate_per_mile"].mean()
+
+
 def store_usda_rates(engine):
     """Fetch and store USDA truck rates."""
     from src.database import write_df_to_sql
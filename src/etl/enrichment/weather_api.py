@@ -9,7 +9,7 @@
 from dotenv import load_dotenv
 
 from src.database import get_engine, write_df_to_sql, read_sql_query
-from src.utils.state_mapper import normalize_state_code, get_city_for_state
+from src.utils.state_mapper import normalize_state_code, normalize_state_series, get_city_for_state
 
 load_dotenv()
 
@@ -99,7 +99,8 @@ def get_weather_data():
     weather_results = []
     failed_states = []
 
-    for state in df_states['state'].unique():
+    states = normalize_state_series(df_states['state']).dropna().unique()
+    for state in states:
         try:
             weather_data = get_weather_for_state(state)
             weather_results.append(weather_data)
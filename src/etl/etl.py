@@ -1,17 +1,41 @@
 # src/etl/etl.py
+import argparse
+import heapq
 import os
 import logging
+import pickle
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
 import pandas as pd
-from pydantic import BaseModel, Field, field_validator, ValidationError
 
-from src.database import get_engine, write_df_to_sql
-from src.utils.state_mapper import normalize_state_code
+from src.database import get_engine, staged_load, write_df_to_sql
+from src.etl.incremental import upsert_incremental
+from src.etl.quarantine import quarantine_rows
+from src.etl.validation import ShippingDataSchema, validate_shipping  # noqa: F401
+from src.utils.outputs import OutputWriter, write_output
 
 load_dotenv()
 
+# Validación pydantic fila a fila solo si se activa explícitamente
+STRICT_VALIDATION = os.getenv("ETL_STRICT_VALIDATION", "0") == "1"
+
+# Modo streaming: el CSV raw se procesa en bloques de ETL_CHUNKSIZE filas
+STREAMING = os.getenv("ETL_STREAMING", "0") == "1"
+CHUNKSIZE = int(os.getenv("ETL_CHUNKSIZE", "100000"))
+# Procesos de validación en paralelo (>1 implica modo streaming)
+WORKERS = int(os.getenv("ETL_WORKERS", "1"))
+# Modo incremental: upsert por `state` solo de las filas que cambiaron
+INCREMENTAL = os.getenv("ETL_INCREMENTAL", "0") == "1"
+
+# Orden global de la salida: población desc; el resto de columnas desempata para que
+# las filas duplicadas queden contiguas al fusionar los bloques ordenados
+SORT_COLUMNS = ["population", "rank", "state", "postal"]
+SORT_ASCENDING = [False, True, True, True]
+
 # Rutas configurables mediante .env
 RAW_PATH = Path(os.getenv("RAW_DATA_PATH", "data/raw/shipping_data.csv"))
 CLEAN_PATH = Path(os.getenv("CLEAN_DATA_PATH", "data/clean/shipping_data_clean.csv"))
@@ -23,19 +47,6 @@
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
-# Esquema de validación
-class ShippingDataSchema(BaseModel):
-    rank: int = Field(ge=1)
-    state: str = Field(min_length=2, max_length=2)  # Código de estado (CA, NY, etc)
-    postal: str = Field(min_length=2, max_length=2)
-    population: float = Field(gt=0)
-
-    @field_validator("state")
-    @classmethod
-    def state_to_code(cls, v):
-        """Normaliza estado a código de 2 letras."""
-        return normalize_state_code(v)
-
 # Funciones ETL
 def load_data():
     logger.info(f"Cargando datos desde {RAW_PATH}")
@@ -46,56 +57,30 @@ def load_data():
     logger.info(f"Datos cargados correctamente. Filas: {len(df)}")
     return df
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_and_validate(df: pd.DataFrame, strict: bool | None = None):
+    """Normaliza, valida y deriva columnas. Devuelve (df_clean, rechazadas)."""
     logger.info("Iniciando limpieza y validación de datos")
     # Normalizar nombres de columnas
     df = df.copy()
     df.columns = df.columns.str.lower().str.replace(" ", "_")
     # Trim strings
     df = df.apply(lambda col: col.str.strip() if col.dtype == "object" else col)
-    
-    # PRE-NORMALIZAR estado si viene como nombre completo
-    def normalize_state_safe(x):
-        try:
-            state_str = str(x).strip()
-            if len(state_str) > 2:
-                return normalize_state_code(state_str)
-            else:
-                return state_str.upper()
-        except ValueError:
-            return None  # Descartar si no es un estado válido
-    
-    if "state" in df.columns:
-        df["state"] = df["state"].apply(normalize_state_safe)
-    
-    valid_rows = []
-    invalid_count = 0
-    for index, row in df.iterrows():
-        # Saltar filas con estado None (no válidas)
-        if row.get("state") is None:
-            invalid_count += 1
-            logger.warning(f"Fila {index} descartada: Estado inválido '{row.get('state')}'")
-            continue
-            
-        try:
-            validated = ShippingDataSchema(**row.to_dict())
-            valid_rows.append(validated.model_dump())
-        except ValidationError as e:
-            invalid_count += 1
-            logger.warning(f"Fila {index} descartada por validación: {e}")
-    if invalid_count:
-        logger.info(f"Se descartaron {invalid_count} filas no válidas")
-    df_clean = pd.DataFrame(valid_rows)
+
+    # Reglas del esquema como máscaras vectorizadas (pydantic solo en modo estricto)
+    df_clean, rejected = validate_shipping(df, strict=STRICT_VALIDATION if strict is None else strict)
+    if len(rejected):
+        logger.info(f"Se descartaron {len(rejected)} filas no válidas")
+
     # Métricas adicionales
-    if "population" in df_clean.columns and "rank" in df_clean.columns:
-        df_clean["population_per_rank"] = df_clean["population"] / df_clean["rank"]
-        logger.info("Columna population_per_rank creada")
+    df_clean["population_per_rank"] = df_clean["population"] / df_clean["rank"]
+    logger.info("Columna population_per_rank creada")
     df_clean = df_clean.drop_duplicates()
-    if "state" in df_clean.columns:
-        df_clean = df_clean.dropna(subset=["state"])
-    if "population" in df_clean.columns:
-        df_clean = df_clean.sort_values(by="population", ascending=False)
+    df_clean = df_clean.sort_values(by="population", ascending=False)
     logger.info(f"Limpieza completada. Filas finales: {len(df_clean)}")
+    return df_clean, rejected
+
+def clean_data(df: pd.DataFrame, strict: bool | None = None) -> pd.DataFrame:
+    df_clean, _ = clean_and_validate(df, strict)
     return df_clean
 
 def save_data(df: pd.DataFrame):
@@ -104,17 +89,148 @@ def save_data(df: pd.DataFrame):
     if run_id is not None:
         df = df.copy()
         df["pipeline_run_id"] = run_id
-    df.to_csv(CLEAN_PATH, index=False)
-    logger.info(f"Datos limpios guardados en CSV: {CLEAN_PATH}")
+    paths = write_output(df, CLEAN_PATH)
+    logger.info(f"Datos limpios guardados en: {', '.join(map(str, paths))}")
 
-def run_etl():
+RUN_BLOCK_ROWS = 8192
+
+def _write_sorted_run(df_clean: pd.DataFrame, run_dir: Path, i: int) -> Path:
+    """Guarda un bloque limpio y ordenado como run temporal (bloques pickle de RUN_BLOCK_ROWS)."""
+    path = run_dir / f"run_{i:05d}.pkl"
+    df_sorted = df_clean.sort_values(SORT_COLUMNS, ascending=SORT_ASCENDING)
+    with open(path, "wb") as f:
+        for start in range(0, len(df_sorted), RUN_BLOCK_ROWS):
+            pickle.dump(df_sorted.iloc[start:start + RUN_BLOCK_ROWS], f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _iter_run(path: Path, columns):
+    """Filas de un run como tuplas (-population, rank, state, postal, resto...).
+
+    La tupla es a la vez clave de orden y fila completa, así heapq.merge compara
+    en C y los duplicados quedan contiguos.
+    """
+    with open(path, "rb") as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            arrays = [-block["population"].to_numpy(), *(block[c].to_numpy() for c in columns[1:])]
+            yield from zip(*arrays, strict=True)
+
+def merge_sorted_runs(paths, chunksize: int):
+    """Fusión k-way de runs ordenados, eliminando duplicados entre bloques.
+
+    Cada run se lee de RUN_BLOCK_ROWS en RUN_BLOCK_ROWS filas; produce DataFrames
+    de hasta `chunksize` filas en el orden global (población desc).
+    """
+    if not paths:
+        return
+    with open(paths[0], "rb") as f:
+        first = pickle.load(f)
+    extra = [c for c in first.columns if c not in SORT_COLUMNS]
+    columns = SORT_COLUMNS + extra
+
+    def to_frame(rows):
+        df = pd.DataFrame(rows, columns=columns)
+        df["population"] = -df["population"]
+        return df[first.columns]
+
+    out, prev = [], None
+    for row in heapq.merge(*(_iter_run(p, columns) for p in paths)):
+        if row == prev:
+            continue
+        prev = row
+        out.append(row)
+        if len(out) >= chunksize:
+            yield to_frame(out)
+            out = []
+    if out:
+        yield to_frame(out)
+
+def _process_chunk(chunk: pd.DataFrame, run_dir: str, i: int):
+    """Limpia y valida un bloque y lo guarda como run ordenado (se ejecuta en un worker)."""
+    df_clean, rejected = clean_and_validate(chunk)
+    return len(chunk), rejected, _write_sorted_run(df_clean, Path(run_dir), i)
+
+def process_chunks(chunks, run_dir: str, workers: int = 1):
+    """Procesa los bloques en orden, en serie o en un pool de `workers` procesos.
+
+    Los resultados se entregan en el orden de entrada. Como máximo hay 2 * workers
+    bloques en vuelo: el lector del CSV espera a que el consumidor avance.
+    """
+    if workers <= 1:
+        for i, chunk in enumerate(chunks):
+            yield _process_chunk(chunk, run_dir, i)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for i, chunk in enumerate(chunks):
+            pending.append(pool.submit(_process_chunk, chunk, run_dir, i))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def run_etl_streaming(chunksize: int = CHUNKSIZE, workers: int = WORKERS):
+    """ETL por bloques: memoria acotada por `chunksize` filas.
+
+    Cada bloque del CSV raw se normaliza, valida y deriva, y se guarda como run
+    ordenado en disco. Una fusión k-way aplica el orden global y drop_duplicates
+    entre bloques, y escribe cada bloque resultante al CSV limpio y al staging de
+    shipping_stats, que se publica de una vez al terminar.
+    """
+    if not RAW_PATH.exists():
+        logger.error(f"No se encontró el archivo: {RAW_PATH}")
+        raise FileNotFoundError(f"No se encontró el archivo: {RAW_PATH}")
+    logger.info(f"ETL streaming desde {RAW_PATH} en bloques de {chunksize} filas, {workers} worker(s)")
+    CLEAN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    engine = get_engine()
+    run_id = os.getenv("PIPELINE_RUN_ID")
+
+    n_raw = n_rejected = n_out = 0
+    with tempfile.TemporaryDirectory(prefix="etl_runs_") as tmp:
+        runs = []
+        chunks = pd.read_csv(RAW_PATH, chunksize=chunksize)
+        for n_chunk, rejected, run in process_chunks(chunks, tmp, workers):
+            n_raw += n_chunk
+            n_rejected += quarantine_rows(rejected, "shipping_data", engine, run_id)
+            runs.append(run)
+
+        # Todos los bloques van a shipping_stats__staging y se publican con un único swap
+        with OutputWriter(CLEAN_PATH) as writer, staged_load(engine, "shipping_stats") as load:
+            for block in merge_sorted_runs(runs, chunksize):
+                if run_id is not None:
+                    block["pipeline_run_id"] = run_id
+                writer.write(block)
+                load(block)
+                n_out += len(block)
+
+    logger.info(f"ETL streaming: {n_raw} filas leídas, {n_rejected} descartadas, "
+                f"{n_out} guardadas en {CLEAN_PATH} y shipping_stats")
+    return {"rows_read": n_raw, "rows_rejected": n_rejected, "rows_written": n_out}
+
+def run_etl(streaming: bool | None = None, chunksize: int | None = None,
+            workers: int | None = None, incremental: bool | None = None):
+    """Ejecuta el ETL. En modo incremental devuelve las claves cambiadas
+    ({"inserted", "updated", "deleted", "full_load"}) para los pasos posteriores."""
     logger.info("=== INICIO DEL ETL ===")
+    workers = workers or WORKERS
+    incremental = INCREMENTAL if incremental is None else incremental
     try:
+        if (STREAMING if streaming is None else streaming) or workers > 1:
+            if incremental:
+                logger.warning("Modo incremental no disponible en streaming, carga completa")
+            run_etl_streaming(chunksize or CHUNKSIZE, workers)
+            logger.info("=== ETL COMPLETADO ===")
+            return None
+
         # 1. Extraer
         df = load_data()
 
-        # 2. Transformar y validar
-        df_clean = clean_data(df)
+        # 2. Transformar y validar (rechazadas a quarantine_rows)
+        df_clean, rejected = clean_and_validate(df)
+        quarantine_rows(rejected, "shipping_data", get_engine(), os.getenv("PIPELINE_RUN_ID"))
 
         # 3. Guardar CSV limpio
         save_data(df_clean)
@@ -123,6 +239,11 @@ def run_etl():
         logger.info("Subiendo datos validados a la base de datos...")
         engine = get_engine()
         run_id = os.getenv("PIPELINE_RUN_ID")
+        if incremental:
+            changes = upsert_incremental(df_clean, engine, "shipping_stats", run_id=run_id)
+            logger.info("=== ETL COMPLETADO ===")
+            return changes
+
         if run_id is not None and "pipeline_run_id" not in df_clean.columns:
             df_clean = df_clean.copy()
             df_clean["pipeline_run_id"] = run_id
@@ -130,9 +251,21 @@ def run_etl():
         write_df_to_sql(df_clean, "shipping_stats", engine)
         logger.info("Tabla 'shipping_stats' actualizada con éxito en la base de datos")
         logger.info("=== ETL COMPLETADO ===")
+        return None
     except Exception:
         logger.critical("Error crítico en el pipeline ETL", exc_info=True)
         raise
 
 if __name__ == "__main__":
-    run_etl()
+    parser = argparse.ArgumentParser(description="ETL de shipping_data")
+    parser.add_argument("--stream", action="store_true", help="procesar el CSV raw por bloques")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="procesos de validación en paralelo (implica --stream)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert por state solo de las filas cambiadas")
+    args = parser.parse_args()
+    if args.incremental and (args.stream or args.workers > 1):
+        parser.error("--incremental no es compatible con --stream ni con --workers > 1")
+    run_etl(streaming=args.stream or None, chunksize=args.chunksize, workers=args.workers,
+            incremental=args.incremental or None)
@@ -0,0 +1,101 @@
+# src/etl/incremental.py
+"""
+Carga incremental de shipping_stats.
+
+Cada fila validada recibe una huella (hash de la clave `state` y de sus valores).
+Comparando con las huellas guardadas en la tabla se obtienen las claves insertadas,
+actualizadas y eliminadas, y solo esas se aplican como upsert por clave
+(DELETE de las claves obsoletas + INSERT de las nuevas) en una única transacción.
+Los cambios quedan registrados en `shipping_stats_changes` para los pasos posteriores.
+"""
+import logging
+
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+
+from src.database import bulk_write, read_sql_query, write_df_to_sql
+from src.database.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = "state"
+FINGERPRINT_COLUMN = "row_fingerprint"
+CHANGES_TABLE = "shipping_stats_changes"
+# Columnas que no forman parte del contenido de la fila
+_META_COLUMNS = {"pipeline_run_id", FINGERPRINT_COLUMN}
+
+
+def fingerprint_rows(df: pd.DataFrame, key: str = KEY_COLUMN) -> pd.Series:
+    """Huella int64 por fila: hash de la clave más el resto de columnas de datos."""
+    cols = [key, *sorted(c for c in df.columns if c not in _META_COLUMNS and c != key)]
+    hashes = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return pd.Series(hashes.view("int64"), index=df.index, name=FINGERPRINT_COLUMN)
+
+
+def diff_fingerprints(new: pd.Series, old: pd.Series) -> dict:
+    """Compara huellas indexadas por clave. Devuelve listas de claves por tipo de cambio."""
+    common = new.index.intersection(old.index)
+    changed = new[common].to_numpy() != old[common].to_numpy()
+    return {
+        "inserted": sorted(new.index.difference(old.index)),
+        "updated": sorted(common[changed]),
+        "deleted": sorted(old.index.difference(new.index)),
+    }
+
+
+def _stored_fingerprints(engine, table, columns, key):
+    """Huellas guardadas, o None si la tabla no existe o su esquema cambió."""
+    insp = inspect(engine)
+    if not insp.has_table(table):
+        return None
+    stored_cols = {c["name"] for c in insp.get_columns(table)}
+    if stored_cols != set(columns):
+        logger.info(f"Esquema de {table} distinto, se hará una carga completa")
+        return None
+    df = read_sql_query(f"SELECT {key}, {FINGERPRINT_COLUMN} FROM {table}", engine)
+    return df.set_index(key)[FINGERPRINT_COLUMN]
+
+
+def upsert_incremental(df_clean: pd.DataFrame, engine, table: str = "shipping_stats",
+                       key: str = KEY_COLUMN, run_id: str | None = None) -> dict:
+    """Aplica solo las filas nuevas, cambiadas o eliminadas respecto a lo guardado.
+
+    Returns:
+        {"inserted": [...], "updated": [...], "deleted": [...], "full_load": bool}
+    """
+    df = df_clean.drop_duplicates(subset=key, keep="first").copy()
+    if len(df) < len(df_clean):
+        logger.warning(f"{len(df_clean) - len(df)} filas con {key} repetido, se conserva la primera")
+    if run_id is not None:
+        df["pipeline_run_id"] = run_id
+    df[FINGERPRINT_COLUMN] = fingerprint_rows(df, key)
+
+    old = _stored_fingerprints(engine, table, df.columns, key)
+    if old is None:
+        write_df_to_sql(df, table, engine, if_exists="replace")
+        changes = {"inserted": sorted(df[key]), "updated": [], "deleted": [], "full_load": True}
+    else:
+        changes = diff_fingerprints(df.set_index(key)[FINGERPRINT_COLUMN], old)
+        changes["full_load"] = False
+        stale = changes["updated"] + changes["deleted"]
+        fresh = df[df[key].isin(changes["inserted"] + changes["updated"])]
+        with engine.begin() as conn:
+            if stale:
+                delete = text(f"DELETE FROM {table} WHERE {key} IN :keys").bindparams(
+                    bindparam("keys", expanding=True))
+                conn.execute(delete, {"keys": stale})
+            if len(fresh):
+                bulk_write(fresh, table, conn, if_exists="append")
+            elif stale:
+                bump_version(conn, table)
+
+    log = pd.DataFrame(
+        [(k, kind) for kind in ("inserted", "updated", "deleted") for k in changes[kind]],
+        columns=[key, "change"])
+    if len(log):
+        log["pipeline_run_id"] = run_id
+        log["changed_at"] = pd.Timestamp.now()
+        write_df_to_sql(log, CHANGES_TABLE, engine, if_exists="append")
+    logger.info(f"Upsert {table}: {len(changes['inserted'])} insertadas, "
+                f"{len(changes['updated'])} actualizadas, {len(changes['deleted'])} eliminadas")
+    return changes
@@ -0,0 +1,41 @@
+# src/etl/quarantine.py
+"""
+Cuarentena de filas rechazadas.
+
+Las filas que no pasan la validación se guardan en bloque en `quarantine_rows`
+(source, run_id, reason, payload JSON) con una única inserción por lote, en lugar
+de un warning por fila.
+"""
+import logging
+
+import pandas as pd
+
+from src.database import write_df_to_sql
+from src.etl.validation import REASON_COLUMN
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_TABLE = "quarantine_rows"
+
+
+def quarantine_frame(rejected: pd.DataFrame, source: str, run_id: str | None = None) -> pd.DataFrame:
+    """Convierte las rechazadas (con `rejection_reason`) al formato de quarantine_rows."""
+    payload = rejected.drop(columns=[REASON_COLUMN])
+    lines = payload.to_json(orient="records", lines=True, date_format="iso").splitlines() if len(payload) else []
+    return pd.DataFrame({
+        "source": source,
+        "run_id": run_id,
+        "reason": rejected[REASON_COLUMN].to_numpy(),
+        "payload": lines,
+        "quarantined_at": pd.Timestamp.now(),
+    })
+
+
+def quarantine_rows(rejected: pd.DataFrame, source: str, engine, run_id: str | None = None) -> int:
+    """Guarda las filas rechazadas en quarantine_rows con una sola inserción."""
+    if rejected is None or rejected.empty:
+        return 0
+    write_df_to_sql(quarantine_frame(rejected, source, run_id), QUARANTINE_TABLE, engine,
+                    if_exists="append")
+    logger.info(f"{len(rejected)} filas de {source} en cuarentena ({QUARANTINE_TABLE})")
+    return len(rejected)
@@ -4,10 +4,10 @@
 from bs4 import BeautifulSoup
 import logging
 import os
-from pydantic import BaseModel, Field, field_validator, ValidationError
 from pathlib import Path
-from src.database import get_engine, write_df_to_sql
-from src.utils.state_mapper import normalize_state_code
+from src.database import get_engine, append_fuel_snapshot, compact_fuel_history
+from src.etl.quarantine import quarantine_rows
+from src.etl.validation import validate_fuel_prices
 
 URL = "https://gasprices.aaa.com/state-gas-price-averages/"
 BASE_DIR = Path(__file__).resolve().parents[3]
@@ -17,19 +17,6 @@
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
-class FuelPriceSchema(BaseModel):
-    state: str = Field(min_length=2, max_length=2)  # Código de estado (CA, NY, etc)
-    regular: float = Field(gt=0)
-    mid_grade: float = Field(gt=0)
-    premium: float = Field(gt=0)
-    diesel: float = Field(gt=0)
-
-    @field_validator('state')
-    @classmethod
-    def state_to_code(cls, v):
-        """Normaliza estado a código de 2 letras (CA, NY, etc)."""
-        return normalize_state_code(v)
-
 def scrape_fuel_prices():
     """
     Scrapea la tabla de precios de gasolina desde AAA y guarda en la tabla `fuel_prices`.
@@ -75,59 +62,21 @@ def scrape_fuel_prices():
                     col_mapping[col] = expected_cols[i]
             df = df.rename(columns=col_mapping)
 
-        # Validar y limpiar datos
-        valid_rows = []
-        invalid_count = 0
-        
-        for index, row in df.iterrows():
-            try:
-                # Limpiar valores numéricos
-                cleaned_row = {}
-                
-                # NORMALIZAR ESTADO a código de 2 letras
-                state_raw = str(row.iloc[0]).strip().upper()
-                try:
-                    cleaned_row['state'] = normalize_state_code(state_raw)
-                except ValueError as e:
-                    logger.warning(f"Fila {index}: Estado inválido '{state_raw}': {e}")
-                    invalid_count += 1
-                    continue
-                
-                for col in ['regular', 'mid_grade', 'premium', 'diesel']:
-                    if col in expected_cols:
-                        # Encontrar el índice correcto de la columna
-                        col_idx = expected_cols.index(col)
-                        if col_idx < len(row):
-                            value = str(row.iloc[col_idx]).replace('$', '').replace(',', '')
-                            try:
-                                cleaned_row[col] = float(value)
-                            except ValueError:
-                                cleaned_row[col] = None
-                        else:
-                            cleaned_row[col] = None
-                
-                # Validar con Pydantic
-                validated = FuelPriceSchema(**cleaned_row)
-                valid_rows.append(validated.model_dump())
-                
-            except (ValidationError, ValueError, IndexError) as e:
-                invalid_count += 1
-                logger.warning(f"Fila {index} descartada: {e}")
+        # Validar y limpiar datos (estado normalizado por Series, reglas vectorizadas)
+        df_clean, rejected = validate_fuel_prices(df)
+        quarantine_rows(rejected, "fuel_prices_aaa", engine, run_id)
 
-        if invalid_count:
-            logger.info(f"Se descartaron {invalid_count} filas no válidas")
-
-        if not valid_rows:
+        if df_clean.empty:
             raise ValueError("No se encontraron datos válidos después de la validación")
 
-        df_clean = pd.DataFrame(valid_rows)
-        
         # Añadir trazabilidad
         df_clean['pipeline_run_id'] = run_id
         df_clean['scraped_at'] = pd.Timestamp.now()
         df_clean['data_source'] = 'AAA'
 
-        write_df_to_sql(df_clean, 'fuel_prices', engine, if_exists="append")
+        # Partición mensual del histórico; los snapshots antiguos se compactan
+        append_fuel_snapshot(df_clean, engine)
+        compact_fuel_history(engine)
 
         logger.info(f"✅ {len(df_clean)} registros de precios de combustible guardados (run_id: {run_id})")
         print(f"[OK] Scraping completado: {len(df_clean)} estados procesados (run_id: {run_id})")
@@ -4,7 +4,8 @@
 import os
 from io import StringIO
 from pathlib import Path
-from src.database import get_engine
+from src.database import LATEST_FUEL_VIEW, ensure_latest_fuel_view, get_engine
+from src.utils.outputs import read_output
 
 pd.set_option("future.no_silent_downcasting", True)
 
@@ -42,7 +43,7 @@ def find_project_root(start_path: Path = None) -> Path:
 def update_everything():
     """
     Actualiza la tabla maestra 'master_shipping_data' combinando:
-    - CSV limpio local (data/clean/shipping_data_clean.csv)
+    - Datos limpios locales (data/clean/shipping_data_clean.parquet o .csv)
     - Poblaciones desde Wikipedia
     - Precios de diesel desde la tabla 'fuel_prices' en la BD
     - Trazabilidad completa con run_id
@@ -65,13 +66,13 @@ def update_everything():
     logger.info("Iniciando actualización de la tabla maestra...")
 
     csv_path = PROJECT_ROOT / "data" / "clean" / "shipping_data_clean.csv"
-    if not csv_path.exists():
+    if not (csv_path.exists() or csv_path.with_suffix(".parquet").exists()):
         logger.error(f"Archivo no encontrado en: {csv_path}")
         return
 
     try:
-        # 1) Leer CSV limpio
-        df_original = pd.read_csv(csv_path, encoding="utf-8")
+        # 1) Leer datos limpios (Parquet si está disponible)
+        df_original = read_output(csv_path, encoding="utf-8")
         if "state" not in df_original.columns:
             logger.error("El CSV no contiene la columna 'state'. Abortando.")
             return
@@ -148,8 +149,10 @@ def update_everything():
 
         # 4) Añadir precios de diesel desde la BD
         try:
+            # Solo el último snapshot (vista sobre la partición más reciente)
+            ensure_latest_fuel_view(engine)
             df_diesel = pd.read_sql(
-                "SELECT state, diesel FROM fuel_prices", engine
+                f"SELECT state, diesel FROM {LATEST_FUEL_VIEW}", engine
             )
             if not df_diesel.empty:
                 df_diesel["state"] = (
@@ -0,0 +1,127 @@
+# src/etl/validation.py
+"""
+Validación columnar de los datos de envío y de los precios de combustible.
+
+Las reglas de ShippingDataSchema (rank >= 1, estado/postal de 2 letras, población > 0,
+normalización de estado) se aplican como máscaras booleanas sobre columnas completas.
+Cada fila rechazada recibe un código de motivo en `rejection_reason`. El modelo
+pydantic se conserva solo para el modo estricto (opt-in), que valida fila a fila.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from src.utils.state_mapper import normalize_state_code, normalize_state_series
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_COLUMNS = ["rank", "state", "postal", "population"]
+REASON_COLUMN = "rejection_reason"
+FUEL_PRICE_COLUMNS = ["regular", "mid_grade", "premium", "diesel"]
+
+
+class ShippingDataSchema(BaseModel):
+    rank: int = Field(ge=1)
+    state: str = Field(min_length=2, max_length=2)  # Código de estado (CA, NY, etc)
+    postal: str = Field(min_length=2, max_length=2)
+    population: float = Field(gt=0)
+
+    @field_validator("state")
+    @classmethod
+    def state_to_code(cls, v):
+        """Normaliza estado a código de 2 letras."""
+        return normalize_state_code(v)
+
+
+def _column(df, name):
+    return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+
+def _reasons(checks, index):
+    """Primer motivo de rechazo de cada fila ('' si pasa todas las reglas)."""
+    return pd.Series(np.select([m.to_numpy(dtype=bool) for _, m in checks],
+                               [name for name, _ in checks], default=""), index=index)
+
+
+def _split(df, typed, reason, dtypes):
+    """Separa válidas (tipadas) y rechazadas (originales + motivo); un log por motivo."""
+    ok = (reason == "").to_numpy()
+    valid = typed[ok].astype(dtypes)
+    rejected = df[~ok].copy()
+    rejected[REASON_COLUMN] = reason[~ok]
+    for code, n in rejected[REASON_COLUMN].value_counts().items():
+        logger.warning(f"Filas descartadas por {code}: {n}")
+    return valid.reset_index(drop=True), rejected
+
+
+def _validate_vectorized(df):
+    """Aplica las reglas del esquema como máscaras. Devuelve (datos tipados, motivo)."""
+    rank = pd.to_numeric(_column(df, "rank"), errors="coerce")
+    state = normalize_state_series(_column(df, "state"))
+    postal = _column(df, "postal").astype("string").str.strip()
+    population = pd.to_numeric(_column(df, "population"), errors="coerce")
+
+    checks = [
+        ("rank_invalid", ~((rank >= 1) & (rank % 1 == 0))),
+        ("state_invalid", state.isna()),
+        ("postal_invalid", ~(postal.str.len() == 2).fillna(False)),
+        ("population_invalid", ~(population > 0)),
+    ]
+    reason = _reasons(checks, df.index)
+    typed = pd.DataFrame({"rank": rank, "state": state, "postal": postal, "population": population})
+    return typed, reason
+
+
+def _validate_strict(df):
+    """Modo estricto: valida cada fila con ShippingDataSchema (lento)."""
+    rows, reasons = [], []
+    records = df.reindex(columns=SCHEMA_COLUMNS)
+    # Nombres completos -> código antes de las restricciones de longitud del esquema
+    records["state"] = normalize_state_series(records["state"]).fillna(records["state"])
+    records = records.to_dict("records")
+    for record in records:
+        try:
+            rows.append(ShippingDataSchema(**record).model_dump())
+            reasons.append("")
+        except ValidationError as e:
+            loc = e.errors()[0]["loc"]
+            rows.append(dict.fromkeys(SCHEMA_COLUMNS))
+            reasons.append(f"{loc[0]}_invalid" if loc else "row_invalid")
+    typed = pd.DataFrame(rows, index=df.index, columns=SCHEMA_COLUMNS)
+    return typed, pd.Series(reasons, index=df.index, dtype=object)
+
+
+def validate_shipping(df: pd.DataFrame, strict: bool = False):
+    """Valida un lote de filas de envío contra el esquema.
+
+    Args:
+        df: filas con columnas rank, state, postal, population (nombres ya normalizados)
+        strict: si es True usa pydantic fila a fila en lugar de las máscaras vectorizadas
+    Returns:
+        (validas, rechazadas): las válidas con solo SCHEMA_COLUMNS tipadas; las
+        rechazadas con sus columnas originales más `rejection_reason`.
+    """
+    typed, reason = _validate_strict(df) if strict else _validate_vectorized(df)
+    typed = typed.astype({"state": object, "postal": object})
+    return _split(df, typed, reason, {"rank": "int64", "population": "float64"})
+
+
+def validate_fuel_prices(df: pd.DataFrame):
+    """Valida la tabla de precios AAA (state + 4 precios) con máscaras vectorizadas.
+
+    Los precios se limpian de '$' y ',' y deben ser > 0.
+    Returns:
+        (validas, rechazadas) con el mismo formato que validate_shipping.
+    """
+    state = normalize_state_series(_column(df, "state"))
+    prices = {
+        col: pd.to_numeric(_column(df, col).astype("string").str.replace(r"[$,]", "", regex=True),
+                           errors="coerce")
+        for col in FUEL_PRICE_COLUMNS
+    }
+    checks = [("state_invalid", state.isna())]
+    checks += [(f"{col}_invalid", ~(prices[col] > 0)) for col in FUEL_PRICE_COLUMNS]
+    typed = pd.DataFrame({"state": state, **prices})
+    return _split(df, typed, _reasons(checks, df.index), dict.fromkeys(FUEL_PRICE_COLUMNS, "float64"))
@@ -0,0 +1,105 @@
+# src/utils/outputs.py
+"""
+Escritura y lectura de los datasets de salida (clean / final).
+
+OUTPUT_FORMAT elige el formato: "csv" (por defecto), "parquet" o "both". El Parquet
+se guarda comprimido, con las columnas de estado como diccionario (category) y
+tipos explícitos. Toda escritura es atómica: se escribe a un temporal en el mismo
+directorio y se renombra. Los lectores prefieren el Parquet si está al día.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv").lower()
+PARQUET_COMPRESSION = "zstd"
+
+# Columnas de baja cardinalidad que se guardan con dictionary encoding
+CATEGORICAL_COLUMNS = ["state", "postal", "region", "condition", "pipeline_run_id", "data_source"]
+
+
+def _formats(fmt):
+    fmt = (fmt or OUTPUT_FORMAT).lower()
+    if fmt not in ("csv", "parquet", "both"):
+        raise ValueError(f"OUTPUT_FORMAT no válido: {fmt}")
+    return {"csv": ["csv"], "parquet": ["parquet"], "both": ["csv", "parquet"]}[fmt]
+
+
+def to_parquet_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos explícitos para Parquet: estados como category, texto como string."""
+    out = df.copy()
+    for col in out.columns:
+        if col in CATEGORICAL_COLUMNS:
+            out[col] = out[col].astype("category")
+        elif out[col].dtype == object:
+            out[col] = out[col].astype("string")
+    return out
+
+
+class OutputWriter:
+    """Escritor por bloques a CSV y/o Parquet; publica los ficheros al cerrar.
+
+    Cada formato se escribe en un temporal del mismo directorio y se renombra con
+    os.replace solo si todos los bloques se escribieron sin error.
+    """
+
+    def __init__(self, path, fmt: str | None = None):
+        path = Path(path)
+        self.targets = [path.with_suffix(f".{kind}") for kind in _formats(fmt)]
+        self._tmp = {t: t.with_name(f".{t.name}.tmp") for t in self.targets}
+        self._parquet = None
+        self._blocks = 0
+        self.rows = 0
+
+    def __enter__(self):
+        for target in self.targets:
+            target.parent.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def write(self, df: pd.DataFrame):
+        for target, tmp in self._tmp.items():
+            if target.suffix == ".csv":
+                df.to_csv(tmp, mode="a" if self._blocks else "w", header=not self._blocks, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if self._parquet is None:
+                    table = pa.Table.from_pandas(to_parquet_frame(df), preserve_index=False)
+                    self._parquet = pq.ParquetWriter(tmp, table.schema, compression=PARQUET_COMPRESSION)
+                else:
+                    table = pa.Table.from_pandas(to_parquet_frame(df), schema=self._parquet.schema,
+                                                 preserve_index=False)
+                self._parquet.write_table(table)
+        self._blocks += 1
+        self.rows += len(df)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._parquet is not None:
+            self._parquet.close()
+        for target, tmp in self._tmp.items():
+            if exc_type is None and tmp.exists():
+                os.replace(tmp, target)
+            else:
+                tmp.unlink(missing_ok=True)
+        return False
+
+
+def write_output(df: pd.DataFrame, path, fmt: str | None = None) -> list:
+    """Guarda `df` en `path` (.csv) y/o en su hermano .parquet según el formato, de forma atómica.
+
+    Returns:
+        Lista de rutas escritas.
+    """
+    with OutputWriter(path, fmt) as writer:
+        writer.write(df)
+    return writer.targets
+
+
+def read_output(path, **csv_kwargs) -> pd.DataFrame:
+    """Lee un dataset de salida, prefiriendo el .parquet si no es más antiguo que el .csv."""
+    path = Path(path)
+    parquet, csv = path.with_suffix(".parquet"), path.with_suffix(".csv")
+    if parquet.exists() and (not csv.exists() or parquet.stat().st_mtime >= csv.stat().st_mtime):
+        return pd.read_parquet(parquet)
+    return pd.read_csv(csv, **csv_kwargs)
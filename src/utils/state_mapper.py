@@ -3,6 +3,11 @@
 Módulo centralizado para mapear entre códigos de estado (CA, NY) y nombres completos.
 Fuente de verdad para normalización de estados en todo el pipeline.
 """
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 
 # Mapeo oficial: State Code ↔ State Name
 STATE_CODE_TO_NAME = {
@@ -63,6 +68,65 @@
 }
 
 
+# Abreviaturas habituales (estilo AP / postales antiguas), sin puntos
+STATE_ABBREVIATIONS = {
+    'ALA': 'AL', 'ARIZ': 'AZ', 'ARK': 'AR', 'CALIF': 'CA', 'CAL': 'CA', 'COLO': 'CO',
+    'CONN': 'CT', 'DEL': 'DE', 'FLA': 'FL', 'ILL': 'IL', 'IND': 'IN', 'KAN': 'KS',
+    'KANS': 'KS', 'MASS': 'MA', 'MICH': 'MI', 'MINN': 'MN', 'MISS': 'MS', 'MONT': 'MT',
+    'NEB': 'NE', 'NEBR': 'NE', 'NEV': 'NV', 'OKLA': 'OK', 'ORE': 'OR', 'PENN': 'PA',
+    'TENN': 'TN', 'TEX': 'TX', 'WASH': 'WA', 'WIS': 'WI', 'WISC': 'WI', 'WYO': 'WY',
+    'W VA': 'WV', 'N DAK': 'ND', 'S DAK': 'SD',
+}
+
+# Errores tipográficos frecuentes en las fuentes
+STATE_TYPOS = {
+    'CALIFORINA': 'CA', 'CALIFRONIA': 'CA', 'CONNETICUT': 'CT', 'CONNECTICUTT': 'CT',
+    'FLORDIA': 'FL', 'ILLINOS': 'IL', 'LOUISANA': 'LA', 'MASSACHUSETS': 'MA',
+    'MASSACHUSSETTS': 'MA', 'MISSISIPPI': 'MS', 'MISSISSIPI': 'MS', 'MINNESOTTA': 'MN',
+    'PENSYLVANIA': 'PA', 'PENNSILVANIA': 'PA', 'TENNESSE': 'TN', 'TENNESEE': 'TN',
+    'VIRGINA': 'VA', 'WISCONSON': 'WI', 'ARIZONIA': 'AZ', 'KENTUCY': 'KY',
+}
+
+# Tabla de búsqueda única: clave canónica (mayúsculas, sin puntos, espacios simples) -> código
+STATE_LOOKUP = {
+    **{code: code for code in STATE_CODE_TO_NAME},
+    **STATE_NAME_TO_CODE,
+    **STATE_ABBREVIATIONS,
+    **STATE_TYPOS,
+}
+
+_SEPARATORS = re.compile(r"[.\s]+")
+_SPLIT_CODE = re.compile(r"^([A-Z]) ([A-Z])$")  # "N. Y." -> "N Y" -> "NY"
+
+
+@lru_cache(maxsize=4096)
+def _lookup_state(value: str):
+    """Resuelve un valor contra STATE_LOOKUP (memoizado). None si no se reconoce."""
+    key = _SEPARATORS.sub(" ", value.upper()).strip()
+    key = _SPLIT_CODE.sub(r"\1\2", key)
+    return STATE_LOOKUP.get(key)
+
+
+def normalize_state_series(values) -> pd.Series:
+    """
+    Normaliza una Series de estados a códigos de 2 letras.
+
+    Los valores se factorizan y cada valor distinto se resuelve una sola vez contra
+    STATE_LOOKUP (códigos, nombres, abreviaturas y errores frecuentes); el
+    resultado se expande a todas las filas con los códigos de factorize.
+
+    Returns:
+        Series de códigos (CA, NY...) con NaN para los valores no reconocidos.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    resolved = np.array([_lookup_state(u) if isinstance(u, str) else None for u in uniques] + [None],
+                        dtype=object)
+    # codes == -1 (nulos) apunta al None final
+    out = pd.Series(resolved[codes], index=values.index, dtype=object)
+    return out.fillna(np.nan)
+
+
 def normalize_state_code(state: str) -> str:
     """
     Normaliza cualquier entrada de estado a código de 2 letras (CA, NY, etc).
@@ -78,18 +142,11 @@ def normalize_state_code(state: str) -> str:
     """
     if not state:
         raise ValueError("Estado no puede estar vacío")
-    
-    state_clean = state.strip().upper()
-    
-    # Si ya es un código válido (2 letras)
-    if len(state_clean) == 2 and state_clean in STATE_CODE_TO_NAME:
-        return state_clean
-    
-    # Si es un nombre completo de estado
-    if state_clean in STATE_NAME_TO_CODE:
-        return STATE_NAME_TO_CODE[state_clean]
-    
-    raise ValueError(f"Estado no reconocido: {state}")
+
+    code = _lookup_state(str(state))
+    if code is None:
+        raise ValueError(f"Estado no reconocido: {state}")
+    return code
 
 
 def get_city_for_state(state_code: str) -> str:
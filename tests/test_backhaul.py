@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.analysis.backhaul import match_backhauls
+
+
+def _costs():
+    miles = {("CA", "TX"): 1400.0, ("CA", "AZ"): 370.0, ("AZ", "TX"): 1000.0}
+    rows = []
+    for a in ["CA", "AZ", "TX"]:
+        for b in ["CA", "AZ", "TX"]:
+            mi = 0.0 if a == b else miles.get((a, b), miles.get((b, a)))
+            rows.append({"origin": a, "destination": b, "driving_mi": mi, "total_cost": 2 * mi})
+    return pd.DataFrame(rows)
+
+
+def test_exact_reverse_lane_is_the_best_backhaul():
+    lanes = pd.DataFrame([
+        {"origin": "CA", "destination": "TX", "tons_m": 2.0},
+        {"origin": "TX", "destination": "CA", "tons_m": 1.0},
+        {"origin": "TX", "destination": "AZ", "tons_m": 1.0},
+    ])
+    balance = pd.DataFrame([{"state": "TX", "net_tons_m": -1.0}, {"state": "CA", "net_tons_m": 1.0}])
+    matches = match_backhauls(lanes, _costs(), balance, max_deadhead_mi=500)
+
+    best = matches[(matches["outbound_origin"] == "CA") & (matches["rank"] == 1)].iloc[0]
+    assert (best["return_origin"], best["return_destination"]) == ("TX", "CA")
+    assert best["detour_cost"] == 0
+    assert best["savings_per_load"] == 2 * 1400 * 2
+    assert best["matched_tons_m"] == 1.0
+    assert best["dest_net_tons_m"] == -1.0
+
+    # TX->AZ then AZ->CA empty (370 mi) is still a valid, cheaper-ranked pairing
+    second = matches[(matches["outbound_origin"] == "CA") & (matches["rank"] == 2)].iloc[0]
+    assert second["return_destination"] == "AZ"
+    assert second["deadhead_mi"] == 370.0
+
+
+def test_pairings_beyond_deadhead_limit_are_dropped():
+    lanes = pd.DataFrame([
+        {"origin": "CA", "destination": "TX", "tons_m": 2.0},
+        {"origin": "TX", "destination": "AZ", "tons_m": 3.0},
+    ])
+    matches = match_backhauls(lanes, _costs(), max_deadhead_mi=100)
+    assert matches.empty
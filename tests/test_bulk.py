@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from src.database import bulk_write, write_df_to_sql
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=["origin", "destination", "cost"])
+    df["scraped_at"] = pd.Timestamp("2024-05-01 10:00:00")
+    return df
+
+
+def test_bulk_write_modes_match_to_sql(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    df = _frame([("CA", "TX", 10.5), ("TX", "NY", None), ("NY", "CA", 7.0)])
+
+    stats = write_df_to_sql(df, "lanes", engine)
+    assert stats["rows"] == 3 and stats["method"] == "executemany"
+    df.to_sql("lanes_pandas", engine, index=False)
+    got = pd.read_sql("SELECT * FROM lanes", engine)
+    expected = pd.read_sql("SELECT * FROM lanes_pandas", engine)
+    pd.testing.assert_frame_equal(got, expected)
+
+    bulk_write(_frame([("FL", "GA", 3.0)]), "lanes", engine, if_exists="append")
+    bulk_write(_frame([("CA", "TX", 12.0), ("GA", "FL", 4.0)]), "lanes", engine,
+               if_exists="upsert", keys=["origin", "destination"])
+    stored = pd.read_sql("SELECT origin, destination, cost FROM lanes ORDER BY origin, destination", engine)
+    assert list(stored.itertuples(index=False, name=None))[:2] == [("CA", "TX", 12.0), ("FL", "GA", 3.0)]
+    assert len(stored) == 5
+
+    with pytest.raises(ValueError):
+        bulk_write(df, "lanes", engine, if_exists="upsert")
+
+
+def test_indexes_survive_replace_and_are_reported(tmp_path):
+    from sqlalchemy import inspect
+
+    from src.database import ensure_all_indexes, missing_indexes
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ix.db'}")
+    write_df_to_sql(_frame([("CA", "TX", 1.0)]), "route_costs", engine)
+    write_df_to_sql(_frame([("CA", "TX", 2.0)]), "route_costs", engine, if_exists="replace")
+    names = {ix["name"] for ix in inspect(engine).get_indexes("route_costs")}
+    assert "ix_route_costs_origin_destination" in names
+
+    fuel = pd.DataFrame({"state": ["CA"], "diesel": [4.5], "scraped_at": [pd.Timestamp.now()]})
+    fuel.to_sql("fuel_prices", engine, index=False)
+    assert {m["index"] for m in missing_indexes(engine)} == {
+        "ix_fuel_prices_state_scraped_at", "ix_fuel_prices_scraped_at"}
+    ensure_all_indexes(engine)
+    assert missing_indexes(engine) == []
+
+
+def test_iter_sql_chunks_bounded_reads(tmp_path):
+    from src.database import iter_sql_chunks
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'chunks.db'}")
+    df = pd.DataFrame({"state": ["CA", "TX", "NY", "CA", "TX"], "diesel": [4.0, 3.0, 5.0, 4.2, 3.1]})
+    write_df_to_sql(df, "fuel_prices", engine)
+
+    chunks = list(iter_sql_chunks("fuel_prices", engine, columns=["state", "diesel"], chunksize=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+    ca = list(iter_sql_chunks("fuel_prices", engine, columns=["diesel"],
+                              where="state = :state", params={"state": "CA"}))
+    assert pd.concat(ca)["diesel"].tolist() == [4.0, 4.2]
+
+
+def test_query_cache_hits_until_table_changes(tmp_path):
+    from src.database import cache_stats, clear_query_cache, read_sql_query, table_versions
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    clear_query_cache()
+    write_df_to_sql(_frame([("CA", "TX", 1.0)]), "route_costs", engine)
+    sql = "SELECT origin, cost FROM route_costs"
+
+    first = read_sql_query(sql, engine)
+    first["cost"] = 99.0  # los resultados cacheados no se comparten
+    assert read_sql_query(sql, engine)["cost"].tolist() == [1.0]
+    assert cache_stats()["hits"] == 1
+
+    write_df_to_sql(_frame([("NY", "CA", 2.0)]), "route_costs", engine, if_exists="append")
+    assert table_versions(engine, ["route_costs"]) == {"route_costs": 2}
+    assert read_sql_query(sql, engine)["cost"].tolist() == [1.0, 2.0]
+    assert cache_stats()["hits"] == 1
+
+    # Tablas sin versión (escritas fuera del pipeline) no se cachean
+    _frame([("FL", "GA", 3.0)]).to_sql("external", engine, index=False)
+    read_sql_query("SELECT * FROM external", engine)
+    read_sql_query("SELECT * FROM external", engine)
+    assert cache_stats()["entries"] == 2
+
+    # Las tablas de un FROM con comas también invalidan la consulta
+    write_df_to_sql(_frame([("CA", "TX", 5.0)]), "lanes", engine)
+    join = "SELECT r.origin, l.cost FROM route_costs r, lanes l WHERE r.origin = l.origin"
+    assert read_sql_query(join, engine)["cost"].tolist() == [5.0]
+    write_df_to_sql(_frame([("CA", "TX", 6.0)]), "lanes", engine)
+    assert read_sql_query(join, engine)["cost"].tolist() == [6.0]
+
+    # Referencias que no se pueden resolver no se cachean
+    from src.database.cache import tables_in
+    assert tables_in("SELECT * FROM route_costs, json_each('[1]')") is None
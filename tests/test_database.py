@@ -0,0 +1,180 @@
+import threading
+
+import pandas as pd
+
+from src.database.database import _build_engine
+
+
+def test_sqlite_profile_lets_reads_run_during_a_write(tmp_path):
+    engine = _build_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    pd.DataFrame({"state": ["CA", "TX"], "diesel": [4.5, 3.2]}).to_sql("fuel_prices", engine, index=False)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+
+    read = {}
+    with engine.begin() as writer:
+        writer.exec_driver_sql("INSERT INTO fuel_prices VALUES ('NY', 5.0)")
+
+        # Lectura concurrente desde otro hilo/conexión mientras la escritura sigue abierta
+        def reader():
+            with engine.connect() as conn:
+                read["n"] = conn.exec_driver_sql("SELECT COUNT(*) FROM fuel_prices").scalar()
+
+        t = threading.Thread(target=reader)
+        t.start()
+        t.join(timeout=5)
+        assert not t.is_alive()
+    assert read["n"] == 2
+    engine.dispose()
+
+
+def test_replace_swaps_in_atomically_and_snapshot_publishes_together(tmp_path):
+    from sqlalchemy import inspect
+
+    from src.database import ensure_latest_fuel_view, publish_snapshot, write_df_to_sql
+
+    engine = _build_engine(f"sqlite:///{tmp_path / 'swap.db'}")
+    lanes = pd.DataFrame({"origin": ["CA"], "destination": ["TX"], "tons_m": [1.0]})
+    write_df_to_sql(lanes, "freight_lanes", engine)
+    write_df_to_sql(lanes.assign(tons_m=2.0), "freight_lanes", engine)
+    assert pd.read_sql("SELECT tons_m FROM freight_lanes", engine)["tons_m"].tolist() == [2.0]
+    assert "ix_freight_lanes_origin_destination" in {
+        ix["name"] for ix in inspect(engine).get_indexes("freight_lanes")}
+
+    # El replace no rompe la vista que depende de la tabla
+    fuel = pd.DataFrame({"state": ["CA"], "regular": [4.0], "mid_grade": [4.2], "premium": [4.4],
+                         "diesel": [4.5], "scraped_at": [pd.Timestamp("2024-01-01")]})
+    write_df_to_sql(fuel, "fuel_prices", engine)
+    ensure_latest_fuel_view(engine)
+    write_df_to_sql(fuel.assign(diesel=5.0), "fuel_prices", engine)
+    assert pd.read_sql("SELECT diesel FROM fuel_prices_latest", engine)["diesel"].tolist() == [5.0]
+
+    # Dentro del snapshot los lectores siguen viendo la versión anterior
+    with publish_snapshot(engine):
+        write_df_to_sql(lanes.assign(tons_m=3.0), "freight_lanes", engine)
+        write_df_to_sql(lanes, "freight_by_state", engine)
+        assert pd.read_sql("SELECT tons_m FROM freight_lanes", engine)["tons_m"].tolist() == [2.0]
+        assert not inspect(engine).has_table("freight_by_state")
+    assert pd.read_sql("SELECT tons_m FROM freight_lanes", engine)["tons_m"].tolist() == [3.0]
+    assert inspect(engine).has_table("freight_by_state")
+
+    # Un bloque fallido no publica nada y limpia los staging
+    try:
+        with publish_snapshot(engine):
+            write_df_to_sql(lanes.assign(tons_m=4.0), "freight_lanes", engine)
+            raise RuntimeError("fallo a mitad de paso")
+    except RuntimeError:
+        pass
+    assert pd.read_sql("SELECT tons_m FROM freight_lanes", engine)["tons_m"].tolist() == [3.0]
+    assert not [t for t in inspect(engine).get_table_names() if t.endswith("__staging")]
+    engine.dispose()
+
+
+def test_typed_schema_encodes_dictionaries_and_migrates_legacy_tables(tmp_path):
+    from sqlalchemy import inspect
+
+    from src.database import migrate, read_sql_query, write_df_to_sql
+
+    engine = _build_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    lanes = pd.DataFrame({"origin": ["CA", "TX", "CA"], "destination": ["TX", "NY", "NY"],
+                          "commodity": ["Grains", "Machinery", "Grains"],
+                          "mode": ["Truck", "Rail", "Truck"], "tons_m": [1.5, 2.0, 0.5]})
+    write_df_to_sql(lanes, "freight_lanes", engine)
+
+    raw = pd.read_sql("SELECT mode, commodity FROM freight_lanes", engine)
+    assert pd.api.types.is_integer_dtype(raw["mode"]) and pd.api.types.is_integer_dtype(raw["commodity"])
+    assert pd.read_sql("SELECT value FROM dim_modes ORDER BY id", engine)["value"].tolist() == ["Rail", "Truck"]
+    types = {c["name"]: str(c["type"]) for c in inspect(engine).get_columns("freight_lanes")}
+    assert types["origin"] == "VARCHAR(2)" and types["mode"] == "SMALLINT"
+
+    got = read_sql_query("SELECT * FROM freight_lanes", engine)
+    assert isinstance(got["mode"].dtype, pd.CategoricalDtype)
+    assert got["commodity"].astype(str).tolist() == lanes["commodity"].tolist()
+
+    # Tabla previa con texto inferido por pandas: la migración la reescribe tipada
+    legacy = pd.DataFrame({"state": ["CA"], "diesel": [4.5], "scraped_at": ["2024-01-01 10:00:00"],
+                           "pipeline_run_id": ["a1b2c3"]})
+    legacy.to_sql("fuel_prices", engine, index=False)
+    assert migrate(engine) == [1, 2] and migrate(engine) == []
+    fuel = read_sql_query("SELECT * FROM fuel_prices", engine)
+    assert fuel["pipeline_run_id"].astype(str).tolist() == ["a1b2c3"]
+    assert fuel["scraped_at"].tolist() == [pd.Timestamp("2024-01-01 10:00:00")]
+    assert read_sql_query("SELECT mode FROM freight_lanes", engine)["mode"].astype(str).tolist() == \
+        lanes["mode"].tolist()
+    engine.dispose()
+
+
+
+def test_fuel_history_partitions_by_month_and_compacts_old_snapshots(tmp_path):
+    from sqlalchemy import inspect
+
+    from src.database import (LATEST_FUEL_VIEW, append_fuel_snapshot, compact_fuel_history,
+                              current_fuel_table, read_sql_query)
+
+    engine = _build_engine(f"sqlite:///{tmp_path / 'fuel.db'}")
+
+    def snapshot(ts, diesel):
+        return pd.DataFrame({"state": ["CA", "TX"], "regular": [4.0, 3.0], "mid_grade": [4.2, 3.2],
+                             "premium": [4.4, 3.4], "diesel": diesel, "scraped_at": pd.Timestamp(ts),
+                             "pipeline_run_id": "run", "data_source": "AAA"})
+
+    # Histórico previo en una tabla plana: se convierte al añadir el primer snapshot
+    snapshot("2024-01-10 08:00", [5.0, 4.0]).to_sql("fuel_prices", engine, index=False)
+    append_fuel_snapshot(snapshot("2024-01-10 20:00", [4.0, 3.0]), engine)
+    append_fuel_snapshot(snapshot("2024-03-05 08:00", [4.5, 3.5]), engine)
+    append_fuel_snapshot(snapshot("2024-03-06 08:00", [4.6, 3.6]), engine)
+
+    insp = inspect(engine)
+    assert [t for t in insp.get_table_names() if t.startswith("fuel_prices")] == \
+        ["fuel_prices_p202401", "fuel_prices_p202403"]
+    assert "fuel_prices" in insp.get_view_names()
+    assert current_fuel_table(engine) == "fuel_prices_p202403"
+    assert len(read_sql_query("SELECT * FROM fuel_prices", engine)) == 8
+    latest = read_sql_query(f"SELECT state, diesel FROM {LATEST_FUEL_VIEW} ORDER BY state", engine)
+    assert latest["diesel"].tolist() == [4.6, 3.6]
+
+    # Los dos snapshots del 10 de enero se compactan en una media diaria por estado
+    summary = compact_fuel_history(engine, keep_days=30, granularity="daily",
+                                   now=pd.Timestamp("2024-03-06"))
+    assert summary == {"fuel_prices_p202401": {"rows_before": 4, "rows_after": 2}}
+    jan = read_sql_query("SELECT * FROM fuel_prices_p202401 ORDER BY state", engine)
+    assert jan["diesel"].tolist() == [4.5, 3.5]
+    assert jan["data_source"].astype(str).unique().tolist() == ["compacted_daily"]
+    assert jan["scraped_at"].tolist() == [pd.Timestamp("2024-01-10")] * 2
+    assert compact_fuel_history(engine, keep_days=30, granularity="daily",
+                                now=pd.Timestamp("2024-03-06")) == {}
+    assert len(read_sql_query("SELECT * FROM fuel_prices", engine)) == 6
+    engine.dispose()
+
+
+def test_fuel_as_of_join_keeps_one_price_row_per_state(tmp_path):
+    from src.database import append_fuel_snapshot, fuel_prices_as_of, join_fuel_as_of
+
+    engine = _build_engine(f"sqlite:///{tmp_path / 'asof.db'}")
+    for ts, diesel in [("2024-01-10", [4.0, 3.0]), ("2024-02-10", [4.5, 3.5]), ("2024-03-10", [5.0, 4.0])]:
+        append_fuel_snapshot(pd.DataFrame({"state": ["CA", "TX"], "diesel": diesel,
+                                           "scraped_at": pd.Timestamp(ts)}), engine)
+    shipping = pd.DataFrame({"state": ["TX", "CA", "NY"], "population": [30, 39, 19]})
+
+    latest = join_fuel_as_of(shipping, engine, columns=["diesel"])
+    assert latest["state"].tolist() == ["TX", "CA", "NY"]
+    assert latest["diesel"].tolist()[:2] == [4.0, 5.0] and pd.isna(latest["diesel"].iloc[2])
+
+    # Snapshot vigente en una fecha: el último anterior a ella, aunque esté en otra partición
+    assert fuel_prices_as_of(engine, "2024-03-01", ["diesel"])["diesel"].tolist() == [4.5, 3.5]
+
+    # Cada fila con su propia fecha (merge_asof); el orden de entrada se conserva
+    orders = pd.DataFrame({"state": ["CA", "CA", "TX"],
+                           "ordered_at": ["2024-03-15", "2024-01-20", "2023-12-01"]})
+    got = join_fuel_as_of(orders, engine, time_col="ordered_at", columns=["diesel"])
+    assert len(got) == 3 and got["diesel"].tolist()[:2] == [5.0, 4.0] and pd.isna(got["diesel"].iloc[2])
+
+    # Un estado ausente de la partición más nueva conserva su último precio válido
+    append_fuel_snapshot(pd.DataFrame({"state": ["CA"], "diesel": [5.5],
+                                       "scraped_at": pd.Timestamp("2024-04-02")}), engine)
+    current = fuel_prices_as_of(engine, columns=["diesel"])
+    assert current["state"].tolist() == ["CA", "TX"] and current["diesel"].tolist() == [5.5, 4.0]
+    engine.dispose()
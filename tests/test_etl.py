@@ -1,6 +1,12 @@
+import json
+
 import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
 
 import src.etl.etl as etl
+from src.etl.quarantine import quarantine_frame
+from src.etl.validation import validate_fuel_prices, validate_shipping
 
 
 def test_clean_data_removes_invalid_rows():
@@ -34,3 +40,101 @@ def test_save_and_load_data(tmp_path, monkeypatch):
     monkeypatch.setattr(etl, 'CLEAN_PATH', tmp_clean)
     etl.save_data(df)
     assert tmp_clean.exists()
+
+
+def test_validation_reasons_match_strict_mode():
+    df = pd.DataFrame([
+        {"rank": 1, "state": "california", "postal": "CA", "population": 100},
+        {"rank": 0, "state": "TX", "postal": "TX", "population": 5},
+        {"rank": 2, "state": "Atlantis", "postal": "AT", "population": 5},
+        {"rank": 3, "state": "NY", "postal": "NYX", "population": 5},
+        {"rank": 4, "state": "WA", "postal": "WA", "population": -1},
+    ])
+
+    valid, rejected = validate_shipping(df)
+    assert valid.to_dict("records") == [{"rank": 1, "state": "CA", "postal": "CA", "population": 100.0}]
+    assert rejected["rejection_reason"].tolist() == [
+        "rank_invalid", "state_invalid", "postal_invalid", "population_invalid"]
+
+    strict_valid, strict_rejected = validate_shipping(df, strict=True)
+    pd.testing.assert_frame_equal(strict_valid, valid)
+    assert strict_rejected["rejection_reason"].tolist() == rejected["rejection_reason"].tolist()
+
+
+def test_streaming_etl_matches_in_memory(tmp_path, monkeypatch):
+    rows = [{"rank": r, "state": s, "postal": s[:2].upper(), "population": p}
+            for r, s, p in [(1, "CA", 500), (2, "Texas", 400), (3, "NY", 300), (0, "WA", 10),
+                            (4, "FL", 200), (2, "Texas", 400), (5, "Atlantis", 50), (6, "OH", 350)]]
+    raw = tmp_path / "raw.csv"
+    pd.DataFrame(rows).to_csv(raw, index=False)
+    monkeypatch.setattr(etl, "RAW_PATH", raw)
+    monkeypatch.setattr(etl, "CLEAN_PATH", tmp_path / "clean.csv")
+    monkeypatch.delenv("PIPELINE_RUN_ID", raising=False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    monkeypatch.setattr(etl, "get_engine", lambda: engine)
+
+    stats = etl.run_etl_streaming(chunksize=3, workers=1)
+    assert stats == {"rows_read": 8, "rows_rejected": 2, "rows_written": 5}
+
+    expected = etl.clean_data(pd.DataFrame(rows)).reset_index(drop=True)
+    streamed = pd.read_csv(tmp_path / "clean.csv")
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+    assert pd.read_sql("SELECT * FROM shipping_stats", engine)["state"].tolist() == expected["state"].tolist()
+
+    quarantined = pd.read_sql("SELECT * FROM quarantine_rows", engine)
+    assert sorted(quarantined["reason"]) == ["rank_invalid", "state_invalid"]
+    assert (quarantined["source"] == "shipping_data").all()
+
+    # Un fallo a mitad de la fusión deja shipping_stats como estaba
+    def failing_merge(runs, chunksize):
+        yield pd.DataFrame({"rank": [1], "state": ["ZZ"], "postal": ["ZZ"], "population": [1]})
+        raise RuntimeError("fallo a mitad de la fusión")
+
+    monkeypatch.setattr(etl, "merge_sorted_runs", failing_merge)
+    with pytest.raises(RuntimeError):
+        etl.run_etl_streaming(chunksize=3, workers=1)
+    assert pd.read_sql("SELECT * FROM shipping_stats", engine)["state"].tolist() == expected["state"].tolist()
+    assert not inspect(engine).has_table("shipping_stats__staging")
+
+
+def test_parallel_workers_match_serial(tmp_path, monkeypatch):
+    rows = pd.DataFrame({"rank": [(i % 7) for i in range(60)],
+                         "state": ["CA", "Texas", "ny", "Atlantis"] * 15,
+                         "postal": ["CA", "TX", "NY", "AT"] * 15,
+                         "population": [100 + (i * 37) % 23 for i in range(60)]})
+    raw = tmp_path / "raw.csv"
+    rows.to_csv(raw, index=False)
+    monkeypatch.setattr(etl, "RAW_PATH", raw)
+    monkeypatch.delenv("PIPELINE_RUN_ID", raising=False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    monkeypatch.setattr(etl, "get_engine", lambda: engine)
+
+    outputs = {}
+    for workers in (1, 3):
+        monkeypatch.setattr(etl, "CLEAN_PATH", tmp_path / f"clean_{workers}.csv")
+        stats = etl.run_etl_streaming(chunksize=7, workers=workers)
+        outputs[workers] = (stats, pd.read_csv(tmp_path / f"clean_{workers}.csv"))
+
+    assert outputs[1][0] == outputs[3][0]
+    pd.testing.assert_frame_equal(outputs[1][1], outputs[3][1])
+
+
+def test_validate_fuel_prices_cleans_dollar_strings():
+    df = pd.DataFrame({"state": ["California", "Tex.", "Atlantis", "N.Y."],
+                       "regular": ["$4.50", "$3.10", "$3.00", "$0"],
+                       "mid_grade": ["$4.80", "$3.40", "$3.30", "$3.60"],
+                       "premium": ["$5.00", "$3.70", "$3.60", "$3.90"],
+                       "diesel": ["$5.20", "$3.50", "$3.40", "$4.00"]})
+    valid, rejected = validate_fuel_prices(df)
+    assert valid["state"].tolist() == ["CA", "TX"] and valid["regular"].tolist() == [4.5, 3.1]
+    assert rejected["rejection_reason"].tolist() == ["state_invalid", "regular_invalid"]
+
+
+def test_quarantine_frame_keeps_payload_and_reason():
+    _, rejected = validate_shipping(pd.DataFrame([
+        {"rank": 0, "state": "CA", "postal": "CA", "population": 1},
+        {"rank": 1, "state": "CA", "postal": "CA", "population": 2},
+    ]))
+    q = quarantine_frame(rejected, "shipping_data", "run-1")
+    assert q[["source", "run_id", "reason"]].values.tolist() == [["shipping_data", "run-1", "rank_invalid"]]
+    assert json.loads(q["payload"].iloc[0]) == {"rank": 0, "state": "CA", "postal": "CA", "population": 1}
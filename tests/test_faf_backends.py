@@ -0,0 +1,41 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl.enrichment import faf_loader
+from src.etl.enrichment.faf_loader import TONS_COLUMNS, VALUE_COLUMNS, freight_tables, load_faf
+
+
+def _fake_faf(path, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "dms_origst": rng.choice([6, 48, 36, 12, 99, np.nan], n),
+        "dms_destst": rng.choice([6, 48, 36, 17], n),
+        "dms_mode": rng.choice([1, 2, 3, 4, 5, 9], n),
+        "sctg2": rng.choice([1, 2, 34, 43], n),
+        "trade_type": rng.choice([1, 1, 1, 2], n),
+    })
+    for col in TONS_COLUMNS + VALUE_COLUMNS:
+        df[col] = rng.gamma(2.0, 50.0, n).round(3)
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("faf.csv", df.to_csv(index=False))
+
+
+def test_duckdb_backend_matches_pandas(tmp_path, monkeypatch):
+    pytest.importorskip("duckdb")
+    from src.etl.enrichment import faf_duckdb
+
+    monkeypatch.setattr(faf_loader, "RAW_DIR", tmp_path)
+    monkeypatch.setattr(faf_duckdb, "DUCKDB_TEMP_DIR", tmp_path / "spill")
+    _fake_faf(tmp_path / "faf.zip")
+
+    expected = freight_tables(load_faf("faf.zip"))
+    got = faf_duckdb.freight_tables_duckdb(faf_duckdb.faf_parquet(tmp_path / "faf.zip"))
+
+    # pandas sums in float32; DuckDB sums in double and casts back, so allow float32 rounding
+    assert got.keys() == expected.keys()
+    for name, table in expected.items():
+        pd.testing.assert_frame_equal(got[name].reset_index(drop=True), table.reset_index(drop=True),
+                                      check_dtype=False, rtol=1e-6, atol=1e-2, obj=name)
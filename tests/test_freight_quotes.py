@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.freight_quotes import RouteCostMatrix, quote_file, quote_shipments
+
+
+def _matrix(rates=None):
+    costs = pd.DataFrame([
+        {"origin": "CA", "destination": "TX", "driving_mi": 1000.0, "driving_hr": 20.0, "total_cost": 2000.0},
+        {"origin": "TX", "destination": "CA", "driving_mi": 1000.0, "driving_hr": 20.0, "total_cost": 2000.0},
+    ])
+    return RouteCostMatrix(costs, rates)
+
+
+def test_quotes_gather_lane_cost_and_scale_by_weight():
+    quotes = quote_shipments({
+        "origin": ["CA", "TX", "CA"],
+        "destination": ["TX", "CA", "NY"],
+        "weight": [20.0, 10.0, 20.0],
+        "mode": ["Truck", "Truck", "Truck"],
+    }, _matrix())
+
+    assert quotes["quote"].iloc[0] == 2000.0
+    assert quotes["quote"].iloc[1] == 1000.0
+    assert np.isnan(quotes["quote"].iloc[2])  # unknown lane
+
+
+def test_usda_rates_are_blended_for_covered_origins():
+    rates = pd.DataFrame([{"year": 2025, "quarter": 1, "origin_state": "CA", "rate_per_mile": 4.0}])
+    quotes = quote_shipments({"origin": ["CA", "TX"], "destination": ["TX", "CA"],
+                              "weight": [20.0, 20.0]}, _matrix(rates))
+
+    assert quotes["quote"].tolist() == [3000.0, 2000.0]  # (2 + 4) / 2 $/mi on CA only
+
+
+def test_quote_file_streams_csv_in_chunks(tmp_path):
+    src = tmp_path / "shipments.csv"
+    pd.DataFrame({"origin": ["CA"] * 5, "destination": ["TX"] * 5,
+                  "weight": [20.0] * 5, "mode": ["Rail"] * 5}).to_csv(src, index=False)
+    out = tmp_path / "quotes.csv"
+
+    assert quote_file(src, out, matrix=_matrix(), chunksize=2) == 5
+    quoted = pd.read_csv(out)
+    assert len(quoted) == 5
+    assert (quoted["quote"] == 900.0).all()
+
+
+def test_intrastate_lane_keeps_modelled_cost():
+    costs = pd.DataFrame([
+        {"origin": "TX", "destination": "TX", "driving_mi": 0.0, "driving_hr": 0.0, "total_cost": 350.0},
+        {"origin": "TX", "destination": "CA", "driving_mi": 1000.0, "driving_hr": 20.0, "total_cost": 2000.0},
+    ])
+    rates = pd.DataFrame([{"year": 2025, "quarter": 1, "origin_state": "TX", "rate_per_mile": 4.0}])
+    quotes = quote_shipments({"origin": ["TX"], "destination": ["TX"], "weight": [20.0]},
+                             RouteCostMatrix(costs, rates))
+
+    assert quotes["quote"].iloc[0] == 350.0
@@ -0,0 +1,51 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.database import read_sql_query
+from src.etl.incremental import CHANGES_TABLE, upsert_incremental
+
+
+def _clean(rows):
+    df = pd.DataFrame(rows, columns=["rank", "state", "postal", "population"])
+    df["population_per_rank"] = df["population"] / df["rank"]
+    return df
+
+
+def test_upsert_applies_only_changed_keys(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'inc.db'}")
+    first = upsert_incremental(_clean([(1, "CA", "CA", 100.0), (2, "TX", "TX", 90.0),
+                                       (3, "NY", "NY", 80.0)]), engine, run_id="r1")
+    assert first["full_load"] and first["inserted"] == ["CA", "NY", "TX"]
+
+    same = upsert_incremental(_clean([(1, "CA", "CA", 100.0), (2, "TX", "TX", 90.0),
+                                      (3, "NY", "NY", 80.0)]), engine, run_id="r2")
+    assert same == {"inserted": [], "updated": [], "deleted": [], "full_load": False}
+
+    changes = upsert_incremental(_clean([(1, "CA", "CA", 120.0), (2, "TX", "TX", 90.0),
+                                         (4, "FL", "FL", 70.0)]), engine, run_id="r3")
+    assert changes == {"inserted": ["FL"], "updated": ["CA"], "deleted": ["NY"], "full_load": False}
+
+    stored = read_sql_query("SELECT * FROM shipping_stats ORDER BY state", engine)
+    assert stored["state"].tolist() == ["CA", "FL", "TX"]
+    assert stored.set_index("state")["pipeline_run_id"].to_dict() == {"CA": "r3", "FL": "r3", "TX": "r1"}
+    assert stored.set_index("state").loc["CA", "population"] == 120.0
+    assert len(pd.read_sql(f"SELECT * FROM {CHANGES_TABLE}", engine)) == 6
+
+
+def test_enrichment_skipped_only_when_nothing_changed(tmp_path):
+    from main import ENRICHMENT_INPUTS, enrichment_is_current
+    from src.database import table_versions, write_df_to_sql
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'inc.db'}")
+    output = tmp_path / "enriched_data.csv"
+    output.write_text("state\nCA\n")
+    unchanged = {"inserted": [], "updated": [], "deleted": [], "full_load": False}
+    before = table_versions(engine, ENRICHMENT_INPUTS)
+
+    assert enrichment_is_current(unchanged, before, engine, output)
+    assert not enrichment_is_current(None, before, engine, output)
+    assert not enrichment_is_current({**unchanged, "updated": ["CA"]}, before, engine, output)
+    assert not enrichment_is_current(unchanged, before, engine, tmp_path / "missing.csv")
+
+    write_df_to_sql(pd.DataFrame({"state": ["CA"], "temperature": [20.0]}), "weather_data", engine)
+    assert not enrichment_is_current(unchanged, before, engine, output)
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from src.analysis.lane_optimizer import UNSERVED, optimize_lane_assignment
+
+
+def _costs():
+    # Per-truckload costs between three states (symmetric, zero diagonal)
+    c = {("A", "B"): 200.0, ("A", "C"): 400.0, ("B", "C"): 300.0}
+    rows = []
+    for a in "ABC":
+        for b in "ABC":
+            rows.append({"origin": a, "destination": b,
+                         "total_cost": 0.0 if a == b else c.get((a, b), c.get((b, a)))})
+    return pd.DataFrame(rows)
+
+
+def test_unconstrained_lanes_use_direct_cost():
+    flows = pd.DataFrame([{"origin": "A", "destination": "B", "tons_m": 2.0}])
+    assignment, shadow = optimize_lane_assignment(flows, _costs())
+
+    assert assignment["tons_m"].sum() == 2.0
+    assert assignment["hub"].isin(["A", "B"]).all()
+    assert assignment["unit_cost"].iloc[0] == 200.0 / 20
+    assert (shadow["shadow_price"] == 0).all()
+
+
+def test_hub_capacity_is_respected_and_priced():
+    flows = pd.DataFrame([{"origin": "A", "destination": "B", "tons_m": 3.0}])
+    cap = {"A": 1.0, "B": 1.0, "C": 5.0}
+    assignment, shadow = optimize_lane_assignment(flows, _costs(), hub_capacity=cap)
+
+    by_hub = assignment.groupby("hub")["tons_m"].sum()
+    assert by_hub["A"] == 1.0 and by_hub["B"] == 1.0
+    # Overflow goes through C: (A->C + C->B) / 20 = 35 $/t vs 10 $/t direct
+    assert by_hub["C"] == 1.0
+    assert UNSERVED not in by_hub.index
+    prices = shadow.set_index("hub")["shadow_price"]
+    assert prices["A"] == prices["B"] == 25.0
+    assert prices["C"] == 0.0
+
+
+def test_volume_beyond_total_capacity_is_unserved():
+    flows = pd.DataFrame([{"origin": "A", "destination": "B", "tons_m": 4.0}])
+    assignment, _ = optimize_lane_assignment(flows, _costs(), hub_capacity=1.0)
+
+    unserved = assignment.loc[assignment["hub"] == UNSERVED, "tons_m"].sum()
+    assert unserved == 1.0
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.analysis import cost_predictor, model_registry
+from src.database import write_df_to_sql
+
+
+def _routes(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    mi = rng.uniform(50, 2500, n)
+    hr = mi / 55
+    return pd.DataFrame({"origin": "CA", "destination": "TX", "driving_mi": mi,
+                         "driving_hr": hr, "total_cost": 1.2 * mi + 35 * hr + 40})
+
+
+def test_retrain_skipped_when_data_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", tmp_path / "models")
+    monkeypatch.setattr(cost_predictor, "_loaded_models", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    write_df_to_sql(_routes(), "route_costs", engine)
+
+    first = cost_predictor.train_cost_predictor(engine)
+    again = cost_predictor.train_cost_predictor(engine)
+    registry = pd.read_sql("SELECT * FROM ml_model_registry", engine)
+    assert len(registry) == 1 and again == first
+
+    write_df_to_sql(_routes(seed=1), "route_costs", engine)
+    cost_predictor.train_cost_predictor(engine)
+    assert len(pd.read_sql("SELECT * FROM ml_model_registry", engine)) == 2
+
+
+def test_predict_costs_loads_registered_model_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", tmp_path / "models")
+    monkeypatch.setattr(cost_predictor, "_loaded_models", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    write_df_to_sql(_routes(), "route_costs", engine)
+    cost_predictor.train_cost_predictor(engine)
+    cost_predictor._loaded_models.clear()
+
+    batch = _routes(n=2500, seed=2)
+    pred = cost_predictor.predict_costs(batch, engine, chunksize=1000)
+    assert len(pred) == len(batch)
+    np.testing.assert_allclose(pred, batch["total_cost"], rtol=1e-6)
+    assert cost_predictor.MODEL_NAME in cost_predictor._loaded_models
+
+
+def test_incremental_training_updates_only_new_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", tmp_path / "models")
+    monkeypatch.setattr(cost_predictor, "_loaded_models", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    routes = _routes(n=400).assign(priced_at=pd.Timestamp("2024-01-01"))
+    write_df_to_sql(routes, "route_costs", engine)
+
+    first = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert first["mode"] == "full" and first["n_new"] == 400
+    again = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert again["mode"] == "unchanged" and again["n_new"] == 0
+
+    fresh = _routes(n=50, seed=3).assign(priced_at=pd.Timestamp("2024-01-02"))
+    write_df_to_sql(pd.concat([routes, fresh]), "route_costs", engine)
+    update = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert update["mode"] == "incremental" and update["n_new"] == 50 and update["n_trained"] == 450
+
+    batch = _routes(n=100, seed=4)
+    pred = cost_predictor.predict_costs(batch, engine, name=cost_predictor.INCREMENTAL_MODEL_NAME)
+    assert np.median(np.abs(pred / batch["total_cost"] - 1)) < 0.05
+
+    refit = cost_predictor.train_cost_predictor(engine, force=True, incremental=True)
+    assert refit["mode"] == "full" and refit["n_new"] == 450
+
+
+def test_unchanged_cost_rebuild_adds_no_training_rows(tmp_path, monkeypatch):
+    from src.analysis.cost_estimator import build_cost_features
+
+    monkeypatch.setattr(model_registry, "MODEL_DIR", tmp_path / "models")
+    monkeypatch.setattr(cost_predictor, "_loaded_models", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    states = ["CA", "TX", "NY", "FL", "WA", "IL"]
+    routes = _routes(n=len(states) ** 2, seed=5).assign(
+        origin=[o for o in states for _ in states], destination=states * len(states))
+    write_df_to_sql(routes, "state_routes", engine)
+    write_df_to_sql(pd.DataFrame({"origin": ["CA"], "destination": ["TX"], "commodity": ["x"],
+                                  "mode": ["Truck"], "tons_2024": [1.0], "tons_m": [1.0]}),
+                    "freight_lanes", engine)
+
+    build_cost_features(engine)
+    first = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert first["mode"] == "full" and first["n_new"] == len(routes)
+
+    build_cost_features(engine)
+    again = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert again["mode"] == "unchanged" and again["n_new"] == 0
+
+    routes.loc[0, "driving_mi"] += 100
+    write_df_to_sql(routes, "state_routes", engine)
+    build_cost_features(engine)
+    update = cost_predictor.train_cost_predictor(engine, incremental=True)
+    assert update["mode"] == "incremental" and update["n_new"] == 1
+
+
+def test_broken_registry_raises_instead_of_looking_empty(tmp_path):
+    import pytest
+    from pandas.errors import DatabaseError
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    assert model_registry.find_model("m", "hash", ["driving_mi"], engine) is None
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE TABLE {model_registry.REGISTRY_TABLE} (name TEXT)")
+    with pytest.raises(DatabaseError):
+        model_registry.find_model("m", "hash", ["driving_mi"], engine)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, inspect
+
+from src.analysis import model_registry
+from src.analysis.model_selection import SELECTED_MODEL_NAME, run_model_selection
+from src.database import write_df_to_sql
+
+
+def test_leaderboard_written_best_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", tmp_path / "models")
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    rng = np.random.default_rng(0)
+    n = 300
+    mi = rng.uniform(50, 2500, n)
+    hr = mi / rng.uniform(45, 60, n)
+    diesel = rng.uniform(3.0, 6.0, n)
+    routes = pd.DataFrame({
+        "origin": [f"S{i % 20}" for i in range(n)], "destination": [f"D{i}" for i in range(n)],
+        "driving_mi": mi, "driving_hr": hr, "diesel_price": diesel,
+        "total_cost": mi / 6.5 * diesel + 35 * hr + 0.15 * mi,
+    })
+    write_df_to_sql(routes, "route_costs", engine)
+
+    board = run_model_selection(engine, n_folds=3, n_jobs=2)
+    assert len(board) == 6 and board["r2"].is_monotonic_decreasing
+    # diesel drives fuel cost, so the rich feature set must win
+    assert board.iloc[0]["features"] == "rich"
+
+    stored = pd.read_sql("SELECT * FROM ml_model_selection", engine)
+    assert list(stored["model"]) == list(board["model"])
+    assert {"r2", "mae", "rmse", "n_test"} <= set(stored.columns)
+    assert (stored["n_test"] == n // 3).all()  # mean test rows per fold, not the sum
+    assert "ml_metrics" not in inspect(engine).get_table_names()
+    assert model_registry.load_latest_model(SELECTED_MODEL_NAME, engine)["features"][2] == "diesel_price"
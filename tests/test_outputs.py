@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from src.utils.outputs import OutputWriter, read_output, write_output
+
+
+def test_parquet_output_keeps_dtypes_and_is_preferred(tmp_path):
+    df = pd.DataFrame({"rank": [1, 2], "state": ["CA", "TX"], "population": [10.5, 7.0]})
+    written = write_output(df, tmp_path / "clean.csv", fmt="both")
+    assert [p.suffix for p in written] == [".csv", ".parquet"]
+
+    back = read_output(tmp_path / "clean.csv")
+    assert isinstance(back["state"].dtype, pd.CategoricalDtype)
+    assert back["rank"].dtype == "int64"
+    pd.testing.assert_frame_equal(back, df, check_dtype=False, check_categorical=False)
+
+
+def test_failed_write_leaves_no_partial_file(tmp_path):
+    with pytest.raises(RuntimeError), OutputWriter(tmp_path / "out.csv", fmt="both") as writer:
+        writer.write(pd.DataFrame({"state": ["CA"], "population": [1.0]}))
+        raise RuntimeError("boom")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,53 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.api.quote_service import QuoteService
+from src.database import write_df_to_sql
+
+
+def _seed(engine, diesel):
+    routes = pd.DataFrame([
+        {"origin": "CA", "destination": "TX", "driving_mi": 650.0, "driving_hr": 10.0, "total_cost": 1.0},
+        {"origin": "TX", "destination": "CA", "driving_mi": 650.0, "driving_hr": 10.0, "total_cost": 1.0},
+    ])
+    write_df_to_sql(routes, "route_costs", engine)
+    _append_fuel(engine, diesel, pd.Timestamp.now())
+
+
+def _append_fuel(engine, diesel, scraped_at):
+    fuel = pd.DataFrame([{"state": "CA", "regular": 5.0, "mid_grade": 5.2, "premium": 5.4,
+                          "diesel": diesel, "scraped_at": scraped_at}])
+    write_df_to_sql(fuel, "fuel_prices", engine, if_exists="append")
+
+
+def test_quote_reprices_with_latest_diesel_and_caches(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'q.db'}")
+    _seed(engine, diesel=6.5)
+    service = QuoteService(engine)
+
+    q = service.quote("CA", "TX")
+    # 650 mi / 6.5 mpg * $6.5 + 10 h * $35 + 650 mi * $0.15
+    assert q["quote"] == 650 + 350 + 97.5
+    assert service.quote("CA", "TX") == q
+    assert service.quote("CA", "ZZ") is None
+
+    m = service.metrics()
+    assert m["quotes"] == 3 and m["cache_hits"] == 1
+    assert m["p50_ms"] is not None and m["p99_ms"] >= m["p50_ms"]
+
+
+def test_reload_only_when_tables_change(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'q.db'}")
+    _seed(engine, diesel=6.5)
+    service = QuoteService(engine)
+    assert service.reload() is False
+
+    _append_fuel(engine, 13.0, pd.Timestamp.now() + pd.Timedelta(minutes=1))
+    assert service.reload() is True
+    assert service.quote("CA", "TX")["quote"] == 1300 + 350 + 97.5
+
+    # Same row count and total_cost sum, different distances: still a new version
+    routes = pd.read_sql("SELECT * FROM route_costs", engine).assign(driving_mi=700.0)
+    write_df_to_sql(routes, "route_costs", engine)
+    assert service.reload() is True
+    assert service.quote("CA", "TX")["driving_mi"] == 700.0
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.state_mapper import normalize_state_code, normalize_state_series
+
+
+def test_normalize_state_series_resolves_variants_and_returns_nan():
+    s = pd.Series(["ca", " New  York ", "N.Y.", "Calif.", "W. Va.", "Massachusets", "xx", None, 12])
+    out = normalize_state_series(s)
+    assert out.iloc[:6].tolist() == ["CA", "NY", "NY", "CA", "WV", "MA"]
+    assert out.iloc[6:].isna().all()
+    assert out.index.equals(s.index)
+
+
+def test_normalize_state_code_still_raises():
+    assert normalize_state_code("texas") == "TX"
+    with pytest.raises(ValueError):
+        normalize_state_code("Atlantis")
+    with pytest.raises(ValueError):
+        normalize_state_code("")
+
+
+def test_normalize_state_series_large_input():
+    s = pd.Series(np.random.default_rng(0).choice(["CA", "Texas", "bad"], 200_000))
+    out = normalize_state_series(s)
+    assert out.isna().sum() == (s == "bad").sum()
@@ -1,9 +1,10 @@
 select
-    state,
-    regular,
-    mid_grade,
-    premium,
-    diesel,
-    scraped_at,
-    pipeline_run_id
-from {{ source('shipping_db', 'fuel_prices') }}
+    f.state,
+    f.regular,
+    f.mid_grade,
+    f.premium,
+    f.diesel,
+    f.scraped_at,
+    r.value as pipeline_run_id
+from {{ source('shipping_db', 'fuel_prices') }} f
+left join {{ source('shipping_db', 'dim_pipeline_runs') }} r on r.id = f.pipeline_run_id
@@ -1,12 +1,13 @@
 select
-    state,
-    postal,
-    rank,
-    population,
-    population_per_rank,
-    regular,
-    mid_grade,
-    premium,
-    diesel,
-    pipeline_run_id
-from {{ source('shipping_db', 'shipping_stats') }}
+    s.state,
+    s.postal,
+    s.rank,
+    s.population,
+    s.population_per_rank,
+    s.regular,
+    s.mid_grade,
+    s.premium,
+    s.diesel,
+    r.value as pipeline_run_id
+from {{ source('shipping_db', 'shipping_stats') }} s
+left join {{ source('shipping_db', 'dim_pipeline_runs') }} r on r.id = s.pipeline_run_id